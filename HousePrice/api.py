@@ -1,19 +1,106 @@
+import io
+import os
 import sqlite3
-from datetime import datetime
+import sys
+from datetime import date, datetime
+from typing import List, Optional
 
-import joblib
 import pandas as pd
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+from fastapi import FastAPI, File, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.cache import PredictionCache
+from common.fastpath import compile_checked
+from common.history import apply_migrations, daily_aggregates, date_conditions, fetch_page, stream_jsonl
+from common.memory import memory_usage, report_memory
+from common.metrics import ServiceMetrics
+from common.microbatch import MicroBatcher
+from common.prediction_log import PredictionLogger
+from common.registry import ModelHandle, ModelRegistry
+from db_schema import (
+    MIGRATIONS, PRICE_COLUMNS, PRICE_INSERT, QUICKSALE_COLUMNS, QUICKSALE_INSERT, price_row, quicksale_row
+)
 
 
 DB_NAME = "house_predictions.db"
 
-PRICE_MODEL = joblib.load("models/price_model.pkl")
-QUICKSALE_MODEL = joblib.load("models/quicksale_model.pkl")
+# Result caches keyed by payload hash + model version
+CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "300"))
+CACHE_LOG_HITS = os.getenv("CACHE_LOG_HITS", "1") == "1"
+
+PRICE_CACHE = PredictionCache(CACHE_SIZE, CACHE_TTL)
+QUICKSALE_CACHE = PredictionCache(CACHE_SIZE, CACHE_TTL)
+
+# Compiled NumPy kernels, verified against the pipelines on every (re)load.
+# None if a pipeline can't be compiled (or FAST_PATH=0): sklearn is used instead.
+FAST_PATH = os.getenv("FAST_PATH", "1") == "1"
+
+
+def compile_kernel(model):
+    return compile_checked(model) if FAST_PATH else None
+
+
+# Versioned models from the registry (train_models.py registers new ones).
+# The active version is swapped in place by /admin/reload or the manifest watcher.
+# Arrays are memory-mapped read-only (ARTIFACT_MMAP=0 to disable) so uvicorn workers share them.
+REGISTRY = ModelRegistry(os.getenv("MODEL_REGISTRY", "models/registry"))
+MMAP_MODE = "r" if os.getenv("ARTIFACT_MMAP", "1") == "1" else None
+
+PRICE = ModelHandle(
+    REGISTRY, "price",
+    legacy_path="models/price_model.pkl",
+    prepare=compile_kernel,
+    on_swap=lambda loaded: PRICE_CACHE.bind_version(loaded.version),
+    mmap_mode=MMAP_MODE
+)
+QUICKSALE = ModelHandle(
+    REGISTRY, "quicksale",
+    legacy_path="models/quicksale_model.pkl",
+    prepare=compile_kernel,
+    on_swap=lambda loaded: QUICKSALE_CACHE.bind_version(loaded.version),
+    mmap_mode=MMAP_MODE
+)
+PRICE_CACHE.bind_version(PRICE.current.version)
+QUICKSALE_CACHE.bind_version(QUICKSALE.current.version)
+
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "10"))
+PRICE.watch(MODEL_WATCH_INTERVAL)
+QUICKSALE.watch(MODEL_WATCH_INTERVAL)
+
+
+def predict_price_rows(rows, loaded=None):
+    """Price for a list of dicts or a DataFrame."""
+    loaded = loaded or PRICE.current
+    if loaded.extra is not None:
+        return loaded.extra.predict_many(rows)
+    return loaded.model.predict(pd.DataFrame(rows))
+
+
+def predict_quicksale_rows(rows, loaded=None):
+    """Probability of selling within a week for a list of dicts or a DataFrame."""
+    loaded = loaded or QUICKSALE.current
+    if loaded.extra is not None:
+        return loaded.extra.predict_many(rows)
+    return loaded.model.predict_proba(pd.DataFrame(rows))[:, 1]
+
+
+# Without a kernel, concurrent single-house requests are stacked into one DataFrame per batch
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "64"))
+BATCH_MAX_LATENCY_MS = float(os.getenv("BATCH_MAX_LATENCY_MS", "2"))
+
+PRICE_BATCHER = MicroBatcher(predict_price_rows, max_batch_size=BATCH_MAX_SIZE, max_latency_ms=BATCH_MAX_LATENCY_MS)
+QUICKSALE_BATCHER = MicroBatcher(predict_quicksale_rows, max_batch_size=BATCH_MAX_SIZE, max_latency_ms=BATCH_MAX_LATENCY_MS)
 
 app = FastAPI(title="House Sales API", version="1.0")
 
+# Prometheus /metrics: per-route request counts, latency and stage histograms
+METRICS = ServiceMetrics().install(app)
+METRICS.track_model(PRICE)
+METRICS.track_model(QUICKSALE)
+
 
 def init_db():
     conn = sqlite3.connect(DB_NAME)
@@ -41,12 +128,21 @@ def init_db():
     conn.commit()
     conn.close()
 
+    apply_migrations(DB_NAME, MIGRATIONS)
+
 
 init_db()
 
+# Predictions are queued and written in batches by a background thread
+LOGGER = PredictionLogger(DB_NAME)
+METRICS.track_logger(LOGGER)
+
 
 # -------- Request Schemas --------
 class HouseBase(BaseModel):
+    # NaN / inf are rejected like any other invalid number
+    model_config = ConfigDict(allow_inf_nan=False)
+
     Square_Footage: float = Field(..., ge=0)
     Bedrooms: int = Field(..., ge=0)
     Bathrooms: float = Field(..., ge=0)
@@ -68,26 +164,112 @@ class HouseForQuickSale(HouseBase):
 
 
 # -------- DB helpers --------
-def insert_price(payload: dict, predicted_price: float):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO price_predictions(payload_json, predicted_price, created_at) VALUES (?, ?, ?)",
-        (str(payload), float(predicted_price), datetime.now().isoformat())
+# Inputs are logged as typed columns (see db_schema.py)
+def insert_price(payload: dict, predicted_price: float, model_version: str):
+    LOGGER.log(PRICE_INSERT, price_row(payload, predicted_price, datetime.now().isoformat(), model_version))
+
+
+def insert_quicksale(payload: dict, label: int, prob: float, model_version: str):
+    LOGGER.log(QUICKSALE_INSERT, quicksale_row(payload, label, prob, datetime.now().isoformat(), model_version))
+
+
+def insert_price_many(payloads: list, predicted_prices, model_version: str):
+    now = datetime.now().isoformat()
+    LOGGER.log_many(
+        PRICE_INSERT,
+        [price_row(p, pred, now, model_version) for p, pred in zip(payloads, predicted_prices)]
     )
-    conn.commit()
-    conn.close()
 
 
-def insert_quicksale(payload: dict, label: int, prob: float):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO quicksale_predictions(payload_json, predicted_label, predicted_probability, created_at) VALUES (?, ?, ?, ?)",
-        (str(payload), int(label), float(prob), datetime.now().isoformat())
+def insert_quicksale_many(payloads: list, labels, probs, model_version: str):
+    now = datetime.now().isoformat()
+    LOGGER.log_many(
+        QUICKSALE_INSERT,
+        [quicksale_row(p, label, prob, now, model_version) for p, label, prob in zip(payloads, labels, probs)]
     )
-    conn.commit()
-    conn.close()
+
+
+# -------- Batch helpers --------
+def validate_rows(df: pd.DataFrame, schema, max_errors=20) -> pd.DataFrame:
+    """
+    Rows of `df` validated like a JSON batch of `schema` (types, bounds, no
+    NaN / inf). 422 with the offending row indices if any row fails.
+    """
+    columns = list(schema.model_fields)
+    try:
+        rows = TypeAdapter(List[schema]).validate_python(df.to_dict(orient="records"))
+    except ValidationError as e:
+        errors = e.errors(include_url=False, include_input=False)
+        raise HTTPException(status_code=422, detail={
+            "invalid_rows": sorted({err["loc"][0] for err in errors}),
+            "errors": [
+                {"row": err["loc"][0], "column": err["loc"][-1], "message": err["msg"]}
+                for err in errors[:max_errors]
+            ]
+        })
+    return pd.DataFrame([r.model_dump() for r in rows], columns=columns)
+
+
+def read_upload(file: UploadFile, schema) -> pd.DataFrame:
+    """Read a CSV/Parquet upload, keep the schema's columns and validate every row."""
+    raw = file.file.read()
+    # Categorical columns are text in the schema, even when a file holds 0 / 1
+    text = [c for c, field in schema.model_fields.items() if field.annotation is str]
+    try:
+        if file.filename.lower().endswith(".parquet"):
+            df = pd.read_parquet(io.BytesIO(raw))
+        else:
+            df = pd.read_csv(io.BytesIO(raw), dtype={c: str for c in text})
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not read file: {e}")
+
+    columns = list(schema.model_fields)
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing columns: {missing}")
+
+    df = df[columns].astype({c: "string" for c in text})
+
+    return validate_rows(df.reset_index(drop=True), schema)
+
+
+def batch_price(df: pd.DataFrame):
+    loaded = PRICE.current
+    if df.empty:
+        return {"predicted_prices": [], "model_version": loaded.version}
+    with METRICS.stage("predict"):
+        preds = predict_price_rows(df, loaded)
+    with METRICS.stage("db_write"):
+        insert_price_many(df.to_dict(orient="records"), preds, loaded.version)
+    return {"predicted_prices": [round(float(p), 2) for p in preds], "model_version": loaded.version}
+
+
+def batch_quicksale(df: pd.DataFrame):
+    loaded = QUICKSALE.current
+    if df.empty:
+        return {"model_version": loaded.version, "predictions": []}
+    with METRICS.stage("predict"):
+        probs = predict_quicksale_rows(df, loaded)
+    labels = (probs >= 0.5).astype(int)
+    with METRICS.stage("db_write"):
+        insert_quicksale_many(df.to_dict(orient="records"), labels, probs, loaded.version)
+    return {
+        "model_version": loaded.version,
+        "predictions": [
+            {"sold_within_week": "Yes" if label == 1 else "No", "probability": round(float(prob), 4)}
+            for label, prob in zip(labels, probs)
+        ]
+    }
+
+
+@app.on_event("startup")
+def startup():
+    report_memory("House Sales API")
+
+
+@app.on_event("shutdown")
+def shutdown():
+    LOGGER.close()
 
 
 @app.get("/health")
@@ -95,53 +277,233 @@ def health():
     return {"status": "OK"}
 
 
-# -------- Predictions --------
-@app.post("/predict/price")
-def predict_price(data: HouseBase):
+@app.get("/stats/logging")
+def logging_stats():
+    return LOGGER.stats()
+
+
+@app.get("/stats/cache")
+def cache_stats():
+    return {"price": PRICE_CACHE.stats(), "quicksale": QUICKSALE_CACHE.stats()}
+
+
+@app.get("/stats/memory")
+def memory_stats():
+    return memory_usage()
+
+
+# -------- Models --------
+@app.get("/models")
+def models():
+    return {
+        "price": {"active": PRICE.current.version, "manifest": REGISTRY.manifest("price")},
+        "quicksale": {"active": QUICKSALE.current.version, "manifest": REGISTRY.manifest("quicksale")}
+    }
+
+
+@app.post("/admin/reload")
+def reload_models():
+    """Swap in the registry's active versions; in-flight requests finish on the old ones."""
     try:
-        df = pd.DataFrame([data.dict()])
-        pred = PRICE_MODEL.predict(df)[0]
+        changed = {"price": PRICE.reload(), "quicksale": QUICKSALE.reload()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed, keeping current models: {e}")
+    return {
+        "changed": changed,
+        "price": PRICE.current.version,
+        "quicksale": QUICKSALE.current.version
+    }
 
-        insert_price(data.dict(), pred)
 
-        return {"predicted_price": round(float(pred), 2)}
+# -------- Predictions --------
+@app.post("/predict/price")
+async def predict_price(data: HouseBase):
+    try:
+        payload = data.dict()
+        loaded = PRICE.current
+        key = PRICE_CACHE.key(payload, loaded.version)
+        pred = PRICE_CACHE.get(key)
+        hit = pred is not None
+
+        if not hit:
+            with METRICS.stage("predict"):
+                if loaded.extra is not None:
+                    pred = loaded.extra.predict_one(payload)
+                else:
+                    pred = await PRICE_BATCHER.submit(payload, loaded)
+            PRICE_CACHE.set(key, pred)
+
+        if not hit or CACHE_LOG_HITS:
+            with METRICS.stage("db_write"):
+                insert_price(payload, pred, loaded.version)
+
+        return {"predicted_price": round(float(pred), 2), "model_version": loaded.version}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/predict/quicksale")
-def predict_quicksale(data: HouseForQuickSale):
+async def predict_quicksale(data: HouseForQuickSale):
     try:
-        df = pd.DataFrame([data.dict()])
-        prob = QUICKSALE_MODEL.predict_proba(df)[0][1]
+        payload = data.dict()
+        loaded = QUICKSALE.current
+        key = QUICKSALE_CACHE.key(payload, loaded.version)
+        prob = QUICKSALE_CACHE.get(key)
+        hit = prob is not None
+
+        if not hit:
+            with METRICS.stage("predict"):
+                if loaded.extra is not None:
+                    prob = loaded.extra.predict_one(payload)
+                else:
+                    prob = await QUICKSALE_BATCHER.submit(payload, loaded)
+            QUICKSALE_CACHE.set(key, prob)
         label = 1 if prob >= 0.5 else 0
 
-        insert_quicksale(data.dict(), label, prob)
+        if not hit or CACHE_LOG_HITS:
+            with METRICS.stage("db_write"):
+                insert_quicksale(payload, label, prob, loaded.version)
 
         return {
             "sold_within_week": "Yes" if label == 1 else "No",
-            "probability": round(float(prob), 4)
+            "probability": round(float(prob), 4),
+            "model_version": loaded.version
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# -------- Batch Predictions --------
+# One vectorized predict call per request instead of one pipeline run per house.
+@app.post("/predict/price/batch")
+def predict_price_batch(data: List[HouseBase]):
+    try:
+        with METRICS.stage("dataframe"):
+            df = pd.DataFrame([d.dict() for d in data])
+        return batch_price(df)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/predict/price/batch/file")
+def predict_price_batch_file(file: UploadFile = File(...)):
+    with METRICS.stage("dataframe"):
+        df = read_upload(file, HouseBase)
+    try:
+        return batch_price(df)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/predict/quicksale/batch")
+def predict_quicksale_batch(data: List[HouseForQuickSale]):
+    try:
+        with METRICS.stage("dataframe"):
+            df = pd.DataFrame([d.dict() for d in data])
+        return batch_quicksale(df)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/predict/quicksale/batch/file")
+def predict_quicksale_batch_file(file: UploadFile = File(...)):
+    with METRICS.stage("dataframe"):
+        df = read_upload(file, HouseForQuickSale)
+    try:
+        return batch_quicksale(df)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # -------- History --------
+# Newest first; pass next_before_id back as before_id for the next page.
+def price_conditions(since, until, min_price, max_price):
+    return date_conditions(since, until) + [
+        ("predicted_price >= ?", min_price),
+        ("predicted_price <= ?", max_price)
+    ]
+
+
+def quicksale_conditions(since, until, label, min_prob, max_prob):
+    return date_conditions(since, until) + [
+        ("predicted_label = ?", label),
+        ("predicted_probability >= ?", min_prob),
+        ("predicted_probability <= ?", max_prob)
+    ]
+
+
 @app.get("/history/price")
-def history_price():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT id, payload_json, predicted_price, created_at FROM price_predictions ORDER BY id DESC LIMIT 20")
-    rows = cur.fetchall()
-    conn.close()
-    return {"rows": rows}
+def history_price(
+    limit: int = Query(20, ge=1, le=1000),
+    before_id: Optional[int] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None
+):
+    conditions = price_conditions(since, until, min_price, max_price)
+    return fetch_page(DB_NAME, "price_predictions", PRICE_COLUMNS, conditions, before_id, limit)
+
+
+@app.get("/history/price/daily")
+def history_price_daily(since: Optional[date] = None, until: Optional[date] = None):
+    aggregates = {
+        "count": "COUNT(*)",
+        "mean_price": "AVG(predicted_price)",
+        "min_price": "MIN(predicted_price)",
+        "max_price": "MAX(predicted_price)"
+    }
+    return {"days": daily_aggregates(DB_NAME, "price_predictions", aggregates, date_conditions(since, until))}
+
+
+@app.get("/history/price/export")
+def history_price_export(
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None
+):
+    conditions = price_conditions(since, until, min_price, max_price)
+    return StreamingResponse(
+        stream_jsonl(DB_NAME, "price_predictions", PRICE_COLUMNS, conditions),
+        media_type="application/x-ndjson"
+    )
 
 
 @app.get("/history/quicksale")
-def history_quicksale():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT id, payload_json, predicted_label, predicted_probability, created_at FROM quicksale_predictions ORDER BY id DESC LIMIT 20")
-    rows = cur.fetchall()
-    conn.close()
-    return {"rows": rows}
+def history_quicksale(
+    limit: int = Query(20, ge=1, le=1000),
+    before_id: Optional[int] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    label: Optional[int] = Query(None, ge=0, le=1),
+    min_prob: Optional[float] = Query(None, ge=0, le=1),
+    max_prob: Optional[float] = Query(None, ge=0, le=1)
+):
+    conditions = quicksale_conditions(since, until, label, min_prob, max_prob)
+    return fetch_page(DB_NAME, "quicksale_predictions", QUICKSALE_COLUMNS, conditions, before_id, limit)
+
+
+@app.get("/history/quicksale/daily")
+def history_quicksale_daily(since: Optional[date] = None, until: Optional[date] = None):
+    aggregates = {
+        "count": "COUNT(*)",
+        "sold_within_week": "SUM(predicted_label)",
+        "mean_probability": "AVG(predicted_probability)"
+    }
+    return {"days": daily_aggregates(DB_NAME, "quicksale_predictions", aggregates, date_conditions(since, until))}
+
+
+@app.get("/history/quicksale/export")
+def history_quicksale_export(
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    label: Optional[int] = Query(None, ge=0, le=1),
+    min_prob: Optional[float] = Query(None, ge=0, le=1),
+    max_prob: Optional[float] = Query(None, ge=0, le=1)
+):
+    conditions = quicksale_conditions(since, until, label, min_prob, max_prob)
+    return StreamingResponse(
+        stream_jsonl(DB_NAME, "quicksale_predictions", QUICKSALE_COLUMNS, conditions),
+        media_type="application/x-ndjson"
+    )
@@ -0,0 +1,86 @@
+"""
+Schema for house_predictions.db, shared by api.py and migrate_logs.py.
+
+Inputs are stored as typed columns mirroring HouseBase / HouseForQuickSale
+(the same way Regression/loan_api.py stores loan applications) instead of a
+str(dict) in payload_json. payload_json is kept only for rows written
+before migration 2 until migrate_logs.py converts them.
+"""
+
+# Request field -> (column, SQLite type)
+HOUSE_COLUMNS = {
+    "Square_Footage": ("square_footage", "REAL"),
+    "Bedrooms": ("bedrooms", "INTEGER"),
+    "Bathrooms": ("bathrooms", "REAL"),
+    "Age": ("age", "REAL"),
+    "Garage_Spaces": ("garage_spaces", "INTEGER"),
+    "Lot_Size": ("lot_size", "REAL"),
+    "Floors": ("floors", "INTEGER"),
+    "Neighborhood_Rating": ("neighborhood_rating", "REAL"),
+    "Condition": ("condition", "REAL"),
+    "School_Rating": ("school_rating", "REAL"),
+    "Has_Pool": ("has_pool", "TEXT"),
+    "Renovated": ("renovated", "TEXT"),
+    "Location_Type": ("location_type", "TEXT"),
+    "Distance_To_Center_KM": ("distance_to_center_km", "REAL")
+}
+
+QUICKSALE_EXTRA_COLUMNS = {
+    "Price": ("price", "REAL")
+}
+
+PRICE_FIELDS = list(HOUSE_COLUMNS)
+QUICKSALE_FIELDS = PRICE_FIELDS + list(QUICKSALE_EXTRA_COLUMNS)
+
+PRICE_INPUT_COLUMNS = [HOUSE_COLUMNS[f][0] for f in PRICE_FIELDS]
+QUICKSALE_INPUT_COLUMNS = PRICE_INPUT_COLUMNS + [c for c, _ in QUICKSALE_EXTRA_COLUMNS.values()]
+
+
+def _add_columns(table, columns):
+    return "\n".join(f"ALTER TABLE {table} ADD COLUMN {name} {sqltype};" for name, sqltype in columns)
+
+
+# Schema changes, applied once each (tracked in PRAGMA user_version)
+MIGRATIONS = [
+    # 1: indexes for history filters and pagination
+    """
+    CREATE INDEX IF NOT EXISTS idx_price_created_at ON price_predictions(created_at);
+    CREATE INDEX IF NOT EXISTS idx_price_predicted_price ON price_predictions(predicted_price);
+    CREATE INDEX IF NOT EXISTS idx_quicksale_created_at ON quicksale_predictions(created_at);
+    CREATE INDEX IF NOT EXISTS idx_quicksale_label_created_at ON quicksale_predictions(predicted_label, created_at);
+    CREATE INDEX IF NOT EXISTS idx_quicksale_probability ON quicksale_predictions(predicted_probability);
+    """,
+
+    # 2: typed input columns
+    _add_columns("price_predictions", HOUSE_COLUMNS.values())
+    + _add_columns("quicksale_predictions", list(HOUSE_COLUMNS.values()) + list(QUICKSALE_EXTRA_COLUMNS.values())),
+
+    # 3: registry version of the model that made each prediction
+    """
+    ALTER TABLE price_predictions ADD COLUMN model_version TEXT;
+    ALTER TABLE quicksale_predictions ADD COLUMN model_version TEXT;
+    """
+]
+
+
+PRICE_OUTPUT_COLUMNS = ["predicted_price", "created_at", "model_version"]
+QUICKSALE_OUTPUT_COLUMNS = ["predicted_label", "predicted_probability", "created_at", "model_version"]
+
+PRICE_COLUMNS = ["id"] + PRICE_INPUT_COLUMNS + PRICE_OUTPUT_COLUMNS
+QUICKSALE_COLUMNS = ["id"] + QUICKSALE_INPUT_COLUMNS + QUICKSALE_OUTPUT_COLUMNS
+
+
+def _insert(table, columns):
+    return f"INSERT INTO {table}({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+
+PRICE_INSERT = _insert("price_predictions", PRICE_COLUMNS[1:])
+QUICKSALE_INSERT = _insert("quicksale_predictions", QUICKSALE_COLUMNS[1:])
+
+
+def price_row(payload, predicted_price, created_at, model_version=None):
+    return tuple(payload.get(f) for f in PRICE_FIELDS) + (float(predicted_price), created_at, model_version)
+
+
+def quicksale_row(payload, label, prob, created_at, model_version=None):
+    return tuple(payload.get(f) for f in QUICKSALE_FIELDS) + (int(label), float(prob), created_at, model_version)
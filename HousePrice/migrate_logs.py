@@ -0,0 +1,145 @@
+"""
+Convert legacy house_predictions.db rows (payload_json = str(dict)) into the
+typed columns from db_schema.py, and optionally export the logs to
+Parquet / Arrow for drift and retraining jobs.
+
+Usage:
+    python migrate_logs.py
+    python migrate_logs.py --drop-payload
+    python migrate_logs.py --export exports/ --format parquet
+"""
+
+import argparse
+import ast
+import json
+import os
+import sqlite3
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.history import apply_migrations
+from db_schema import (
+    HOUSE_COLUMNS, MIGRATIONS, PRICE_FIELDS, QUICKSALE_EXTRA_COLUMNS, QUICKSALE_FIELDS
+)
+
+DB_NAME = "house_predictions.db"
+
+TABLES = {
+    "price_predictions": PRICE_FIELDS,
+    "quicksale_predictions": QUICKSALE_FIELDS
+}
+
+COLUMN_NAMES = {f: c for f, (c, _) in {**HOUSE_COLUMNS, **QUICKSALE_EXTRA_COLUMNS}.items()}
+
+
+def parse_payload(text):
+    """Legacy rows hold a Python repr; accept real JSON as well."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return ast.literal_eval(text)
+
+
+def convert_table(conn, table, fields, chunk_size=10000, drop_payload=False):
+    """Fill typed columns from payload_json in id order, one executemany per chunk."""
+    columns = [COLUMN_NAMES[f] for f in fields]
+    assignments = ", ".join(f"{c} = ?" for c in columns)
+    if drop_payload:
+        assignments += ", payload_json = NULL"
+    update = f"UPDATE {table} SET {assignments} WHERE id = ?"
+
+    select = f"""
+        SELECT id, payload_json FROM {table}
+        WHERE id > ? AND payload_json IS NOT NULL AND {columns[0]} IS NULL
+        ORDER BY id LIMIT ?
+    """
+
+    last_id, converted, failed = 0, 0, 0
+    while True:
+        rows = conn.execute(select, (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+
+        updates = []
+        for row_id, text in rows:
+            try:
+                payload = parse_payload(text)
+            except (ValueError, SyntaxError):
+                failed += 1
+                continue
+            updates.append(tuple(payload.get(f) for f in fields) + (row_id,))
+
+        conn.executemany(update, updates)
+        conn.commit()
+        converted += len(updates)
+        last_id = rows[-1][0]
+
+    if drop_payload:
+        # Rows already converted in an earlier run
+        conn.execute(f"UPDATE {table} SET payload_json = NULL WHERE {columns[0]} IS NOT NULL")
+        conn.commit()
+
+    return converted, failed
+
+
+def export_table(conn, table, path, fmt="parquet", chunk_size=100000):
+    """Stream a table into a Parquet or Arrow IPC file without loading it whole."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Arrow types from the declared SQLite types, so all-NULL chunks still line up
+    sql_to_arrow = {"INTEGER": pa.int64(), "REAL": pa.float64(), "TEXT": pa.string()}
+    columns = [
+        (name, sqltype) for _, name, sqltype, *_ in conn.execute(f"PRAGMA table_info({table})")
+        if name != "payload_json"
+    ]
+    schema = pa.schema([(name, sql_to_arrow.get(sqltype, pa.string())) for name, sqltype in columns])
+
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(path, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_file(path, schema)
+
+    n_rows = 0
+    query = f"SELECT {', '.join(name for name, _ in columns)} FROM {table} ORDER BY id"
+    for chunk in pd.read_sql_query(query, conn, chunksize=chunk_size):
+        writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        n_rows += len(chunk)
+
+    writer.close()
+    return n_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate and export house prediction logs")
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--drop-payload", action="store_true", help="clear payload_json once converted")
+    parser.add_argument("--export", default=None, help="directory to write exports to")
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    args = parser.parse_args()
+
+    apply_migrations(args.db, MIGRATIONS)
+
+    conn = sqlite3.connect(args.db)
+    for table, fields in TABLES.items():
+        converted, failed = convert_table(conn, table, fields, args.chunk_size, args.drop_payload)
+        print(f"{table}: converted {converted} rows, {failed} unparseable")
+
+    if args.drop_payload:
+        conn.execute("VACUUM")
+
+    if args.export:
+        os.makedirs(args.export, exist_ok=True)
+        for table in TABLES:
+            path = os.path.join(args.export, f"{table}.{args.format}")
+            n_rows = export_table(conn, table, path, args.format)
+            print(f"✅ Exported {n_rows} rows: {path}")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Out-of-core training for `train_models.py --streaming`.
+
+house_sales.csv is only ever read in chunks:
+
+    pass 1       preprocessing statistics of the training rows - running
+                 mean / variance, reservoir-sample medians (exact while a
+                 column has no more than `reservoir_size` values) and
+                 category vocabularies with counts
+    pass 2..     price: X^T X and X^T y accumulated in the first of these
+                 passes and solved in closed form
+                 quick sale: mini-batch SGD on the log loss, one pass per epoch
+    last pass    test metrics from running sums and a confusion matrix
+
+The results are ordinary fitted sklearn Pipelines with the same layout as
+build_preprocessor(), so api.py, the registry and the compiled fast path
+load them unchanged.
+
+Rows are split into train / test by a hash of their row number, so every
+pass agrees on the split without holding an index of the whole file.
+"""
+
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.linear_model import LinearRegression, SGDClassifier
+from sklearn.pipeline import Pipeline
+
+
+# -------- Split --------
+def split_mask(row_ids, test_size=0.2, seed=42):
+    """True for test rows. Depends only on the row number (splitmix64 hash)."""
+    with np.errstate(over="ignore"):
+        x = (np.asarray(row_ids, dtype=np.uint64) + np.uint64(seed)) * np.uint64(0x9E3779B97F4A7C15)
+        x ^= x >> np.uint64(30)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(27)
+        x *= np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53) < test_size
+
+
+def iter_split(path, columns, chunk_size, test=False, test_size=0.2, seed=42):
+    """Train (or test) rows of the CSV, one DataFrame chunk at a time."""
+    start = 0
+    for chunk in pd.read_csv(path, usecols=columns, chunksize=chunk_size):
+        mask = split_mask(np.arange(start, start + len(chunk)), test_size, seed)
+        start += len(chunk)
+
+        part = chunk[mask if test else ~mask]
+        if len(part):
+            yield part[columns]
+
+
+def to_dense(X):
+    return X.toarray() if sparse.issparse(X) else np.asarray(X)
+
+
+# -------- Pass 1: preprocessing statistics --------
+class RunningMoments:
+    """Count, mean and sum of squared deviations of the non-missing values, merged chunk by chunk."""
+
+    def __init__(self, n_cols):
+        self.n = np.zeros(n_cols)
+        self.mean = np.zeros(n_cols)
+        self.m2 = np.zeros(n_cols)
+
+    def update(self, X):
+        present = ~np.isnan(X)
+        n_b = present.sum(axis=0)
+        mean_b = np.where(present, X, 0.0).sum(axis=0) / np.maximum(n_b, 1)
+        m2_b = np.where(present, (X - mean_b) ** 2, 0.0).sum(axis=0)
+
+        # Parallel-variance merge (Chan et al.)
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * n_b / np.maximum(n, 1)
+        self.m2 = self.m2 + m2_b + delta ** 2 * self.n * n_b / np.maximum(n, 1)
+        self.n = n
+
+    def imputed(self, fill, n_missing):
+        """Mean and population variance once `n_missing` values per column are imputed with `fill`."""
+        n = self.n + n_missing
+        mean = (self.n * self.mean + n_missing * fill) / n
+        m2 = self.m2 + self.n * n_missing / n * (self.mean - fill) ** 2
+        return mean, m2 / n
+
+
+class Reservoir:
+    """Uniform sample of at most `size` non-missing values per column (Algorithm R, per chunk)."""
+
+    def __init__(self, n_cols, size=100000, seed=42):
+        self.size = size
+        self.samples = [np.empty(0) for _ in range(n_cols)]
+        self.seen = np.zeros(n_cols, dtype=np.int64)
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, X):
+        for j in range(X.shape[1]):
+            values = X[:, j][~np.isnan(X[:, j])]
+            sample = self.samples[j]
+
+            room = self.size - len(sample)
+            if room > 0:
+                sample = np.concatenate([sample, values[:room]])
+                self.seen[j] += min(room, len(values))
+                values = values[room:]
+
+            if len(values):
+                # The t-th value seen replaces a random slot with probability size / (t + 1)
+                t = self.seen[j] + np.arange(len(values))
+                slots = (self.rng.random(len(values)) * (t + 1)).astype(np.int64)
+                keep = slots < self.size
+                sample[slots[keep]] = values[keep]
+                self.seen[j] += len(values)
+
+            self.samples[j] = sample
+
+    def medians(self):
+        return np.array([np.median(s) if len(s) else np.nan for s in self.samples])
+
+
+class StreamingStats:
+    """Everything build_preprocessor() learns in fit(), accumulated one chunk at a time."""
+
+    def __init__(self, numeric_cols, categorical_cols, reservoir_size=100000, seed=42):
+        self.numeric_cols = list(numeric_cols)
+        self.categorical_cols = list(categorical_cols)
+        self.n_rows = 0
+        self.moments = RunningMoments(len(self.numeric_cols))
+        self.reservoir = Reservoir(len(self.numeric_cols), reservoir_size, seed)
+        self.counts = {col: Counter() for col in self.categorical_cols}
+
+    def update(self, chunk):
+        X = chunk[self.numeric_cols].to_numpy(dtype=float)
+        self.moments.update(X)
+        self.reservoir.update(X)
+        for col in self.categorical_cols:
+            self.counts[col].update(chunk[col].dropna().value_counts().to_dict())
+        self.n_rows += len(chunk)
+
+    def numeric(self, cols):
+        """(median, mean, variance) of `cols` after median imputation, like SimpleImputer + StandardScaler."""
+        idx = [self.numeric_cols.index(c) for c in cols]
+        medians = self.reservoir.medians()[idx]
+
+        moments = RunningMoments(len(idx))
+        moments.n, moments.mean, moments.m2 = self.moments.n[idx], self.moments.mean[idx], self.moments.m2[idx]
+        mean, var = moments.imputed(medians, self.n_rows - moments.n)
+        return medians, mean, var
+
+    def vocabulary(self, col):
+        return sorted(self.counts[col])
+
+    def most_frequent(self, col):
+        # Ties go to the smallest value, as in SimpleImputer(strategy="most_frequent")
+        counts = self.counts[col]
+        top = max(counts.values())
+        return min(value for value, n in counts.items() if n == top)
+
+
+def fitted_preprocessor(build_preprocessor, stats, numeric_cols, categorical_cols, feature_cols):
+    """
+    build_preprocessor(numeric_cols, categorical_cols) fitted from streamed
+    statistics: fit on a seed frame holding every category once (so the
+    encoder learns the full vocabulary), then overwrite the learned
+    statistics with the streamed ones.
+    """
+    vocab = {col: stats.vocabulary(col) for col in categorical_cols}
+    n_seed = max(len(v) for v in vocab.values())
+
+    seed = pd.DataFrame({col: 0.0 for col in numeric_cols}, index=range(n_seed))
+    for col, values in vocab.items():
+        seed[col] = values + [values[0]] * (n_seed - len(values))
+
+    pre = build_preprocessor(numeric_cols, categorical_cols)
+    pre.fit(seed[feature_cols])
+
+    medians, mean, var = stats.numeric(numeric_cols)
+    num_imputer, scaler = [step for _, step in pre.named_transformers_["num"].steps]
+    num_imputer.statistics_ = medians
+    scaler.mean_ = mean
+    scaler.var_ = var
+    scaler.scale_ = np.where(var > 0, np.sqrt(var), 1.0)
+    scaler.n_samples_seen_ = stats.n_rows
+
+    cat_imputer = pre.named_transformers_["cat"].steps[0][1]
+    cat_imputer.statistics_ = np.array(
+        [stats.most_frequent(col) for col in categorical_cols], dtype=cat_imputer.statistics_.dtype
+    )
+    return pre
+
+
+# -------- Models --------
+class NormalEquations:
+    """Least squares from accumulated X^T X / X^T y (centred, like LinearRegression)."""
+
+    def __init__(self, n_features):
+        self.n = 0
+        self.sum_x = np.zeros(n_features)
+        self.sum_y = 0.0
+        self.xtx = np.zeros((n_features, n_features))
+        self.xty = np.zeros(n_features)
+
+    def update(self, X, y):
+        self.n += len(y)
+        self.sum_x += X.sum(axis=0)
+        self.sum_y += float(y.sum())
+        self.xtx += X.T @ X
+        self.xty += X.T @ y
+
+    def solve(self):
+        x_mean = self.sum_x / self.n
+        y_mean = self.sum_y / self.n
+        gram = self.xtx - self.n * np.outer(x_mean, x_mean)
+        cross = self.xty - self.n * x_mean * y_mean
+
+        # One-hot blocks are collinear once centred; lstsq returns the minimum-norm solution
+        coef = np.linalg.lstsq(gram, cross, rcond=1e-10)[0]
+
+        model = LinearRegression()
+        model.coef_ = coef
+        model.intercept_ = y_mean - float(x_mean @ coef)
+        model.n_features_in_ = len(coef)
+        return model
+
+
+def classification_report_from_confusion(cm):
+    """Per-class precision / recall / f1 from a 2 x 2 confusion matrix (rows: true, cols: predicted)."""
+    lines = [f"{'':>12}{'precision':>10}{'recall':>10}{'f1-score':>10}{'support':>10}", ""]
+    for label in (0, 1):
+        tp = cm[label, label]
+        precision = tp / cm[:, label].sum() if cm[:, label].sum() else 0.0
+        recall = tp / cm[label].sum() if cm[label].sum() else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        lines.append(f"{label:>12}{precision:>10.2f}{recall:>10.2f}{f1:>10.2f}{int(cm[label].sum()):>10}")
+    return "\n".join(lines)
+
+
+# -------- Training --------
+def train_streaming(path, numeric_cols, categorical_cols, build_preprocessor, chunk_size=100000,
+                    epochs=5, batch_size=256, reservoir_size=100000, test_size=0.2, seed=42):
+    """
+    Fit the price and quick-sale pipelines without loading `path`.
+    Returns (price_pipeline, price_metrics, quicksale_pipeline, quicksale_metrics, quicksale_report).
+    """
+    price_features = numeric_cols + categorical_cols
+    qs_features = numeric_cols + categorical_cols + ["Price"]
+    columns = qs_features + ["Sold_Within_Week"]
+
+    def chunks(test=False):
+        return iter_split(path, columns, chunk_size, test=test, test_size=test_size, seed=seed)
+
+    # Pass 1: preprocessing statistics
+    stats = StreamingStats(numeric_cols + ["Price"], categorical_cols, reservoir_size, seed)
+    for chunk in chunks():
+        stats.update(chunk)
+    print(f"Pass 1: statistics of {stats.n_rows} training rows")
+
+    price_pre = fitted_preprocessor(build_preprocessor, stats, numeric_cols, categorical_cols, price_features)
+    qs_pre = fitted_preprocessor(build_preprocessor, stats, numeric_cols + ["Price"], categorical_cols, qs_features)
+
+    # Passes 2..: normal equations (first epoch only) + SGD
+    normal = None
+    # alpha = 1 / n matches the L2 penalty of LogisticRegression(C=1.0); averaged
+    # SGD keeps the final weights close to that optimum in a few epochs
+    sgd = SGDClassifier(loss="log_loss", alpha=1.0 / stats.n_rows, average=True, random_state=seed)
+    rng = np.random.default_rng(seed)
+
+    for epoch in range(epochs):
+        for chunk in chunks():
+            if epoch == 0:
+                X = to_dense(price_pre.transform(chunk[price_features]))
+                if normal is None:
+                    normal = NormalEquations(X.shape[1])
+                normal.update(X, chunk["Price"].to_numpy(dtype=float))
+
+            X = to_dense(qs_pre.transform(chunk[qs_features]))
+            y = chunk["Sold_Within_Week"].to_numpy(dtype=int)
+            order = rng.permutation(len(y))
+            for start in range(0, len(y), batch_size):
+                batch = order[start:start + batch_size]
+                sgd.partial_fit(X[batch], y[batch], classes=[0, 1])
+        print(f"Pass {epoch + 2}: epoch {epoch + 1}/{epochs}")
+
+    price_pipeline = Pipeline([("preprocess", price_pre), ("model", normal.solve())])
+    quicksale_pipeline = Pipeline([("preprocess", qs_pre), ("model", sgd)])
+
+    # Last pass: test metrics
+    n, abs_err, sq_err, sum_y, sum_y2 = 0, 0.0, 0.0, 0.0, 0.0
+    cm = np.zeros((2, 2), dtype=np.int64)
+    for chunk in chunks(test=True):
+        y = chunk["Price"].to_numpy(dtype=float)
+        err = y - price_pipeline.predict(chunk[price_features])
+        n += len(y)
+        abs_err += float(np.abs(err).sum())
+        sq_err += float((err ** 2).sum())
+        sum_y += float(y.sum())
+        sum_y2 += float((y ** 2).sum())
+
+        y_qs = chunk["Sold_Within_Week"].to_numpy(dtype=int)
+        pred = quicksale_pipeline.predict(chunk[qs_features]).astype(int)
+        cm += np.bincount(2 * y_qs + pred, minlength=4).reshape(2, 2)
+    print(f"Pass {epochs + 2}: evaluated {n} test rows")
+
+    price_metrics = {"mae": abs_err / n, "r2": 1.0 - sq_err / (sum_y2 - sum_y ** 2 / n)}
+    quicksale_metrics = {"accuracy": float(np.trace(cm) / cm.sum())}
+    return price_pipeline, price_metrics, quicksale_pipeline, quicksale_metrics, classification_report_from_confusion(cm)
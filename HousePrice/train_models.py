@@ -1,15 +1,24 @@
+import argparse
 import os
+import sys
 import joblib
-import pandas as pd
+import numpy as np
 
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from sklearn.impute import SimpleImputer
-from sklearn.linear_model import LinearRegression, LogisticRegression
+from sklearn.ensemble import HistGradientBoostingClassifier, HistGradientBoostingRegressor
+from sklearn.linear_model import Lasso, LinearRegression, LogisticRegression, Ridge
 from sklearn.metrics import mean_absolute_error, r2_score, accuracy_score, classification_report
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.datasets import load_dataset
+from common.memory import peak_rss_mb
+from common.registry import ModelRegistry
+from common.sweep import grid, leaderboard_frame, print_leaderboard, run_sweep
+from streaming import split_mask, train_streaming
 
 DATA_PATH = "house_sales.csv"
 MODEL_DIR = "models"
@@ -18,10 +27,13 @@ os.makedirs(MODEL_DIR, exist_ok=True)
 PRICE_MODEL_PATH = os.path.join(MODEL_DIR, "price_model.pkl")
 QUICKSALE_MODEL_PATH = os.path.join(MODEL_DIR, "quicksale_model.pkl")
 
+# Versioned copies picked up by running APIs (watcher or POST /admin/reload)
+REGISTRY = ModelRegistry(os.getenv("MODEL_REGISTRY", os.path.join(MODEL_DIR, "registry")))
 
-def build_preprocessor(numeric_cols, categorical_cols):
+
+def build_preprocessor(numeric_cols, categorical_cols, numeric_strategy="median"):
     numeric_pipe = Pipeline([
-        ("imputer", SimpleImputer(strategy="median")),
+        ("imputer", SimpleImputer(strategy=numeric_strategy)),
         ("scaler", StandardScaler())
     ])
 
@@ -36,70 +48,207 @@ def build_preprocessor(numeric_cols, categorical_cols):
     ])
 
 
-def main():
-    df = pd.read_csv(DATA_PATH)
-
-    # Common feature groups
-    numeric_cols = [
-        "Square_Footage", "Bedrooms", "Bathrooms", "Age", "Garage_Spaces",
-        "Lot_Size", "Floors", "Neighborhood_Rating", "Condition",
-        "School_Rating", "Distance_To_Center_KM"
-    ]
-    categorical_cols = [
-        "Has_Pool", "Renovated", "Location_Type"
-    ]
+# Common feature groups
+NUMERIC_COLS = [
+    "Square_Footage", "Bedrooms", "Bathrooms", "Age", "Garage_Spaces",
+    "Lot_Size", "Floors", "Neighborhood_Rating", "Condition",
+    "School_Rating", "Distance_To_Center_KM"
+]
+CATEGORICAL_COLS = [
+    "Has_Pool", "Renovated", "Location_Type"
+]
+
+
+# -------- Sweep (--sweep) --------
+def sweep_spec(task):
+    """(preprocessors, candidates, scoring) searched for each model."""
+    numeric_cols = NUMERIC_COLS if task == "price" else NUMERIC_COLS + ["Price"]
+    preprocessors = {
+        "median": build_preprocessor(numeric_cols, CATEGORICAL_COLS),
+        "mean": build_preprocessor(numeric_cols, CATEGORICAL_COLS, numeric_strategy="mean")
+    }
+
+    if task == "price":
+        candidates = (
+            grid("linear", LinearRegression(), {}, ["median", "mean"])
+            + grid("ridge", Ridge(), {"alpha": [0.1, 1.0, 10.0, 100.0]}, ["median", "mean"])
+            + grid("lasso", Lasso(max_iter=5000), {"alpha": [10.0, 100.0, 1000.0]}, ["median"])
+            + grid("hist_gb", HistGradientBoostingRegressor(random_state=42),
+                   {"learning_rate": [0.05, 0.1], "max_iter": [100, 300]}, ["median"])
+        )
+        return preprocessors, candidates, "neg_mean_absolute_error"
+
+    candidates = (
+        grid("logistic", LogisticRegression(max_iter=1000), {"C": [0.01, 0.1, 1.0, 10.0]}, ["median", "mean"])
+        + grid("logistic_balanced", LogisticRegression(max_iter=1000, class_weight="balanced"), {"C": [0.1, 1.0]}, ["median"])
+        + grid("hist_gb", HistGradientBoostingClassifier(random_state=42),
+               {"learning_rate": [0.05, 0.1], "max_iter": [100, 300]}, ["median"])
+    )
+    return preprocessors, candidates, "accuracy"
+
+
+def sweep_selector(args):
+    """select(task, X_train, y_train) for train_in_memory: the sweep winner, unfitted."""
+    def select(task, X_train, y_train):
+        preprocessors, candidates, scoring = sweep_spec(task)
+        rows, best = run_sweep(
+            X_train, y_train, preprocessors, candidates, scoring,
+            cv=args.folds, stratify=task == "quicksale", halving=not args.no_halving,
+            eta=args.eta, n_jobs=args.jobs
+        )
+        print_leaderboard(rows, f"{task} ({scoring}, {args.folds}-fold)")
+
+        path = os.path.join(MODEL_DIR, f"{task}_leaderboard.csv")
+        leaderboard_frame(rows).to_csv(path, index=False)
+        print(f"✅ Saved: {path}")
+        return best
+
+    return select
+
+
+def train_in_memory(df, test_mask=None, select=None):
+    """
+    Fit both pipelines on a DataFrame. `test_mask` replaces the random
+    train_test_split (used by --compare to share the streaming split);
+    `select(task, X_train, y_train)` picks the pipelines instead of the
+    defaults (used by --sweep).
+    """
+    numeric_cols, categorical_cols = NUMERIC_COLS, CATEGORICAL_COLS
 
     # -------- Use case 1: Linear Regression (Price) --------
     X_price = df[numeric_cols + categorical_cols]
     y_price = df["Price"]
 
-    Xp_train, Xp_test, yp_train, yp_test = train_test_split(
-        X_price, y_price, test_size=0.2, random_state=42
-    )
+    if test_mask is None:
+        Xp_train, Xp_test, yp_train, yp_test = train_test_split(
+            X_price, y_price, test_size=0.2, random_state=42
+        )
+    else:
+        Xp_train, Xp_test, yp_train, yp_test = X_price[~test_mask], X_price[test_mask], y_price[~test_mask], y_price[test_mask]
 
-    preprocessor_price = build_preprocessor(numeric_cols, categorical_cols)
+    if select is None:
+        preprocessor_price = build_preprocessor(numeric_cols, categorical_cols)
 
-    price_pipeline = Pipeline([
-        ("preprocess", preprocessor_price),
-        ("model", LinearRegression())
-    ])
+        price_pipeline = Pipeline([
+            ("preprocess", preprocessor_price),
+            ("model", LinearRegression())
+        ])
+    else:
+        price_pipeline = select("price", Xp_train, yp_train)
 
     price_pipeline.fit(Xp_train, yp_train)
     yp_pred = price_pipeline.predict(Xp_test)
 
-    print("\n=== Linear Regression: Price ===")
-    print("MAE:", mean_absolute_error(yp_test, yp_pred))
-    print("R2 :", r2_score(yp_test, yp_pred))
-
-    joblib.dump(price_pipeline, PRICE_MODEL_PATH)
-    print(f"✅ Saved: {PRICE_MODEL_PATH}")
+    price_metrics = {
+        "mae": float(mean_absolute_error(yp_test, yp_pred)),
+        "r2": float(r2_score(yp_test, yp_pred))
+    }
 
     # -------- Use case 2: Logistic Regression (Quick Sale) --------
     # Uses same features + Price
     X_qs = df[numeric_cols + categorical_cols + ["Price"]]
     y_qs = df["Sold_Within_Week"].astype(int)
 
-    Xq_train, Xq_test, yq_train, yq_test = train_test_split(
-        X_qs, y_qs, test_size=0.2, random_state=42, stratify=y_qs
-    )
+    if test_mask is None:
+        Xq_train, Xq_test, yq_train, yq_test = train_test_split(
+            X_qs, y_qs, test_size=0.2, random_state=42, stratify=y_qs
+        )
+    else:
+        Xq_train, Xq_test, yq_train, yq_test = X_qs[~test_mask], X_qs[test_mask], y_qs[~test_mask], y_qs[test_mask]
 
-    preprocessor_qs = build_preprocessor(numeric_cols + ["Price"], categorical_cols)
+    if select is None:
+        preprocessor_qs = build_preprocessor(numeric_cols + ["Price"], categorical_cols)
 
-    quicksale_pipeline = Pipeline([
-        ("preprocess", preprocessor_qs),
-        ("model", LogisticRegression(max_iter=1000))
-    ])
+        quicksale_pipeline = Pipeline([
+            ("preprocess", preprocessor_qs),
+            ("model", LogisticRegression(max_iter=1000))
+        ])
+    else:
+        quicksale_pipeline = select("quicksale", Xq_train, yq_train)
 
     quicksale_pipeline.fit(Xq_train, yq_train)
     yq_pred = quicksale_pipeline.predict(Xq_test)
 
+    quicksale_metrics = {"accuracy": float(accuracy_score(yq_test, yq_pred))}
+    report = classification_report(yq_test, yq_pred)
+
+    return price_pipeline, price_metrics, quicksale_pipeline, quicksale_metrics, report
+
+
+def train(args):
+    if args.streaming:
+        return train_streaming(
+            DATA_PATH, NUMERIC_COLS, CATEGORICAL_COLS, build_preprocessor,
+            chunk_size=args.chunk_size, epochs=args.epochs, batch_size=args.batch_size,
+            reservoir_size=args.reservoir_size
+        )
+    select = sweep_selector(args) if args.sweep else None
+    return train_in_memory(load_dataset(DATA_PATH), select=select)
+
+
+def compare(args):
+    """Fit both ways on the same (hashed) split and print the metrics side by side."""
+    args.streaming = True
+    streamed = train(args)
+    streamed_peak = peak_rss_mb()
+
+    df = load_dataset(DATA_PATH)
+    in_memory = train_in_memory(df, split_mask(np.arange(len(df))))
+
+    print(f"\n{'metric':<20}{'in-memory':>14}{'streaming':>14}")
+    for name, i in (("price mae", 1), ("price r2", 1), ("quicksale accuracy", 3)):
+        key = name.split()[-1]
+        print(f"{name:<20}{in_memory[i][key]:>14.4f}{streamed[i][key]:>14.4f}")
+    print(f"Peak memory: streaming {streamed_peak} MB, after in-memory {peak_rss_mb()} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the price and quick-sale models")
+    parser.add_argument("--streaming", action="store_true", help="read the CSV in chunks (out of core)")
+    parser.add_argument("--compare", action="store_true", help="train both ways on the same split, save nothing")
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--epochs", type=int, default=5, help="SGD passes for the quick-sale model (streaming)")
+    parser.add_argument("--batch-size", type=int, default=256, help="SGD mini-batch size (streaming)")
+    parser.add_argument("--reservoir-size", type=int, default=100000, help="values kept per column for medians (streaming)")
+    parser.add_argument("--sweep", action="store_true", help="pick each model by a parallel k-fold CV sweep")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--eta", type=int, default=3, help="successive halving: keep the best 1/eta each round")
+    parser.add_argument("--no-halving", action="store_true", help="score every candidate on every fold")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args)
+        return
+
+    price_pipeline, price_metrics, quicksale_pipeline, quicksale_metrics, report = train(args)
+
+    print("\n=== Linear Regression: Price ===")
+    if args.sweep:
+        print("Model:", price_pipeline[-1])
+    print("MAE:", price_metrics["mae"])
+    print("R2 :", price_metrics["r2"])
+
+    joblib.dump(price_pipeline, PRICE_MODEL_PATH)
+    print(f"✅ Saved: {PRICE_MODEL_PATH}")
+
+    version = REGISTRY.register("price", price_pipeline, metrics=price_metrics)
+    print(f"✅ Registered: price {version}")
+
     print("\n=== Logistic Regression: Sold_Within_Week ===")
-    print("Accuracy:", accuracy_score(yq_test, yq_pred))
-    print(classification_report(yq_test, yq_pred))
+    if args.sweep:
+        print("Model:", quicksale_pipeline[-1])
+    print("Accuracy:", quicksale_metrics["accuracy"])
+    print(report)
 
     joblib.dump(quicksale_pipeline, QUICKSALE_MODEL_PATH)
     print(f"✅ Saved: {QUICKSALE_MODEL_PATH}")
 
+    version = REGISTRY.register("quicksale", quicksale_pipeline, metrics=quicksale_metrics)
+    print(f"✅ Registered: quicksale {version}")
+
+    print(f"\nPeak memory: {peak_rss_mb()} MB")
+
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,23 @@
+import os
+import sys
+
 import streamlit as st
-import requests
 import pandas as pd
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.api_client import ApiClient
+
 API_BASE = "http://127.0.0.1:8000"
 
+
+# One pooled keep-alive session for the life of the server, not one connection per rerun
+@st.cache_resource(show_spinner=False)
+def api_client():
+    return ApiClient(API_BASE)
+
+
+api = api_client()
+
 st.set_page_config(page_title="House Sales Predictor", page_icon="🏠", layout="wide")
 
 st.markdown(
@@ -71,7 +85,7 @@ with tab1:
     if submitted:
         with st.spinner("Calling API..."):
             try:
-                r = requests.post(f"{API_BASE}/predict/price", json=payload, timeout=10)
+                r = api.post("/predict/price", json=payload)
                 if r.status_code == 200:
                     out = r.json()
                     st.success(f"Predicted Price: ${out['predicted_price']:,.2f}")
@@ -90,7 +104,7 @@ with tab2:
     if submitted:
         with st.spinner("Calling API..."):
             try:
-                r = requests.post(f"{API_BASE}/predict/quicksale", json=payload, timeout=10)
+                r = api.post("/predict/quicksale", json=payload)
                 if r.status_code == 200:
                     out = r.json()
                     sold = out["sold_within_week"]
@@ -113,22 +127,19 @@ with tab3:
 
     colA, colB = st.columns(2)
 
-    with colA:
-        st.markdown("### 💰 Price Predictions")
-        try:
-            r = requests.get(f"{API_BASE}/history/price", timeout=10)
-            rows = r.json()["rows"]
-            df = pd.DataFrame(rows, columns=["id", "payload", "predicted_price", "created_at"])
-            st.dataframe(df, use_container_width=True)
-        except Exception as e:
-            st.error(f"History error: {e}")
-
-    with colB:
-        st.markdown("### ⚡ Quick Sale Predictions")
-        try:
-            r = requests.get(f"{API_BASE}/history/quicksale", timeout=10)
-            rows = r.json()["rows"]
-            df = pd.DataFrame(rows, columns=["id", "payload", "label", "probability", "created_at"])
-            st.dataframe(df, use_container_width=True)
-        except Exception as e:
-            st.error(f"History error: {e}")
+    # Both tables in one concurrent round trip; cached for a few seconds across reruns
+    results = api.get_many(["/history/price", "/history/quicksale"])
+
+    for col, title, r in zip(
+        (colA, colB), ("### 💰 Price Predictions", "### ⚡ Quick Sale Predictions"), results
+    ):
+        with col:
+            st.markdown(title)
+            try:
+                if isinstance(r, Exception):
+                    raise r
+                out = r.json()
+                df = pd.DataFrame(out["rows"], columns=out["columns"])
+                st.dataframe(df, use_container_width=True)
+            except Exception as e:
+                st.error(f"History error: {e}")
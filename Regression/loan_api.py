@@ -2,18 +2,67 @@
 # Loan Approval FastAPI with SQLite Logging
 # ============================================
 
-import joblib
+import os
+import sys
 import pandas as pd
 import sqlite3
-from datetime import datetime
+from datetime import date, datetime
+from typing import Optional
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import StreamingResponse
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.cache import PredictionCache
+from common.fastpath import compile_checked
+from common.history import apply_migrations, daily_aggregates, date_conditions, fetch_page, stream_jsonl
+from common.memory import memory_usage, report_memory
+from common.metrics import ServiceMetrics
+from common.microbatch import MicroBatcher
+from common.prediction_log import PredictionLogger
+from common.registry import ModelHandle, ModelRegistry
+from common.schemas import RejectionCounter
+from loan_schema import LoanApplication
+
+# --------------------------------------------
+# Result cache for repeated applications (keyed by payload + model version)
+# --------------------------------------------
+CACHE = PredictionCache(
+    maxsize=int(os.getenv("PREDICTION_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PREDICTION_CACHE_TTL", "300"))
+)
+CACHE_LOG_HITS = os.getenv("CACHE_LOG_HITS", "1") == "1"
+
+# --------------------------------------------
+# Load trained model (pipeline) from the versioned registry
 # --------------------------------------------
-# Load trained model (pipeline)
+# Compiled NumPy kernel, verified against the pipeline on every (re)load
+# (None if it can't be compiled or FAST_PATH=0)
+def compile_kernel(pipeline):
+    return compile_checked(pipeline) if os.getenv("FAST_PATH", "1") == "1" else None
+
+REGISTRY = ModelRegistry(os.getenv("MODEL_REGISTRY", "model_registry"))
+
+# loan_model.current is swapped atomically by /admin/reload or the manifest watcher.
+# Arrays are memory-mapped read-only (ARTIFACT_MMAP=0 to disable) so uvicorn workers share them.
+loan_model = ModelHandle(
+    REGISTRY, "loan",
+    legacy_path="loan_model.pkl",
+    prepare=compile_kernel,
+    on_swap=lambda loaded: CACHE.bind_version(loaded.version),
+    mmap_mode="r" if os.getenv("ARTIFACT_MMAP", "1") == "1" else None
+)
+CACHE.bind_version(loan_model.current.version)
+loan_model.watch(float(os.getenv("MODEL_WATCH_INTERVAL", "10")))
+
+# --------------------------------------------
+# Micro-batching: without a kernel, concurrent requests share one predict_proba call
 # --------------------------------------------
-model_pipeline = joblib.load("loan_model.pkl")
+BATCHER = MicroBatcher(
+    lambda rows, loaded: loaded.model.predict_proba(pd.DataFrame(rows))[:, 1],
+    max_batch_size=int(os.getenv("BATCH_MAX_SIZE", "64")),
+    max_latency_ms=float(os.getenv("BATCH_MAX_LATENCY_MS", "2"))
+)
 
 # --------------------------------------------
 # Initialize FastAPI app
@@ -24,11 +73,33 @@ app = FastAPI(
     version="1.0"
 )
 
+# Requests failing the LoanApplication schema are rejected (422) before any model work
+REJECTIONS = RejectionCounter().install(app)
+
+# Prometheus /metrics: per-route request counts, latency and stage histograms
+METRICS = ServiceMetrics().install(app)
+METRICS.track_model(loan_model)
+
 # --------------------------------------------
 # Initialize SQLite database
 # --------------------------------------------
 DB_NAME = "predictions.db"
 
+# Schema changes, applied once each (tracked in PRAGMA user_version)
+MIGRATIONS = [
+    # 1: indexes for history filters and pagination
+    """
+    CREATE INDEX IF NOT EXISTS idx_loan_created_at ON loan_predictions(created_at);
+    CREATE INDEX IF NOT EXISTS idx_loan_status_created_at ON loan_predictions(loan_status, created_at);
+    CREATE INDEX IF NOT EXISTS idx_loan_probability ON loan_predictions(approval_probability);
+    """,
+
+    # 2: registry version of the model that made each prediction
+    """
+    ALTER TABLE loan_predictions ADD COLUMN model_version TEXT;
+    """
+]
+
 def init_db():
     conn = sqlite3.connect(DB_NAME)
     cursor = conn.cursor()
@@ -54,46 +125,38 @@ def init_db():
     conn.commit()
     conn.close()
 
+    apply_migrations(DB_NAME, MIGRATIONS)
+
 # Run DB initialization at startup
 init_db()
 
-# --------------------------------------------
-# Request schema (input validation)
-# --------------------------------------------
-class LoanApplication(BaseModel):
-    ApplicantIncome: float = Field(..., ge=0)
-    CoapplicantIncome: float = Field(..., ge=0)
-    LoanAmount: float = Field(..., ge=0)
-    Loan_Amount_Term: int = Field(..., gt=0)
-    Credit_History: int = Field(..., ge=0, le=1)
-    Married: str
-    Self_Employed: str
-    Education: str
-    Property_Area: str
+# Predictions are queued and written in batches by a background thread
+LOGGER = PredictionLogger(DB_NAME)
+METRICS.track_logger(LOGGER)
 
 # --------------------------------------------
 # Helper: Save prediction to DB
 # --------------------------------------------
-def save_prediction(data: LoanApplication, status: str, probability: float):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+LOAN_INSERT = """
+INSERT INTO loan_predictions (
+    applicant_income,
+    coapplicant_income,
+    loan_amount,
+    loan_term,
+    credit_history,
+    married,
+    self_employed,
+    education,
+    property_area,
+    loan_status,
+    approval_probability,
+    created_at,
+    model_version
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
 
-    cursor.execute("""
-    INSERT INTO loan_predictions (
-        applicant_income,
-        coapplicant_income,
-        loan_amount,
-        loan_term,
-        credit_history,
-        married,
-        self_employed,
-        education,
-        property_area,
-        loan_status,
-        approval_probability,
-        created_at
-    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
+def save_prediction(data: LoanApplication, status: str, probability: float, model_version: str):
+    LOGGER.log(LOAN_INSERT, (
         data.ApplicantIncome,
         data.CoapplicantIncome,
         data.LoanAmount,
@@ -104,44 +167,150 @@ def save_prediction(data: LoanApplication, status: str, probability: float):
         data.Education,
         data.Property_Area,
         status,
-        probability,
-        datetime.now().isoformat()
+        float(probability),
+        datetime.now().isoformat(),
+        model_version
     ))
 
-    conn.commit()
-    conn.close()
-
 # --------------------------------------------
 # Prediction endpoint
 # --------------------------------------------
 @app.post("/predict")
-def predict_loan(data: LoanApplication):
+async def predict_loan(data: LoanApplication):
     try:
-        # Convert input to DataFrame
-        df = pd.DataFrame([data.dict()])
+        # Predict probability (or reuse a cached result)
+        payload = data.dict()
+        loaded = loan_model.current
+        key = CACHE.key(payload, loaded.version)
+        probability = CACHE.get(key)
+        hit = probability is not None
 
-        # Predict probability
-        probability = model_pipeline.predict_proba(df)[0][1]
+        if not hit:
+            # Batched path: includes the batch wait and the DataFrame build
+            with METRICS.stage("predict"):
+                if loaded.extra is not None:
+                    probability = loaded.extra.predict_one(payload)
+                else:
+                    probability = await BATCHER.submit(payload, loaded)
+            CACHE.set(key, probability)
 
         # Business decision threshold
         THRESHOLD = 0.6
         loan_status = "Approved" if probability >= THRESHOLD else "Rejected"
 
-        # Save to database
-        save_prediction(data, loan_status, probability)
+        # Save to database (queued; the SQLite write itself is prediction_log_write_seconds)
+        if not hit or CACHE_LOG_HITS:
+            with METRICS.stage("db_write"):
+                save_prediction(data, loan_status, probability, loaded.version)
 
         return {
             "loan_status": loan_status,
-            "approval_probability": round(float(probability), 4)
+            "approval_probability": round(float(probability), 4),
+            "model_version": loaded.version
         }
 
     except Exception as e:
         # Do NOT hide the error (important for debugging)
         raise HTTPException(status_code=500, detail=str(e))
 
+# --------------------------------------------
+# History endpoints (newest first, keyset pagination via before_id)
+# --------------------------------------------
+HISTORY_COLUMNS = [
+    "id", "applicant_income", "coapplicant_income", "loan_amount", "loan_term",
+    "credit_history", "married", "self_employed", "education", "property_area",
+    "loan_status", "approval_probability", "created_at", "model_version"
+]
+
+def history_conditions(since, until, status, min_prob, max_prob):
+    return date_conditions(since, until) + [
+        ("loan_status = ?", status),
+        ("approval_probability >= ?", min_prob),
+        ("approval_probability <= ?", max_prob)
+    ]
+
+@app.get("/history")
+def history(
+    limit: int = Query(20, ge=1, le=1000),
+    before_id: Optional[int] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    status: Optional[str] = Query(None, pattern="^(Approved|Rejected)$"),
+    min_prob: Optional[float] = Query(None, ge=0, le=1),
+    max_prob: Optional[float] = Query(None, ge=0, le=1)
+):
+    conditions = history_conditions(since, until, status, min_prob, max_prob)
+    return fetch_page(DB_NAME, "loan_predictions", HISTORY_COLUMNS, conditions, before_id, limit)
+
+@app.get("/history/daily")
+def history_daily(since: Optional[date] = None, until: Optional[date] = None):
+    aggregates = {
+        "count": "COUNT(*)",
+        "approved": "SUM(loan_status = 'Approved')",
+        "mean_probability": "AVG(approval_probability)",
+        "mean_loan_amount": "AVG(loan_amount)"
+    }
+    return {"days": daily_aggregates(DB_NAME, "loan_predictions", aggregates, date_conditions(since, until))}
+
+@app.get("/history/export")
+def history_export(
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    status: Optional[str] = Query(None, pattern="^(Approved|Rejected)$"),
+    min_prob: Optional[float] = Query(None, ge=0, le=1),
+    max_prob: Optional[float] = Query(None, ge=0, le=1)
+):
+    conditions = history_conditions(since, until, status, min_prob, max_prob)
+    return StreamingResponse(
+        stream_jsonl(DB_NAME, "loan_predictions", HISTORY_COLUMNS, conditions),
+        media_type="application/x-ndjson"
+    )
+
 # --------------------------------------------
 # Health check endpoint (optional but useful)
 # --------------------------------------------
 @app.get("/health")
 def health():
     return {"status": "OK"}
+
+@app.get("/stats/logging")
+def logging_stats():
+    return LOGGER.stats()
+
+@app.get("/stats/cache")
+def cache_stats():
+    return CACHE.stats()
+
+@app.get("/stats/memory")
+def memory_stats():
+    return memory_usage()
+
+@app.get("/stats/validation")
+def validation_stats():
+    return REJECTIONS.stats()
+
+# --------------------------------------------
+# Model registry endpoints
+# --------------------------------------------
+@app.get("/models")
+def models():
+    return {"active": loan_model.current.version, "manifest": REGISTRY.manifest("loan")}
+
+@app.post("/admin/reload")
+def reload_model():
+    # In-flight requests keep the model they started with
+    try:
+        changed = loan_model.reload()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed, keeping current model: {e}")
+    return {"changed": changed, "active": loan_model.current.version}
+
+# Per-worker memory report (shared vs private pages of the mapped model)
+@app.on_event("startup")
+def startup():
+    report_memory("Loan Approval API")
+
+# Flush queued predictions before the worker exits
+@app.on_event("shutdown")
+def shutdown():
+    LOGGER.close()
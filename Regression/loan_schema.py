@@ -0,0 +1,31 @@
+# ============================================
+# Loan application feature schema
+# ============================================
+#
+# One definition for the request body (loan_api.py, server.py), the
+# Streamlit form (loan_ui.py) and the training column lists (train_loan.py).
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.schemas import Feature, names, request_model
+
+LOAN_FEATURES = [
+    Feature("ApplicantIncome", float, "Applicant Income", ge=0, step=500),
+    Feature("CoapplicantIncome", float, "Coapplicant Income", ge=0, step=500),
+    Feature("LoanAmount", float, "Loan Amount", ge=0, step=10),
+    Feature("Loan_Amount_Term", int, "Loan Term (Months)", gt=0, options=(120, 180, 240, 300, 360)),
+    Feature("Credit_History", int, "Credit History", ge=0, le=1, options=(1, 0)),
+    Feature("Married", str, "Marital Status", choices={"Yes": "Yes", "No": "No"}),
+    Feature("Self_Employed", str, "Self Employed", choices={"No": "No", "Yes": "Yes"}),
+    Feature("Education", str, "Education", choices={"Graduate": "Graduate", "Not Graduate": "Not Graduate"}),
+    Feature("Property_Area", str, "Property Area", choices={"Urban": "Urban", "Semiurban": "Semiurban", "Rural": "Rural"})
+]
+
+# Training columns (one-hot encoded: the string features)
+categorical_cols = names(LOAN_FEATURES, dtype=str)
+numeric_cols = [c for c in names(LOAN_FEATURES) if c not in categorical_cols]
+
+# Request body: all nine fields required, categoricals limited to the known values
+LoanApplication = request_model("LoanApplication", LOAN_FEATURES)
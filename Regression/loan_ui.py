@@ -1,5 +1,25 @@
+import os
+import sys
+
 import streamlit as st
 import requests
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.api_client import ApiClient
+from common.schemas import form_inputs
+from loan_schema import LOAN_FEATURES
+
+API_BASE = "http://127.0.0.1:8000"
+
+
+# Kept across reruns: one pooled keep-alive session instead of a connection per call
+@st.cache_resource(show_spinner=False)
+def api_client():
+    return ApiClient(API_BASE, timeout=5)
+
+
+api = api_client()
 
 # ---------------------------------------
 # Page configuration
@@ -28,26 +48,8 @@ st.divider()
 with st.form("loan_form"):
     st.subheader("📄 Applicant Details")
 
-    col1, col2 = st.columns(2)
-
-    with col1:
-        ApplicantIncome = st.number_input("Applicant Income", min_value=0, step=500)
-        LoanAmount = st.number_input("Loan Amount", min_value=0, step=10)
-        Credit_History = st.selectbox("Credit History", [1, 0])
-
-    with col2:
-        CoapplicantIncome = st.number_input("Coapplicant Income", min_value=0, step=500)
-        Loan_Amount_Term = st.selectbox("Loan Term (Months)", [120, 180, 240, 300, 360])
-
-    col3, col4 = st.columns(2)
-
-    with col3:
-        Married = st.selectbox("Marital Status", ["Yes", "No"])
-        Education = st.selectbox("Education", ["Graduate", "Not Graduate"])
-
-    with col4:
-        Self_Employed = st.selectbox("Self Employed", ["No", "Yes"])
-        Property_Area = st.selectbox("Property Area", ["Urban", "Semiurban", "Rural"])
+    # Widgets and allowed values come from the shared schema the API validates against
+    payload = form_inputs(st, LOAN_FEATURES)
 
     submitted = st.form_submit_button("🔍 Predict Loan Status")
 
@@ -55,25 +57,9 @@ with st.form("loan_form"):
 # API Call
 # ---------------------------------------
 if submitted:
-    payload = {
-        "ApplicantIncome": ApplicantIncome,
-        "CoapplicantIncome": CoapplicantIncome,
-        "LoanAmount": LoanAmount,
-        "Loan_Amount_Term": Loan_Amount_Term,
-        "Credit_History": Credit_History,
-        "Married": Married,
-        "Self_Employed": Self_Employed,
-        "Education": Education,
-        "Property_Area": Property_Area
-    }
-
     with st.spinner("🔄 Analyzing loan eligibility..."):
         try:
-            response = requests.post(
-                "http://127.0.0.1:8000/predict",
-                json=payload,
-                timeout=5
-            )
+            response = api.post("/predict", json=payload)
 
             if response.status_code == 200:
                 result = response.json()
@@ -107,18 +93,15 @@ if submitted:
             st.error(f"⚠️ Unexpected error: {e}")
 
 
-import sqlite3
-import pandas as pd
 st.subheader("📜 Recent Predictions")
 
-conn = sqlite3.connect("predictions.db")
-history_df = pd.read_sql(
-    "SELECT * FROM loan_predictions ORDER BY created_at DESC LIMIT 5",
-    conn
-)
-conn.close()
-
-st.dataframe(history_df)
+# Served by the API from an indexed, paginated query (see /history)
+try:
+    history = api.get("/history", params={"limit": 5}).json()
+    history_df = pd.DataFrame(history["rows"], columns=history["columns"])
+    st.dataframe(history_df)
+except Exception as e:
+    st.error(f"History error: {e}")
 
 
 # ---------------------------------------
@@ -1,15 +1,29 @@
+import os
+import sys
+
 import joblib
 import pandas as pd
 from fastapi import FastAPI
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.schemas import RejectionCounter
+from loan_schema import LoanApplication
+
 app = FastAPI()
 
+# Bad payloads get a 422 from the schema before any pandas / model work
+rejections = RejectionCounter().install(app)
+
 model = joblib.load("loan_model.pkl")
 
 @app.post("/predict")
-def predict(data:dict):
-    df = pd.DataFrame([data])
+def predict(data: LoanApplication):
+    df = pd.DataFrame([data.dict()])
     prediction = model.predict(df)
     return {"predicted_output":int(prediction[0])}
 
+@app.get("/stats/validation")
+def validation_stats():
+    return rejections.stats()
+
 #run command: python -m uvicorn fastapidemo:app --host 0.0.0.0 --port 5000 --reload
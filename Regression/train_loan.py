@@ -0,0 +1,128 @@
+# ============================================
+# Loan Approval model training (script version of logistic_reg.ipynb)
+# ============================================
+#
+#   python train_loan.py                 notebook pipeline (balanced LogisticRegression)
+#   python train_loan.py --sweep         parallel k-fold sweep, winner saved + registered
+#
+# The saved pipeline goes to loan_model.pkl and the model registry, where a
+# running loan_api.py picks it up (watcher or POST /admin/reload).
+
+import argparse
+import os
+import sys
+
+import joblib
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, classification_report, roc_auc_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.datasets import load_dataset
+from common.registry import ModelRegistry
+from common.sweep import grid, leaderboard_frame, print_leaderboard, run_sweep
+from loan_schema import categorical_cols, numeric_cols
+
+DATA_PATH = "loan_data.csv"
+MODEL_PATH = "loan_model.pkl"
+LEADERBOARD_PATH = "loan_leaderboard.csv"
+
+REGISTRY = ModelRegistry(os.getenv("MODEL_REGISTRY", "model_registry"))
+
+
+def build_preprocessor(numeric_strategy="median"):
+    numeric_pipeline = Pipeline([
+        ("imputer", SimpleImputer(strategy=numeric_strategy)),
+        ("scaler", StandardScaler())
+    ])
+
+    categorical_pipeline = Pipeline([
+        ("imputer", SimpleImputer(strategy="most_frequent")),
+        ("encoder", OneHotEncoder(handle_unknown="ignore"))
+    ])
+
+    return ColumnTransformer([
+        ("num", numeric_pipeline, numeric_cols),
+        ("cat", categorical_pipeline, categorical_cols)
+    ])
+
+
+def sweep(X_train, y_train, args):
+    preprocessors = {
+        "median": build_preprocessor(),
+        "mean": build_preprocessor(numeric_strategy="mean")
+    }
+    candidates = (
+        grid("logistic_balanced", LogisticRegression(class_weight="balanced", max_iter=3000),
+             {"C": [0.01, 0.1, 1.0, 10.0]}, ["median", "mean"])
+        + grid("logistic", LogisticRegression(max_iter=3000), {"C": [0.1, 1.0, 10.0]}, ["median"])
+        + grid("hist_gb", HistGradientBoostingClassifier(random_state=42),
+               {"learning_rate": [0.05, 0.1], "max_depth": [3, None]}, ["median"])
+    )
+
+    rows, best = run_sweep(
+        X_train, y_train, preprocessors, candidates, "roc_auc",
+        cv=args.folds, stratify=True, halving=not args.no_halving, eta=args.eta, n_jobs=args.jobs
+    )
+    print_leaderboard(rows, f"loan (roc_auc, {args.folds}-fold)")
+
+    leaderboard_frame(rows).to_csv(LEADERBOARD_PATH, index=False)
+    print(f"✅ Saved: {LEADERBOARD_PATH}")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the loan approval model")
+    parser.add_argument("--sweep", action="store_true", help="pick the model by a parallel k-fold CV sweep")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--eta", type=int, default=3, help="successive halving: keep the best 1/eta each round")
+    parser.add_argument("--no-halving", action="store_true", help="score every candidate on every fold")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    df = load_dataset(DATA_PATH)
+    df = df.dropna(subset=["Loan_Status"])
+
+    X = df.drop(columns=["Loan_Status", "Loan_ID", "Gender", "Dependents"])
+    y = df["Loan_Status"].map({"Y": 1, "N": 0})
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42
+    )
+
+    if args.sweep:
+        model_pipeline = sweep(X_train, y_train, args)
+    else:
+        model_pipeline = Pipeline([
+            ("preprocess", build_preprocessor()),
+            ("model", LogisticRegression(class_weight="balanced"))
+        ])
+
+    model_pipeline.fit(X_train, y_train)
+
+    y_pred = model_pipeline.predict(X_test)
+    metrics = {
+        "accuracy": float(accuracy_score(y_test, y_pred)),
+        "roc_auc": float(roc_auc_score(y_test, model_pipeline.predict_proba(X_test)[:, 1]))
+    }
+
+    print("\n=== Loan Approval ===")
+    print("Model   :", model_pipeline[-1])
+    print("Accuracy:", metrics["accuracy"])
+    print("ROC AUC :", metrics["roc_auc"])
+    print(classification_report(y_test, y_pred))
+
+    joblib.dump(model_pipeline, MODEL_PATH)
+    print(f"✅ Saved: {MODEL_PATH}")
+
+    version = REGISTRY.register("loan", model_pipeline, metrics=metrics)
+    print(f"✅ Registered: loan {version}")
+
+
+if __name__ == "__main__":
+    main()
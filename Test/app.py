@@ -1,10 +1,25 @@
 import streamlit as st
 import pandas as pd
 import pickle
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.datasets import load_dataset
+from common.registry import ModelRegistry
+from common.schemas import form_inputs
+from segmentation import CUSTOMER_FEATURES
 
 # ---------------- LOAD MODEL & SCALER ----------------
-kmeans = pickle.load(open("kmeans_model.pkl", "rb"))
-scaler = pickle.load(open("scaler.pkl", "rb"))
+# Active customer_segments version (updated by the API's /refit),
+# or the notebook pickles before the registry exists
+registry = ModelRegistry(os.getenv("MODEL_REGISTRY", "model_registry"))
+if registry.active_version("customer_segments"):
+    bundle, _ = registry.load("customer_segments")
+    kmeans, scaler = bundle["kmeans"], bundle["scaler"]
+else:
+    kmeans = pickle.load(open("kmeans_model.pkl", "rb"))
+    scaler = pickle.load(open("scaler.pkl", "rb"))
 
 # ---------------- CLUSTER & OFFER MAPPING ----------------
 cluster_to_segment = {
@@ -32,7 +47,7 @@ tabs = st.tabs(["📊 Existing Customers", "🧑 New Customer Prediction"])
 with tabs[0]:
     st.subheader("Existing Customer Segments")
 
-    df_existing = pd.read_csv("Customer_Offers_Existing_Customers.csv")
+    df_existing = load_dataset("Customer_Offers_Existing_Customers.csv")
 
     st.dataframe(df_existing)
 
@@ -45,41 +60,12 @@ with tabs[0]:
 with tabs[1]:
     st.subheader("Predict Segment for New Customer")
 
-    col1, col2 = st.columns(2)
-
-    with col1:
-        age = st.number_input("Age", min_value=18, max_value=100, value=30)
-        annual_income = st.number_input("Annual Income", value=500000)
-        total_spent = st.number_input("Total Amount Spent", value=100000)
-        monthly_purchases = st.number_input("Monthly Purchases", value=3)
-        avg_order_value = st.number_input("Average Order Value", value=3000)
-
-    with col2:
-        app_time = st.number_input("App Time (minutes/day)", value=40)
-        gender = st.selectbox("Gender", ["Male", "Female"])
-        city = st.selectbox("City", ["City_0", "City_1", "City_2", "City_3"])
-        discount = st.selectbox("Discount Usage", ["Low", "Medium", "High"])
-        shopping_time = st.selectbox("Preferred Shopping Time", ["Day", "Night"])
-
-    # ---------------- ENCODING (same logic as training) ----------------
-    gender_map = {"Male": 0, "Female": 1}
-    discount_map = {"Low": 0, "Medium": 1, "High": 2}
-    shopping_time_map = {"Day": 0, "Night": 1}
-    city_map = {"City_0": 0, "City_1": 1, "City_2": 2, "City_3": 3}
+    # Widgets, ranges and category codes come from the shared feature schema
+    # (the same LabelEncoder codes the API validates and the scaler was fitted on)
+    customer = form_inputs(st, CUSTOMER_FEATURES)
 
     if st.button("Predict Customer Segment"):
-        new_customer = pd.DataFrame([{
-            "Age": age,
-            "Gender": gender_map[gender],
-            "City": city_map[city],
-            "AnnualIncome": annual_income,
-            "TotalSpent": total_spent,
-            "MonthlyPurchases": monthly_purchases,
-            "AvgOrderValue": avg_order_value,
-            "AppTimeMinutes": app_time,
-            "DiscountUsage": discount_map[discount],
-            "PreferredShoppingTime": shopping_time_map[shopping_time]
-        }])
+        new_customer = pd.DataFrame([customer])
 
         X_scaled = scaler.transform(new_customer)
         cluster = int(kmeans.predict(X_scaled)[0])
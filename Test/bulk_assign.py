@@ -0,0 +1,168 @@
+"""
+Bulk segment assignment for a whole customer file.
+
+The input (CSV or Parquet, any size) is read in chunks. Each chunk is
+assigned in one matrix product (SegmentClassifier) in a worker process, and comes back with
+Cluster, Customer_Segment and Suggested_Offer columns appended. Chunks are
+written in input order to a CSV or Parquet output, picked by its extension.
+At most 2 x jobs chunks are in flight, so memory stays bounded whatever the
+input size.
+
+    python bulk_assign.py customers.csv Customer_Offers_Existing_Customers.csv
+    python bulk_assign.py customers.parquet segments.parquet --jobs 16 --chunk-size 200000
+
+The output is written to a temp file and renamed when complete.
+"""
+
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import pandas as pd
+
+from segmentation import FEATURES, SegmentClassifier
+
+
+def _is_parquet(path):
+    return path.lower().endswith((".parquet", ".pq"))
+
+
+def read_chunks(path, chunk_size=100000):
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+class ChunkWriter:
+    """Appends DataFrame chunks to one CSV (header once) or Parquet file (schema of the first chunk)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._parquet = None
+        self._first = True
+
+    def write(self, df):
+        if _is_parquet(self.path):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._parquet is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            else:
+                table = pa.Table.from_pandas(df, schema=self._parquet.schema, preserve_index=False)
+            self._parquet.write_table(table)
+        else:
+            df.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+# -------- Worker side --------
+_CLASSIFIER = None
+
+
+def _init_worker(bundle_path):
+    global _CLASSIFIER
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+    _CLASSIFIER = SegmentClassifier.from_bundle(joblib.load(bundle_path, mmap_mode="r"))
+
+
+def assign_chunk(chunk, classifier=None):
+    """`chunk` with Cluster, Customer_Segment and Suggested_Offer appended."""
+    clusters, segments, offers = (classifier or _CLASSIFIER).assign(chunk)
+    return chunk.assign(Cluster=clusters, Customer_Segment=segments, Suggested_Offer=offers)
+
+
+# -------- Driver --------
+def assign_file(input_path, output_path, bundle_path, chunk_size=100000, n_jobs=None, progress=None):
+    """
+    Assign every customer in `input_path` with the {"scaler", "kmeans"} bundle
+    stored at `bundle_path` (a registry artifact). `progress(rows=, chunks=,
+    rows_per_s=)` is called after every written chunk. Returns the final stats.
+    """
+    missing = [c for c in FEATURES if c not in next(read_chunks(input_path, 1)).columns]
+    if missing:
+        raise ValueError(f"Missing feature columns: {missing}")
+
+    n_jobs = n_jobs or os.cpu_count()
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    if _is_parquet(output_path):
+        tmp_path += ".parquet"
+    writer = ChunkWriter(tmp_path)
+
+    rows, chunks = 0, 0
+    start = time.perf_counter()
+
+    def write(df):
+        nonlocal rows, chunks
+        writer.write(df)
+        rows += len(df)
+        chunks += 1
+        if progress:
+            progress(rows=rows, chunks=chunks, rows_per_s=round(rows / (time.perf_counter() - start), 1))
+
+    # spawn: safe to start from a threaded server process
+    ctx = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(n_jobs, mp_context=ctx, initializer=_init_worker, initargs=(bundle_path,)) as pool:
+            in_flight = deque()
+            for chunk in read_chunks(input_path, chunk_size):
+                in_flight.append(pool.submit(assign_chunk, chunk))
+                if len(in_flight) >= 2 * n_jobs:
+                    write(in_flight.popleft().result())
+            while in_flight:
+                write(in_flight.popleft().result())
+        writer.close()
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    seconds = time.perf_counter() - start
+    return {
+        "output_path": output_path,
+        "rows": rows,
+        "chunks": chunks,
+        "seconds": round(seconds, 3),
+        "rows_per_s": round(rows / seconds, 1) if seconds else 0.0
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from common.registry import ModelRegistry
+
+    parser = argparse.ArgumentParser(description="Assign segments and offers to a customer file")
+    parser.add_argument("input", help="CSV or Parquet with the encoded feature columns")
+    parser.add_argument("output", help="CSV or Parquet (by extension)")
+    parser.add_argument("--registry", default=os.getenv("MODEL_REGISTRY", "model_registry"))
+    parser.add_argument("--version", default=None, help="customer_segments version (default: active)")
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    registry.load("customer_segments", args.version)  # verifies the checksum once
+
+    stats = assign_file(
+        args.input, args.output, registry.artifact_path("customer_segments", args.version),
+        chunk_size=args.chunk_size, n_jobs=args.jobs,
+        progress=lambda rows, chunks, rows_per_s: print(f"{rows} rows, {chunks} chunks, {rows_per_s:.0f} rows/s")
+    )
+    print(f"✅ Saved: {stats['output_path']} ({stats['rows']} rows in {stats['seconds']}s, {stats['rows_per_s']:.0f} rows/s)")
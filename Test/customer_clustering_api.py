@@ -1,28 +1,115 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from typing import Optional
+import os
+import sys
 import pandas as pd
 import pickle
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.cache import PredictionCache
+from common.memory import memory_usage, report_memory
+from common.metrics import ServiceMetrics
+from common.microbatch import MicroBatcher
+from common.jobs import BackgroundJob
+from common.registry import ModelHandle, ModelRegistry
+from common.schemas import RejectionCounter
+from bulk_assign import assign_file
+from incremental import refit
+from segmentation import CustomerFeatures, cluster_to_offer, cluster_to_segment, compile_checked
+
 app = FastAPI(title="Customer Clustering API")
 
-kmeans = pickle.load(open("kmeans_model.pkl", "rb"))
-scaler = pickle.load(open("scaler.pkl", "rb"))
+# Malformed payloads are rejected (422) by the schema before any model work; counted here
+rejections = RejectionCounter().install(app)
+
+# Prometheus /metrics: per-route request counts, latency and stage histograms
+metrics = ServiceMetrics().install(app)
+
+# Repeated customers are answered from the cache (keyed by payload + model version)
+cache = PredictionCache(
+    maxsize=int(os.getenv("PREDICTION_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PREDICTION_CACHE_TTL", "300"))
+)
+
+# Scaler + KMeans are versioned together as one {"scaler", "kmeans"} bundle
+# (if_empty: with several workers starting, only one of them bootstraps v1)
+registry = ModelRegistry(os.getenv("MODEL_REGISTRY", "model_registry"))
+if registry.active_version("customer_segments") is None:
+    registry.register(
+        "customer_segments",
+        {"kmeans": pickle.load(open("kmeans_model.pkl", "rb")), "scaler": pickle.load(open("scaler.pkl", "rb"))},
+        note="bootstrapped from kmeans_model.pkl + scaler.pkl",
+        if_empty=True
+    )
+
+# Scaler folded into the centroids, verified against sklearn on every (re)load
+# (None if it can't be built or FAST_PATH=0)
+def compile_kernel(bundle):
+    return compile_checked(bundle) if os.getenv("FAST_PATH", "1") == "1" else None
+
+
+# Centroids / scaler arrays are memory-mapped read-only so uvicorn workers share them
+segments = ModelHandle(
+    registry, "customer_segments",
+    prepare=compile_kernel,
+    on_swap=lambda loaded: cache.bind_version(loaded.version),
+    mmap_mode="r" if os.getenv("ARTIFACT_MMAP", "1") == "1" else None
+)
+cache.bind_version(segments.current.version)
+metrics.track_model(segments)
+segments.watch(float(os.getenv("MODEL_WATCH_INTERVAL", "10")))
+
+
+# -------- Background jobs (/refit, /segments/bulk) --------
+# Files named in requests are relative to DATA_DIR and must stay inside it
+DATA_DIR = os.path.realpath(os.getenv("DATA_DIR", "data"))
+
+
+def data_path(path):
+    """`path` resolved under DATA_DIR; 400 if it leads anywhere else (absolute, .., symlinks)."""
+    resolved = os.path.realpath(os.path.join(DATA_DIR, path))
+    if os.path.commonpath([resolved, DATA_DIR]) != DATA_DIR:
+        raise HTTPException(status_code=400, detail=f"Path outside the data directory: {path}")
+    return resolved
+
 
+def run_refit(path, batch_size, activate, progress):
+    # Mini-batch refit; the new version is swapped in when done
+    version, metrics = refit(registry, path, batch_size=batch_size, activate=activate, progress=progress)
+    segments.reload()
+    return {"version": version, "metrics": metrics}
 
-cluster_to_segment = {
-    0: "High-Value Loyal",
-    1: "Value-Seeking Regular",
-    2: "Price-Sensitive Occasional"
-}
 
-cluster_to_offer = {
-    0: "Exclusive early access to new products + Premium membership with free express delivery",
-    1: "Festival discounts (10–15%) + Loyalty reward points on every purchase",
-    2: "Flash sales and coupon-based discounts + Free shipping on minimum order value"
-}
+def run_bulk(input_path, output_path, chunk_size, jobs, progress):
+    # Pinned to the version active at start, even if a refit lands meanwhile
+    version = segments.current.version
+    stats = assign_file(
+        input_path, output_path, registry.artifact_path("customer_segments", version),
+        chunk_size=chunk_size, n_jobs=jobs, progress=progress
+    )
+    return {**stats, "model_version": version}
+
+
+refit_job = BackgroundJob(run_refit, "refit")
+bulk_job = BackgroundJob(run_bulk, "bulk-assign")
+
+
+def assign_clusters(rows, loaded):
+    bundle = loaded.model
+    return bundle["kmeans"].predict(bundle["scaler"].transform(pd.DataFrame(rows)))
+
+
+# Without a kernel, concurrent requests are scaled and assigned in one vectorized call
+batcher = MicroBatcher(
+    assign_clusters,
+    max_batch_size=int(os.getenv("BATCH_MAX_SIZE", "64")),
+    max_latency_ms=float(os.getenv("BATCH_MAX_LATENCY_MS", "2"))
+)
 
 
 @app.post("/predict")
-def predict_customer(customer: dict):
+async def predict_customer(data: CustomerFeatures):
     """
     Example input:
     {
@@ -39,13 +126,20 @@ def predict_customer(customer: dict):
     }
     """
 
-    df_new = pd.DataFrame([customer])
+    customer = data.dict()
+    loaded = segments.current
+    version = loaded.version
+    key = cache.key(customer, version)
+    cluster = cache.get(key)
 
-    # Apply same scaling as training
-    X_scaled = scaler.transform(df_new)
-
-    # Predict cluster
-    cluster = int(kmeans.predict(X_scaled)[0])
+    if cluster is None:
+        # Apply same scaling as training and predict cluster
+        with metrics.stage("predict"):
+            if loaded.extra is not None:
+                cluster = loaded.extra.predict_one(customer)
+            else:
+                cluster = int(await batcher.submit(customer, loaded))
+        cache.set(key, cluster)
 
     # Map to segment & offer
     segment = cluster_to_segment[cluster]
@@ -54,5 +148,90 @@ def predict_customer(customer: dict):
     return {
         "Predicted_Cluster": cluster,
         "Customer_Segment": segment,
-        "Suggested_Offer": offer
+        "Suggested_Offer": offer,
+        "Model_Version": version
     }
+
+
+@app.on_event("startup")
+def startup():
+    report_memory("Customer Clustering API")
+
+
+@app.get("/stats/cache")
+def cache_stats():
+    return cache.stats()
+
+
+@app.get("/stats/validation")
+def validation_stats():
+    return rejections.stats()
+
+
+@app.get("/stats/memory")
+def memory_stats():
+    return memory_usage()
+
+
+@app.get("/models")
+def models():
+    return {"active": segments.current.version, "manifest": registry.manifest("customer_segments")}
+
+
+class RefitRequest(BaseModel):
+    path: str                  # CSV with the encoded feature columns, under DATA_DIR
+    batch_size: int = 1024
+    activate: bool = True
+
+
+@app.post("/refit", status_code=202)
+def start_refit(req: RefitRequest):
+    path = data_path(req.path)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=400, detail=f"File not found: {req.path}")
+
+    if not refit_job.start(path=path, batch_size=req.batch_size, activate=req.activate):
+        raise HTTPException(status_code=409, detail="A refit is already running")
+    return refit_job.status()
+
+
+@app.get("/refit/status")
+def refit_status():
+    return refit_job.status()
+
+
+class BulkRequest(BaseModel):
+    input_path: str            # CSV / Parquet with the encoded feature columns, under DATA_DIR
+    output_path: str           # CSV / Parquet (by extension), under DATA_DIR
+    chunk_size: int = 100000
+    jobs: Optional[int] = None
+
+
+@app.post("/segments/bulk", status_code=202)
+def start_bulk(req: BulkRequest):
+    input_path, output_path = data_path(req.input_path), data_path(req.output_path)
+    if not os.path.isfile(input_path):
+        raise HTTPException(status_code=400, detail=f"File not found: {req.input_path}")
+    if not os.path.isdir(os.path.dirname(output_path)):
+        raise HTTPException(status_code=400, detail=f"Directory not found for: {req.output_path}")
+    if output_path == input_path:
+        raise HTTPException(status_code=400, detail="output_path must differ from input_path")
+
+    params = {**req.dict(), "input_path": input_path, "output_path": output_path}
+    if not bulk_job.start(**params):
+        raise HTTPException(status_code=409, detail="A bulk assignment is already running")
+    return bulk_job.status()
+
+
+@app.get("/segments/bulk/status")
+def bulk_status():
+    return bulk_job.status()
+
+
+@app.post("/admin/reload")
+def reload_model():
+    try:
+        changed = segments.reload()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed, keeping current model: {e}")
+    return {"changed": changed, "active": segments.current.version}
@@ -0,0 +1,230 @@
+"""
+Incremental customer segmentation with mini-batch K-means.
+
+New customer rows (the encoded FEATURES, as sent to /predict) are streamed
+from a CSV in chunks, scaled with the existing scaler (its statistics stay
+frozen, so centroids keep living in the same space) and folded into the
+current centroids with MiniBatchKMeans.partial_fit.
+
+The static KMeans from train.ipynb is converted on the first refit, with
+its per-centroid counts seeded from the training cluster sizes (a fresh
+MiniBatchKMeans starts at zero and would replace every centroid with the
+first batch's mean). After that the MiniBatchKMeans itself is the model, so
+its counts carry over from one refit to the next. Random reassignment of small
+clusters is disabled: cluster ids keep their meaning (segment / offer).
+
+    python incremental.py new_customers.csv            # refit + register
+    python incremental.py new_customers.csv --no-activate
+
+An interrupted refit resumes from its last checkpoint (same file, same
+mtime and size). A finished one is registered as a new "customer_segments"
+version with centroid stability metrics against the version it started from.
+"""
+
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+
+from segmentation import FEATURES, scale_chunk
+
+MODEL_NAME = "customer_segments"
+CHECKPOINT_PATH = os.path.join("checkpoints", "segments_refit.pkl")
+
+
+def to_minibatch(kmeans, batch_size=1024, seed=42, counts=None):
+    """
+    A MiniBatchKMeans continuing from a fitted (MiniBatch)KMeans: same
+    centroids, each weighted by the rows it was fitted on (`counts`,
+    default: the sizes of its training clusters).
+    """
+    if isinstance(kmeans, MiniBatchKMeans):
+        return kmeans
+
+    centers = np.array(kmeans.cluster_centers_, dtype=np.float64)
+    if counts is None:
+        counts = np.bincount(kmeans.labels_, minlength=kmeans.n_clusters)
+
+    model = MiniBatchKMeans(
+        n_clusters=kmeans.n_clusters,
+        init=centers,
+        n_init=1,
+        batch_size=batch_size,
+        reassignment_ratio=0.0,
+        random_state=seed
+    )
+    # First step on the centroids themselves, each weighted by its cluster size:
+    # they stay where they are and later batches move them by weight
+    model.partial_fit(centers, sample_weight=np.asarray(counts, dtype=np.float64))
+    return model
+
+
+def nearest(centers, X):
+    d = ((X[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+    return d.argmin(axis=1), d.min(axis=1)
+
+
+def centroid_stability(old_centers, new_centers, X_sample):
+    """How far the centroids moved and how many sample customers changed cluster."""
+    old_centers, new_centers = np.asarray(old_centers), np.asarray(new_centers)
+    shift = np.linalg.norm(new_centers - old_centers, axis=1)
+
+    pair = np.linalg.norm(old_centers[:, None] - old_centers[None, :], axis=2)
+    spread = pair[np.triu_indices(len(old_centers), k=1)].mean() if len(old_centers) > 1 else 1.0
+
+    metrics = {
+        "centroid_shift_max": float(shift.max()),
+        "centroid_shift_mean": float(shift.mean()),
+        "relative_shift_max": float(shift.max() / spread),
+        "centroid_shift": [round(float(s), 6) for s in shift]
+    }
+
+    if len(X_sample):
+        old_labels, old_d = nearest(old_centers, X_sample)
+        new_labels, new_d = nearest(new_centers, X_sample)
+        metrics.update({
+            "sample_rows": int(len(X_sample)),
+            "assignment_agreement": float((old_labels == new_labels).mean()),
+            "inertia_per_row_old": float(old_d.mean()),
+            "inertia_per_row_new": float(new_d.mean())
+        })
+    return metrics
+
+
+class RowReservoir:
+    """Uniform sample of at most `size` scaled rows, for the stability metrics."""
+
+    def __init__(self, n_features, size=10000, seed=42):
+        self.size = size
+        self.rows = np.empty((0, n_features))
+        self.seen = 0
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, X):
+        room = self.size - len(self.rows)
+        if room > 0:
+            self.rows = np.vstack([self.rows, X[:room]])
+            self.seen += min(room, len(X))
+            X = X[room:]
+
+        if len(X):
+            t = self.seen + np.arange(len(X))
+            slots = (self.rng.random(len(X)) * (t + 1)).astype(np.int64)
+            keep = slots < self.size
+            self.rows[slots[keep]] = X[keep]
+            self.seen += len(X)
+
+
+def source_signature(path):
+    st = os.stat(path)
+    return {"path": os.path.abspath(path), "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def _save_checkpoint(state, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    joblib.dump(state, tmp)
+    os.replace(tmp, path)
+
+
+def refit(registry, path, batch_size=1024, chunk_size=100000, checkpoint_every=50,
+          checkpoint_path=CHECKPOINT_PATH, activate=True, progress=None):
+    """
+    Stream `path` into the active customer_segments bundle and register the
+    result. Returns (version, metrics). A checkpoint is written after the
+    first chunk that completes `checkpoint_every` more batches;
+    `progress(rows=, batches=)` is called after every chunk.
+    """
+    source = source_signature(path)
+
+    state = None
+    if os.path.exists(checkpoint_path):
+        state = joblib.load(checkpoint_path)
+        if state["source"] != source or registry.active_version(MODEL_NAME) != state["base_version"]:
+            state = None
+
+    if state is None:
+        bundle, entry = registry.load(MODEL_NAME)
+        state = {
+            "source": source,
+            "base_version": entry["version"],
+            "base_centers": np.array(bundle["kmeans"].cluster_centers_),
+            "model": to_minibatch(bundle["kmeans"], batch_size),
+            "scaler": bundle["scaler"],
+            "sample": RowReservoir(len(FEATURES)),
+            "rows": 0,
+            "batches": 0
+        }
+
+    model, scaler = state["model"], state["scaler"]
+    start = time.perf_counter()
+    skip = state["rows"]
+    last_checkpoint = state["batches"]
+
+    for chunk in pd.read_csv(path, usecols=FEATURES, chunksize=chunk_size):
+        # Rows already folded in before the checkpoint
+        if skip >= len(chunk):
+            skip -= len(chunk)
+            continue
+        chunk, skip = chunk.iloc[skip:], 0
+
+        X = scale_chunk(scaler, chunk)
+        for i in range(0, len(X), batch_size):
+            model.partial_fit(X[i:i + batch_size])
+            state["batches"] += 1
+
+        state["rows"] += len(X)
+        state["sample"].update(X)
+        if state["batches"] - last_checkpoint >= checkpoint_every:
+            _save_checkpoint(state, checkpoint_path)
+            last_checkpoint = state["batches"]
+        if progress:
+            progress(rows=state["rows"], batches=state["batches"])
+
+    if state["rows"] == 0:
+        raise ValueError(f"No rows in {path}")
+
+    metrics = centroid_stability(state["base_centers"], model.cluster_centers_, state["sample"].rows)
+    metrics.update({
+        "rows": state["rows"],
+        "batches": state["batches"],
+        "seconds": round(time.perf_counter() - start, 3),
+        "base_version": state["base_version"]
+    })
+
+    version = registry.register(
+        MODEL_NAME, {"kmeans": model, "scaler": scaler},
+        metrics=metrics, activate=activate,
+        note=f"mini-batch refit on {os.path.basename(path)}"
+    )
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return version, metrics
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import sys
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from common.registry import ModelRegistry
+
+    parser = argparse.ArgumentParser(description="Mini-batch refit of the customer segments")
+    parser.add_argument("path", help="CSV with the encoded FEATURES columns")
+    parser.add_argument("--registry", default=os.getenv("MODEL_REGISTRY", "model_registry"))
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--no-activate", action="store_true", help="register without making it active")
+    args = parser.parse_args()
+
+    version, metrics = refit(
+        ModelRegistry(args.registry), args.path,
+        batch_size=args.batch_size, chunk_size=args.chunk_size, activate=not args.no_activate,
+        progress=lambda rows, batches: print(f"{rows} rows, {batches} batches")
+    )
+    print(f"✅ Registered: {MODEL_NAME} {version}")
+    print(json.dumps(metrics, indent=2))
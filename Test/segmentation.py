@@ -0,0 +1,238 @@
+"""
+Customer feature layout and the cluster -> segment / offer mappings, shared
+by the API, bulk assignment (bulk_assign.py) and refits (incremental.py).
+
+SegmentClassifier is the {"scaler", "kmeans"} bundle compiled into one small
+matrix product: the StandardScaler is folded into the centroids, so
+
+    argmin_k ||(x - mean) / scale - c_k||^2  =  argmin_k (x @ A + b)_k
+
+with A[:, k] = -2 w (mean w + c_k), b_k = ||mean w + c_k||^2 and w = 1 / scale
+(the ||x w||^2 term is the same for every k). No DataFrame, no sklearn
+validation per call.
+
+    python segmentation.py                       # equivalence + timing vs sklearn
+    python segmentation.py --data new_customers.csv
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.datasets import load_dataset
+from common.schemas import Feature, names, request_model
+
+# Encoded feature columns, in the order the scaler was fitted on (train.ipynb).
+# Categoricals are LabelEncoder codes (alphabetical order of CustomerData.csv values).
+CUSTOMER_FEATURES = [
+    Feature("Age", float, "Age", ge=18, le=100, default=30),
+    Feature("Gender", int, "Gender", choices={0: "Female", 1: "Male"}),
+    Feature("City", int, "City", choices={
+        0: "Bangalore", 1: "Chennai", 2: "Delhi", 3: "Hyderabad", 4: "Kolkata", 5: "Mumbai", 6: "Pune"
+    }),
+    Feature("AnnualIncome", float, "Annual Income", ge=0, default=500000, step=10000),
+    Feature("TotalSpent", float, "Total Amount Spent", ge=0, default=100000, step=5000),
+    Feature("MonthlyPurchases", float, "Monthly Purchases", ge=0, default=3),
+    Feature("AvgOrderValue", float, "Average Order Value", ge=0, default=3000, step=100),
+    Feature("AppTimeMinutes", float, "App Time (minutes/day)", ge=0, le=1440, default=40),
+    Feature("DiscountUsage", int, "Discount Usage", choices={0: "High", 1: "Low", 2: "Medium"}, default=2),
+    Feature("PreferredShoppingTime", int, "Preferred Shopping Time", choices={0: "Day", 1: "Night"})
+]
+
+FEATURES = names(CUSTOMER_FEATURES)
+
+# /predict request body
+CustomerFeatures = request_model("CustomerFeatures", CUSTOMER_FEATURES)
+
+cluster_to_segment = {
+    0: "High-Value Loyal",
+    1: "Value-Seeking Regular",
+    2: "Price-Sensitive Occasional"
+}
+
+cluster_to_offer = {
+    0: "Exclusive early access to new products + Premium membership with free express delivery",
+    1: "Festival discounts (10–15%) + Loyalty reward points on every purchase",
+    2: "Flash sales and coupon-based discounts + Free shipping on minimum order value"
+}
+
+# Array lookups: SEGMENT_NAMES[clusters] labels a whole batch at once
+SEGMENT_NAMES = np.array([cluster_to_segment[c] for c in sorted(cluster_to_segment)], dtype=object)
+OFFER_NAMES = np.array([cluster_to_offer[c] for c in sorted(cluster_to_offer)], dtype=object)
+
+
+def scale_chunk(scaler, chunk):
+    # Missing values fall back to the scaler means (0 once scaled)
+    frame = chunk[FEATURES].astype(float).fillna(pd.Series(scaler.mean_, index=FEATURES))
+    return scaler.transform(frame)
+
+
+class SegmentClassifier:
+    """
+    predict(rows) -> cluster ids, assign(rows) -> (clusters, segments, offers).
+
+    Rows may be one dict, a list of dicts keyed by FEATURES, a DataFrame, or
+    an ndarray with the FEATURES columns in order. Missing values (None / NaN)
+    are replaced by the scaler means, as in scale_chunk.
+    """
+
+    def __init__(self, mean, scale, centers):
+        mean, scale = np.asarray(mean, dtype=float), np.asarray(scale, dtype=float)
+        centers = np.asarray(centers, dtype=float)
+        if centers.shape[1] != len(FEATURES) or len(mean) != len(FEATURES) or len(scale) != len(FEATURES):
+            raise ValueError(f"Expected {len(FEATURES)} features, got centers {centers.shape}")
+
+        w = 1.0 / scale
+        shifted = mean * w + centers             # (k, n_features)
+        self.fill = mean
+        self.weights = (-2.0 * w * shifted).T    # (n_features, k)
+        self.bias = (shifted ** 2).sum(axis=1)   # (k,)
+        self.n_clusters = len(centers)
+
+        # Plain-Python copies for the single-row path (faster than numpy at 10 x k)
+        self._rows = list(zip(FEATURES, self.fill.tolist(), self.weights.tolist()))
+        self._bias = self.bias.tolist()
+
+    @classmethod
+    def from_bundle(cls, bundle):
+        scaler, kmeans = bundle["scaler"], bundle["kmeans"]
+        if list(getattr(scaler, "feature_names_in_", FEATURES)) != FEATURES:
+            raise ValueError(f"Scaler was fitted on {list(scaler.feature_names_in_)}, expected {FEATURES}")
+
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(len(FEATURES))
+        scale = scaler.scale_ if scaler.with_std else np.ones(len(FEATURES))
+        return cls(mean, scale, kmeans.cluster_centers_)
+
+    @classmethod
+    def from_pickles(cls, scaler_path="scaler.pkl", kmeans_path="kmeans_model.pkl"):
+        import pickle
+        with open(scaler_path, "rb") as f_scaler, open(kmeans_path, "rb") as f_kmeans:
+            return cls.from_bundle({"scaler": pickle.load(f_scaler), "kmeans": pickle.load(f_kmeans)})
+
+    def _matrix(self, rows):
+        # Columns are checked once per call, not per row
+        if isinstance(rows, dict):
+            rows = [rows]
+
+        if isinstance(rows, pd.DataFrame):
+            missing = [c for c in FEATURES if c not in rows.columns]
+            if missing:
+                raise ValueError(f"Missing feature columns: {missing}")
+            X = rows[FEATURES].to_numpy(dtype=float)
+        elif isinstance(rows, np.ndarray):
+            X = np.atleast_2d(rows.astype(float))
+            if X.ndim != 2 or X.shape[1] != len(FEATURES):
+                raise ValueError(f"Expected an (n, {len(FEATURES)}) array, got {rows.shape}")
+        else:
+            try:
+                X = np.array([[r[c] for c in FEATURES] for r in rows], dtype=float).reshape(-1, len(FEATURES))
+            except KeyError:
+                missing = sorted({c for r in rows for c in FEATURES if c not in r}, key=FEATURES.index)
+                raise ValueError(f"Missing feature columns: {missing}") from None
+
+        nan = np.isnan(X)
+        if nan.any():
+            X = np.where(nan, self.fill, X)
+        return X
+
+    def predict(self, rows):
+        return (self._matrix(rows) @ self.weights + self.bias).argmin(axis=1)
+
+    def predict_one(self, row):
+        """Cluster id of one dict row as a plain int (the API path)."""
+        scores = list(self._bias)
+        for col, fill, w in self._rows:
+            if col not in row:
+                raise ValueError(f"Missing feature columns: {[c for c in FEATURES if c not in row]}")
+            v = row[col]
+            v = fill if v is None or v != v else float(v)
+            for k, wk in enumerate(w):
+                scores[k] += v * wk
+        return scores.index(min(scores))
+
+    def assign(self, rows):
+        clusters = self.predict(rows)
+        return clusters, SEGMENT_NAMES[clusters], OFFER_NAMES[clusters]
+
+
+# -------------------------
+# Equivalence check
+# -------------------------
+def reference_predict(bundle, df):
+    return bundle["kmeans"].predict(scale_chunk(bundle["scaler"], df))
+
+
+def synthetic_customers(bundle, n=1000, seed=0):
+    """Random customers spread over the fitted ranges, with some missing values."""
+    scaler = bundle["scaler"]
+    rng = np.random.default_rng(seed)
+    X = scaler.mean_ + rng.normal(0, 2, (n, len(FEATURES))) * scaler.scale_
+    X[rng.random(X.shape) < 0.02] = np.nan
+    return pd.DataFrame(X, columns=FEATURES)
+
+
+def check_equivalence(bundle, classifier, df=None):
+    """Number of rows checked; raises if batch or single-row assignment differs from sklearn."""
+    if df is None:
+        df = synthetic_customers(bundle)
+    df = df[FEATURES]
+
+    expected = reference_predict(bundle, df)
+    batch = classifier.predict(df)
+    single = np.array([classifier.predict_one(r) for r in df.to_dict(orient="records")])
+
+    for got in (batch, single):
+        if not np.array_equal(got, expected):
+            raise AssertionError(f"Segment kernel diverges on {int((got != expected).sum())} of {len(df)} rows")
+    return len(df)
+
+
+def compile_checked(bundle):
+    """SegmentClassifier verified on synthetic rows; None if it can't be built or diverges."""
+    try:
+        classifier = SegmentClassifier.from_bundle(bundle)
+        check_equivalence(bundle, classifier)
+    except (ValueError, AssertionError) as e:
+        print(f"⚠️ Fast path disabled: {e}")
+        return None
+    return classifier
+
+
+if __name__ == "__main__":
+    import argparse
+    import pickle
+
+    parser = argparse.ArgumentParser(description="Compare the segment kernel against scaler + KMeans")
+    parser.add_argument("--scaler", default="scaler.pkl")
+    parser.add_argument("--kmeans", default="kmeans_model.pkl")
+    parser.add_argument("--data", default=None, help="CSV of real customers to compare on")
+    args = parser.parse_args()
+
+    with open(args.scaler, "rb") as f_scaler, open(args.kmeans, "rb") as f_kmeans:
+        bundle = {"scaler": pickle.load(f_scaler), "kmeans": pickle.load(f_kmeans)}
+    classifier = SegmentClassifier.from_bundle(bundle)
+    df = load_dataset(args.data, columns=FEATURES) if args.data else synthetic_customers(bundle)
+
+    print(f"identical clusters on {check_equivalence(bundle, classifier, df)} rows")
+
+    # Timing on complete rows, as /predict receives them
+    rows = df.dropna().to_dict(orient="records")[:500]
+    t0 = time.perf_counter()
+    for r in rows:
+        bundle["kmeans"].predict(bundle["scaler"].transform(pd.DataFrame([r])))
+    t1 = time.perf_counter()
+    for r in rows:
+        classifier.predict_one(r)
+    t2 = time.perf_counter()
+    print(f"single row  sklearn: {1e6 * (t1 - t0) / len(rows):.1f} µs, kernel: {1e6 * (t2 - t1) / len(rows):.2f} µs")
+
+    t0 = time.perf_counter()
+    reference_predict(bundle, df)
+    t1 = time.perf_counter()
+    classifier.predict(df)
+    t2 = time.perf_counter()
+    print(f"{len(df)} rows  sklearn: {1e3 * (t1 - t0):.1f} ms, kernel: {1e3 * (t2 - t1):.1f} ms")
@@ -1,28 +1,54 @@
-import pandas as pd
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics.pairwise import cosine_similarity
+import json
+import os
+import sys
+from typing import List, Literal, Optional
+
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from catalog import LiveCatalog
+from recommender import NEIGHBOR_BLOCK_SCORES
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.jobs import BackgroundJob
+from common.memory import memory_usage, report_memory
+from common.metrics import ServiceMetrics
 
 # -------------------------
 # Load & prepare data
 # -------------------------
-df = pd.read_csv("spotify.csv")
+# Track metadata (Arrow) and normalized features (.npy) exported from
+# spotify.csv and memory-mapped read-only, so uvicorn workers share one
+# copy in the page cache. Re-exported automatically when the CSV changes
+# (or ahead of time: `python recommender.py artifacts`).
+#
+# Search backend:
+#   exact - scores one row against the normalized feature matrix per request,
+#           or reads the precomputed neighbour table when present
+#           (`python recommender.py neighbors --k 50`)
+#   ivf   - approximate IVF index saved next to spotify.csv; IVF_NPROBE trades
+#           recall for latency (`python recommender.py recall` to compare)
+INDEX_TYPE = os.getenv("RECOMMENDER_INDEX", "exact")
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
 
-FEATURES = [
-    "danceability",
-    "energy",
-    "valence",
-    "tempo",
-    "duration_ms",
-    "popularity"
-]
+# Each snapshot also carries the title lookup (seed resolution and
+# autocomplete) and the genre / playlist-category partitions for filters.
+# Tracks added, updated or removed through /catalog are journaled and
+# applied in the background every CATALOG_REFRESH_INTERVAL seconds;
+# compaction into new base artifacts runs every CATALOG_COMPACT_INTERVAL
+# seconds (0: only on POST /catalog/compact).
+CATALOG = LiveCatalog("spotify.csv", kind=INDEX_TYPE, nprobe=IVF_NPROBE)
 
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(df[FEATURES])
+def run_compact(refit, progress):
+    return CATALOG.compact(refit=refit, progress=progress)
 
-# Precompute similarity matrix
-SIM_MATRIX = cosine_similarity(X_scaled)
+compact_job = BackgroundJob(run_compact, "catalog-compact")
+CATALOG.watch(
+    float(os.getenv("CATALOG_REFRESH_INTERVAL", "5")),
+    compact_every=float(os.getenv("CATALOG_COMPACT_INTERVAL", "3600")),
+    on_compact=lambda: compact_job.start(refit=False)
+)
 
 # -------------------------
 # FastAPI app
@@ -32,32 +58,232 @@ app = FastAPI(
     version="1.0"
 )
 
+# Prometheus /metrics: per-route request counts, latency and stage histograms
+METRICS = ServiceMetrics().install(app)
+METRICS.gauge("model_load_seconds", lambda: {INDEX_TYPE: CATALOG.load_seconds}, "Artifact + index load time", label="index")
+METRICS.gauge("catalog_tracks", lambda: {INDEX_TYPE: CATALOG.current.n_live}, "Tracks in the live catalog", label="index")
+
+class RecommendFilters(BaseModel):
+    genre: Optional[List[str]] = None               # any of
+    playlist_category: Optional[List[str]] = None   # any of
+    min_popularity: Optional[float] = None
+    max_popularity: Optional[float] = None
+    min_tempo: Optional[float] = None
+    max_tempo: Optional[float] = None
+
+    def spec(self):
+        return {
+            "genre": self.genre,
+            "playlist_category": self.playlist_category,
+            "popularity": (self.min_popularity, self.max_popularity),
+            "tempo": (self.min_tempo, self.max_tempo)
+        }
+
+    def active(self):
+        return any(v not in (None, []) for v in self.model_dump().values())
+
 class RecommendRequest(BaseModel):
     track_name: str
+    artist: Optional[str] = None    # picks one of several tracks sharing a title
     top_n: int = 5
+    filters: Optional[RecommendFilters] = None
+
+class SeedTrack(BaseModel):
+    track_name: str
+    artist: Optional[str] = None
+
+class PlaylistRequest(BaseModel):
+    tracks: List[SeedTrack] = Field(..., min_length=1, max_length=1000)
+    top_n: int = Field(10, ge=1, le=100)
+    # centroid: closest to the playlist as a whole; max: closest to any one seed
+    mode: Literal["centroid", "max"] = "centroid"
+    filters: Optional[RecommendFilters] = None
+
+class BatchRequest(BaseModel):
+    tracks: List[SeedTrack] = Field(..., min_length=1, max_length=10000)
+    top_n: int = Field(5, ge=1, le=100)
+
+class TrackIn(BaseModel):
+    track_name: str = Field(..., min_length=1)
+    artist: str = Field(..., min_length=1)
+    genre: str = Field(..., min_length=1)
+    playlist_category: str = Field(..., min_length=1)
+    danceability: float = Field(..., ge=0, le=1)
+    energy: float = Field(..., ge=0, le=1)
+    valence: float = Field(..., ge=0, le=1)
+    tempo: float = Field(..., gt=0, le=1000)
+    duration_ms: int = Field(..., gt=0)
+    popularity: int = Field(..., ge=0, le=100)
+
+class TrackKey(BaseModel):
+    track_name: str = Field(..., min_length=1)
+    artist: str = Field(..., min_length=1)
+
+class UpsertRequest(BaseModel):
+    # An existing (title, artist) is replaced, anything else appended
+    tracks: List[TrackIn] = Field(..., min_length=1, max_length=10000)
+
+class DeleteRequest(BaseModel):
+    tracks: List[TrackKey] = Field(..., min_length=1, max_length=10000)
+
+class CompactRequest(BaseModel):
+    refit: bool = False     # re-fit the scaler (and IVF centroids) on the current catalog
+
+# Seeds scored per matrix multiply in /recommend/batch: at most this many, fewer on a large
+# catalog so one block stays within NEIGHBOR_BLOCK_SCORES scores (~64 MB float32)
+BATCH_BLOCK_SIZE = 256
+REC_COLUMNS = ["track_name", "artist", "genre", "playlist_category"]
+
+@app.on_event("startup")
+def startup():
+    report_memory("Spotify Recommendation API")
 
 @app.get("/health")
 def health():
     return {"status": "OK"}
 
+@app.get("/stats/memory")
+def memory_stats():
+    return memory_usage()
+
+@app.get("/filters")
+def filter_values():
+    """Values accepted by the genre / playlist_category filters."""
+    return CATALOG.current.filters.labels
+
+def filtered(catalog, ids, top_n, filters, mode="centroid"):
+    """Exact top-n within the filtered catalog; unknown filter values are a 400."""
+    try:
+        return catalog.filters.search(catalog.vectors(ids), top_n, filters.spec(), exclude=ids, mode=mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/tracks/search")
+def search_tracks(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=50)):
+    """Autocomplete: titles starting with `q`, then the closest titles by trigram overlap."""
+    catalog = CATALOG.current
+    rows = catalog.lookup.search(q, limit)
+    return {
+        "query": q,
+        "results": catalog.tracks.select(["track_name", "artist"]).take(rows).to_pylist()
+    }
+
 @app.post("/recommend")
 def recommend_songs(req: RecommendRequest):
-    matches = df.index[df["track_name"].str.lower() == req.track_name.lower()].tolist()
+    # One snapshot for the whole request, even if an update is swapped in meanwhile
+    catalog = CATALOG.current
+    with METRICS.stage("lookup"):
+        matches = catalog.lookup.find(req.track_name, req.artist)
 
     if not matches:
         raise HTTPException(status_code=404, detail="Track not found")
 
     idx = matches[0]
-    scores = SIM_MATRIX[idx]
-
-    similar_idx = scores.argsort()[::-1][1:req.top_n + 1]
+    with METRICS.stage("predict"):
+        if req.filters is not None and req.filters.active():
+            similar_idx = filtered(catalog, [idx], req.top_n, req.filters)
+        else:
+            similar_idx = catalog.engine.recommend(idx, req.top_n)
 
-    result = df.loc[
-        similar_idx,
-        ["track_name", "artist", "genre", "playlist_category"]
-    ].to_dict(orient="records")
+    with METRICS.stage("serialize"):
+        result = catalog.tracks.select(REC_COLUMNS).take(similar_idx).to_pylist()
 
     return {
         "input_track": req.track_name,
+        "input_artist": catalog.lookup.artist(idx),
+        "recommendations": result
+    }
+
+def resolve_seeds(catalog, seeds):
+    """(row ids, seeds not in the catalog) for a list of SeedTrack."""
+    ids, not_found = [], []
+    for seed in seeds:
+        matches = catalog.lookup.find(seed.track_name, seed.artist)
+        if matches:
+            ids.append(matches[0])
+        else:
+            not_found.append(seed.model_dump())
+    return ids, not_found
+
+@app.post("/recommend/playlist")
+def recommend_playlist(req: PlaylistRequest):
+    """Blended recommendations for a whole playlist; the seeds themselves are never returned."""
+    catalog = CATALOG.current
+    with METRICS.stage("lookup"):
+        ids, not_found = resolve_seeds(catalog, req.tracks)
+
+    if not ids:
+        raise HTTPException(status_code=404, detail="None of the tracks were found")
+
+    with METRICS.stage("predict"):
+        seeds = sorted(set(ids))
+        if req.filters is not None and req.filters.active():
+            similar_idx = filtered(catalog, seeds, req.top_n, req.filters, req.mode)
+        else:
+            similar_idx = catalog.engine.recommend_seeds(seeds, req.top_n, req.mode)
+
+    with METRICS.stage("serialize"):
+        result = catalog.tracks.select(REC_COLUMNS).take(similar_idx).to_pylist()
+
+    return {
+        "seeds": len(set(ids)),
+        "not_found": not_found,
+        "mode": req.mode,
         "recommendations": result
     }
+
+def stream_batch(catalog, seeds, top_n):
+    """One JSON line per seed, in request order, computed a block of seeds at a time."""
+    columns = catalog.tracks.select(REC_COLUMNS)
+    block_size = max(1, min(BATCH_BLOCK_SIZE, NEIGHBOR_BLOCK_SCORES // max(1, catalog.tracks.num_rows)))
+    for start in range(0, len(seeds), block_size):
+        block = seeds[start:start + block_size]
+        ids = [catalog.lookup.find(seed.track_name, seed.artist) for seed in block]
+        found = [matches[0] for matches in ids if matches]
+
+        recs = iter(catalog.engine.recommend_many(found, top_n) if found else [])
+        for seed, matches in zip(block, ids):
+            line = {"input_track": seed.track_name}
+            if matches:
+                line["input_artist"] = catalog.lookup.artist(matches[0])
+                line["recommendations"] = columns.take(next(recs)).to_pylist()
+            else:
+                line["error"] = "Track not found"
+            yield json.dumps(line) + "\n"
+
+@app.post("/recommend/batch")
+def recommend_batch(req: BatchRequest):
+    """Per-seed recommendations for many tracks, streamed as NDJSON."""
+    return StreamingResponse(
+        stream_batch(CATALOG.current, req.tracks, req.top_n),
+        media_type="application/x-ndjson"
+    )
+
+# -------------------------
+# Catalog updates
+# -------------------------
+@app.post("/catalog/tracks", status_code=202)
+def upsert_tracks(req: UpsertRequest):
+    """Add or replace tracks; recommendable after the next refresh (seconds), no restart."""
+    CATALOG.submit([{"op": "upsert", **track.model_dump()} for track in req.tracks])
+    return {"accepted": len(req.tracks), **CATALOG.status()}
+
+@app.post("/catalog/tracks/delete", status_code=202)
+def delete_tracks(req: DeleteRequest):
+    """Tombstone tracks by (title, artist); unknown ones are ignored."""
+    CATALOG.submit([{"op": "delete", **track.model_dump()} for track in req.tracks])
+    return {"accepted": len(req.tracks), **CATALOG.status()}
+
+@app.get("/catalog/status")
+def catalog_status():
+    return {**CATALOG.status(), "compaction": compact_job.status()}
+
+@app.post("/catalog/compact", status_code=202)
+def start_compaction(req: CompactRequest):
+    if not compact_job.start(refit=req.refit):
+        raise HTTPException(status_code=409, detail="A compaction is already running")
+    return compact_job.status()
+
+@app.get("/catalog/compact/status")
+def compaction_status():
+    return compact_job.status()
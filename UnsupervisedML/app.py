@@ -1,8 +1,20 @@
+import os
+import sys
+
 import streamlit as st
-import requests
-import pandas as pd
 
-API_URL = "http://127.0.0.1:8000/recommend"
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.api_client import ApiClient
+
+API_BASE = "http://127.0.0.1:8000"
+
+
+@st.cache_resource(show_spinner=False)
+def api_client():
+    return ApiClient(API_BASE, timeout=5)
+
+
+api = api_client()
 
 # -------------------------
 # UI setup
@@ -16,23 +28,57 @@ st.markdown(
 st.caption("Discover songs that sound similar")
 
 # -------------------------
-# Load data (for dropdown only)
+# Pick a seed track (autocomplete served by the API)
 # -------------------------
-df = pd.read_csv("spotify.csv")
+query = st.text_input("🎧 Search for a song you like", placeholder="Start typing a title...")
+
+options = []
+if query.strip():
+    try:
+        r = api.get("/tracks/search", params={"q": query, "limit": 20}, ttl=60)
+        options = r.json()["results"] if r.status_code == 200 else []
+    except Exception as e:
+        st.error(f"Search error: {e}")
 
-track = st.selectbox("🎧 Choose a song you like", df["track_name"].unique())
+choice = st.selectbox(
+    "Matching songs",
+    options,
+    format_func=lambda t: f"{t['track_name']} — {t['artist']}",
+    disabled=not options
+)
 top_n = st.slider("Number of recommendations", 3, 10, 5)
 
+# Applied before ranking by the API, so a filter never empties the list
+with st.expander("Filters"):
+    try:
+        values = api.get("/filters", ttl=300).json()
+    except Exception:
+        values = {"genre": [], "playlist_category": []}
+    genres = st.multiselect("Genre", values.get("genre", []))
+    categories = st.multiselect("Playlist category", values.get("playlist_category", []))
+    popularity = st.slider("Popularity", 0, 100, (0, 100))
+    tempo = st.slider("Tempo (BPM)", 40, 220, (40, 220))
+
+filters = {
+    "genre": genres or None,
+    "playlist_category": categories or None,
+    "min_popularity": popularity[0] if popularity[0] > 0 else None,
+    "max_popularity": popularity[1] if popularity[1] < 100 else None,
+    "min_tempo": tempo[0] if tempo[0] > 40 else None,
+    "max_tempo": tempo[1] if tempo[1] < 220 else None
+}
+
 # -------------------------
 # Call API
 # -------------------------
-if st.button("🔍 Recommend Songs"):
+if st.button("🔍 Recommend Songs", disabled=choice is None):
     with st.spinner("Finding similar songs..."):
-        response = requests.post(
-            API_URL,
-            json={"track_name": track, "top_n": top_n},
-            timeout=5
-        )
+        response = api.post("/recommend", json={
+            "track_name": choice["track_name"],
+            "artist": choice["artist"],
+            "top_n": top_n,
+            "filters": filters
+        })
 
         if response.status_code == 200:
             data = response.json()["recommendations"]
@@ -0,0 +1,575 @@
+"""
+Live track catalog: add, update and remove tracks without a restart.
+
+A Catalog is an immutable snapshot of everything a request reads (track
+table, features, search engine, title lookup, filter partitions). Handlers
+take `LiveCatalog.current` once and use that snapshot throughout, so a swap
+is a single assignment and never seen half-done.
+
+Changes are appended to a journal (spotify_updates.jsonl) and applied in
+the background in batches, without touching the memory-mapped base
+artifacts: new rows are scaled with the scaler statistics frozen at export
+time and appended to a small in-memory delta segment, replaced or deleted
+rows are tombstoned. Queries search the base (with its neighbour table or
+IVF lists) and brute-force the delta, skipping tombstones, so a refresh
+costs O(changes + delta) rather than O(catalog). Every uvicorn worker tails
+the same journal, so all of them converge on the same catalog.
+
+Compaction merges base, delta and tombstones into new base artifacts
+(optionally re-fitting the scaler and IVF centroids) off the request path
+and swaps the result in the same way. The new metadata is written first,
+then the journal is rotated down to the entries that arrived meanwhile, so
+a restart replays only those. Replaying an entry the base already contains
+is harmless: the last change to a key wins either way.
+"""
+
+import contextlib
+import fcntl
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from sklearn.preprocessing import StandardScaler
+
+from recommender import (
+    ARTIFACTS_META_PATH, FEATURES, IVF_PATH, NEIGHBORS_PATH, PARTITION_COLUMNS, CatalogFilters, IVFIndex,
+    TopKEngine, TrackLookup, gather_rows, load_artifacts, load_meta, load_neighbor_table,
+    make_index, normalize_title, remove_neighbor_table, scale_features, scaler_stats, seed_scores,
+    source_signature, top_k, top_k_rows, write_artifacts
+)
+
+JOURNAL_PATH = "spotify_updates.jsonl"
+COMPACT_LOCK_PATH = "spotify_compact.lock"
+
+# Extra base rows an autocomplete query fetches to make up for tombstoned ones
+SEARCH_OVERFETCH = 50
+
+
+class Segment(NamedTuple):
+    tracks: object              # pyarrow Table
+    X: object                   # L2-normalized features, row-aligned with tracks
+    lookup: TrackLookup
+    filters: CatalogFilters
+    engine: object = None       # TopKEngine or IVFIndex (base only; the delta is scanned)
+
+
+def build_segment(tracks, X, engine=None):
+    return Segment(tracks, X, TrackLookup.from_table(tracks), CatalogFilters(tracks, X), engine)
+
+
+class Catalog(NamedTuple):
+    tracks: object              # base rows then delta rows; a row id is a position in this table
+    base: Segment               # the memory-mapped artifacts
+    delta: Optional[Segment]    # rows added since, None if there are none
+    dead: object                # sorted ids of tombstoned rows (base or delta)
+    engine: object              # base engine, or a LiveIndex over base + delta
+    lookup: object              # TrackLookup or LiveLookup
+    filters: object             # CatalogFilters or LiveFilters
+    version: int                # journal entries included
+
+    @property
+    def n_live(self):
+        return self.tracks.num_rows - len(self.dead)
+
+    def vectors(self, ids):
+        """Feature rows of row ids from either segment."""
+        return segment_vectors(self.base, self.delta, ids)
+
+
+def segment_vectors(base, delta, ids):
+    ids = np.asarray(ids, dtype=np.int64)
+    n_base = len(base.X)
+    if delta is None or (ids < n_base).all():
+        return gather_rows(base.X, ids)
+
+    out = np.empty((len(ids), base.X.shape[1]), dtype=np.float32)
+    in_base = ids < n_base
+    out[in_base] = gather_rows(base.X, ids[in_base])
+    out[~in_base] = delta.X[ids[~in_base] - n_base]
+    return out
+
+
+def build_catalog(base, delta, dead, version):
+    if delta is None and not len(dead):
+        # Nothing on top of the base: serve it directly
+        return Catalog(base.tracks, base, None, dead, base.engine, base.lookup, base.filters, version)
+
+    tracks = base.tracks if delta is None else pa.concat_tables([base.tracks, delta.tracks])
+    return Catalog(
+        tracks, base, delta, dead,
+        LiveIndex(base, delta, dead), LiveLookup(base, delta, dead), LiveFilters(base, delta, dead),
+        version
+    )
+
+
+class _Live:
+    """Base + delta segments and the tombstones between them, in global row ids."""
+
+    def __init__(self, base, delta, dead):
+        self.base = base
+        self.delta = delta
+        self.n_base = len(base.X)
+        self.dead = dead
+        self.base_dead = dead[dead < self.n_base]
+        self.delta_dead = dead[dead >= self.n_base] - self.n_base
+
+    def _split(self, exclude):
+        """Rows to skip in the base and in the delta (local ids): tombstones plus `exclude`."""
+        if exclude is None or not len(exclude):
+            return self.base_dead, self.delta_dead
+        exclude = np.asarray(exclude, dtype=np.int64)
+        return (
+            np.union1d(self.base_dead, exclude[exclude < self.n_base]),
+            np.union1d(self.delta_dead, exclude[exclude >= self.n_base] - self.n_base)
+        )
+
+    def vectors(self, ids):
+        return segment_vectors(self.base, self.delta, ids)
+
+    def _merge(self, base_ids, base_scores, delta_ids, delta_scores, k):
+        """Top-k of two scored candidate lists, in global row ids; excluded (-inf) rows dropped."""
+        ids = np.concatenate([np.asarray(base_ids, dtype=np.int64), self.n_base + delta_ids])
+        scores = np.concatenate([base_scores, delta_scores])
+        best = top_k(scores, k)
+        return ids[best[np.isfinite(scores[best])]]
+
+
+class LiveIndex(_Live):
+    """
+    Top-k over base + delta: the base engine (neighbour table, exact scan or
+    IVF lists) with tombstones excluded, merged by score with an exact scan
+    of the delta. Same interface as TopKEngine / IVFIndex.
+    """
+
+    def _delta_scores(self, seeds, mode, skip):
+        if self.delta is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = seed_scores(self.delta.X, seeds, mode)
+        scores[skip] = -np.inf
+        return np.arange(len(scores)), scores
+
+    def _search(self, seeds, k, exclude, mode="centroid"):
+        base_skip, delta_skip = self._split(exclude)
+        base_ids = self.base.engine.search_seeds(seeds, k, exclude=base_skip, mode=mode)
+        base_scores = seed_scores(gather_rows(self.base.X, base_ids), seeds, mode)
+        return self._merge(base_ids, base_scores, *self._delta_scores(seeds, mode, delta_skip), k)
+
+    def _table(self, top_n):
+        neighbors = getattr(self.base.engine, "neighbors", None)
+        return neighbors if neighbors is not None and top_n <= neighbors.shape[1] else None
+
+    def recommend(self, idx, top_n):
+        table = self._table(top_n)
+        if table is not None and idx < self.n_base:
+            row = np.asarray(table[idx])
+            row = row[~np.isin(row, self.base_dead)][:top_n]
+            # Fewer than top_n left after tombstones: fall back to a scan
+            if len(row) == top_n:
+                if self.delta is None:
+                    return row
+                q = self.base.X[idx][None]
+                base_scores = seed_scores(gather_rows(self.base.X, row), q)
+                return self._merge(row, base_scores, *self._delta_scores(q, "centroid", self.delta_dead), top_n)
+
+        return self._search(self.vectors([idx]), top_n, [idx])
+
+    def recommend_many(self, ids, top_n):
+        """Per-seed neighbours for a block of seeds; one matrix multiply per segment for an exact base."""
+        if not isinstance(self.base.engine, TopKEngine) or self._table(top_n) is not None:
+            return [self.recommend(int(i), top_n) for i in ids]
+
+        ids = np.asarray(ids, dtype=np.int64)
+        seeds = self.vectors(ids)
+        scores = seeds @ self.base.X.T
+        scores[:, self.base_dead] = -np.inf
+        if self.delta is not None:
+            delta_scores = seeds @ self.delta.X.T
+            delta_scores[:, self.delta_dead] = -np.inf
+            scores = np.hstack([scores, delta_scores])
+        scores[np.arange(len(ids)), ids] = -np.inf
+
+        best = top_k_rows(scores, min(top_n, scores.shape[1] - 1))
+        return [row[np.isfinite(s[row])] for row, s in zip(best, scores)]
+
+    def recommend_seeds(self, ids, top_n, mode="centroid"):
+        return self._search(self.vectors(ids), top_n, ids, mode)
+
+
+class LiveLookup(_Live):
+    """TrackLookup over base + delta, tombstoned rows left out."""
+
+    def __init__(self, base, delta, dead):
+        super().__init__(base, delta, dead)
+        self._dead = set(dead.tolist())
+
+    def __len__(self):
+        return len(self.base.lookup) + (len(self.delta.lookup) if self.delta is not None else 0) - len(self.dead)
+
+    def _rows(self, base_rows, delta_rows):
+        rows = [int(i) for i in base_rows if i not in self._dead]
+        rows += [self.n_base + int(i) for i in delta_rows if self.n_base + i not in self._dead]
+        return rows
+
+    def artist(self, idx):
+        if idx < self.n_base:
+            return self.base.lookup.artist(idx)
+        return self.delta.lookup.artist(idx - self.n_base)
+
+    def find(self, title, artist=None):
+        delta = self.delta.lookup.find(title, artist) if self.delta is not None else []
+        return self._rows(self.base.lookup.find(title, artist), delta)
+
+    def search(self, query, limit=10):
+        """Prefix matches from either segment first, then fuzzy ones."""
+        base = self.base.lookup.search(query, limit + min(len(self.base_dead), SEARCH_OVERFETCH))
+        delta = self.delta.lookup.search(query, limit) if self.delta is not None else []
+        rows = self._rows(base, delta)
+
+        query = normalize_title(query)
+        titles = [self.base.lookup.titles[i] if i < self.n_base else self.delta.lookup.titles[i - self.n_base]
+                  for i in rows]
+        prefix = [normalize_title(title).startswith(query) for title in titles]
+        # Stable: each segment's own ranking is kept within the prefix and the fuzzy matches
+        return [row for _, row in sorted(zip(prefix, rows), key=lambda pair: not pair[0])][:limit]
+
+
+class LiveFilters(_Live):
+    """CatalogFilters over base + delta: each segment's partitions searched, tombstones excluded."""
+
+    def __init__(self, base, delta, dead):
+        super().__init__(base, delta, dead)
+        self.labels = {}
+        for column in PARTITION_COLUMNS:
+            labels = {normalize_title(label): label for label in base.filters.labels[column]}
+            for label in (delta.filters.labels[column] if delta is not None else []):
+                labels.setdefault(normalize_title(label), label)
+            self.labels[column] = [labels[key] for key in sorted(labels)]
+
+    def _validate(self, filters):
+        for column in PARTITION_COLUMNS:
+            for value in filters.get(column) or []:
+                key = normalize_title(value)
+                segments = [self.base] + ([self.delta] if self.delta is not None else [])
+                if not any(key in segment.filters.lookup[column] for segment in segments):
+                    raise ValueError(f"Unknown {column}: {value!r}")
+
+    def search(self, seeds, k, filters, exclude=None, mode="centroid", strict=True):
+        if strict:
+            self._validate(filters)
+
+        base_skip, delta_skip = self._split(exclude)
+        base_ids = self.base.filters.search(seeds, k, filters, exclude=base_skip, mode=mode, strict=False)
+        base_scores = seed_scores(gather_rows(self.base.X, base_ids), seeds, mode)
+        if self.delta is None:
+            delta_ids, delta_scores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        else:
+            delta_ids = self.delta.filters.search(seeds, k, filters, exclude=delta_skip, mode=mode, strict=False)
+            delta_scores = seed_scores(self.delta.X[delta_ids], seeds, mode)
+        return self._merge(base_ids, base_scores, delta_ids, delta_scores, k)
+
+
+def apply_changes(catalog, changes, stats):
+    """
+    New snapshot with journal `changes` applied in order. A track is keyed
+    by normalized (title, artist): an upsert tombstones every live row with
+    its key and appends the new one to the delta, a delete tombstones them.
+    The base segment is shared, never copied.
+    """
+    dead = set()
+    added = {}
+    for change in changes:
+        key = (normalize_title(change["track_name"]), normalize_title(change["artist"]))
+        dead.update(catalog.lookup.find(change["track_name"], change["artist"]))
+        added.pop(key, None)
+        if change["op"] == "upsert":
+            added[key] = change
+
+    version = catalog.version + len(changes)
+    if not dead and not added:
+        return catalog._replace(version=version)
+
+    delta = catalog.delta
+    if added:
+        schema = catalog.base.tracks.schema
+        frame = pd.DataFrame(list(added.values()), columns=schema.names)
+        new = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+        X = scale_features(frame, stats)
+        if delta is not None:
+            new = pa.concat_tables([delta.tracks, new])
+            X = np.concatenate([delta.X, X])
+        # Delta ids are positions after the base, so appending keeps every existing id
+        delta = build_segment(new.combine_chunks(), X)
+
+    dead = np.union1d(catalog.dead, np.fromiter(dead, dtype=np.int64, count=len(dead)))
+    return build_catalog(catalog.base, delta, dead, version)
+
+
+@contextlib.contextmanager
+def exclusive(path, stale_after=3600):
+    """Cross-process mutex through an O_EXCL lock file (e.g. one compaction across workers)."""
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        if time.time() - os.stat(path).st_mtime < stale_after:
+            raise RuntimeError(f"{path} is held by another process")
+        os.remove(path)
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        yield
+    finally:
+        os.close(fd)
+        os.remove(path)
+
+
+class LiveCatalog:
+    """The current Catalog plus the journal that updates it."""
+
+    def __init__(self, csv_path, kind="exact", nprobe=8, journal_path=JOURNAL_PATH):
+        self.csv_path = csv_path
+        self.kind = kind
+        self.nprobe = nprobe
+        self.journal_path = journal_path
+
+        self._apply_lock = threading.Lock()     # one writer of `current` at a time
+        self._wake = threading.Event()
+        self._thread = None
+        self.last_applied_at = None
+        self.last_compacted_at = None
+
+        with self._apply_lock:
+            self._load_base()
+
+    # -------- Loading --------
+    def _load_base(self):
+        """Base artifacts plus every journal entry they do not contain yet."""
+        start = time.perf_counter()
+        for _ in range(10):
+            # Stat before reading: a compaction that lands meanwhile is seen by the next refresh
+            exported = os.path.exists(ARTIFACTS_META_PATH)
+            self._meta_mtime = os.stat(ARTIFACTS_META_PATH).st_mtime_ns if exported else None
+            tracks, X = load_artifacts(self.csv_path)
+            meta = load_meta()
+            if tracks.num_rows == X.shape[0] == meta["n_rows"]:
+                if self._meta_mtime is None:
+                    self._meta_mtime = os.stat(ARTIFACTS_META_PATH).st_mtime_ns
+                break
+            time.sleep(0.5)     # another process is replacing the files
+        else:
+            raise RuntimeError("Serving artifacts are inconsistent (rows differ)")
+
+        self.stats = meta["scaler"]
+        offset = meta.get("journal_offset", 0)     # entries of the journal file already in the base
+        self.base_version = meta.get("version", offset)
+
+        neighbors = load_neighbor_table(NEIGHBORS_PATH, X)
+        engine = make_index(self.kind, X, neighbors=neighbors, nprobe=self.nprobe, normalized=True)
+        base = build_segment(tracks, X, engine)
+        catalog = build_catalog(base, None, np.empty(0, dtype=np.int64), self.base_version)
+
+        self._journal_pos = 0
+        self._journal_inode = None
+        entries = self._read_journal()[offset:]
+        self.current = apply_changes(catalog, entries, self.stats) if entries else catalog
+        self.load_seconds = time.perf_counter() - start
+
+    def _read_journal(self):
+        """Complete journal lines past the last read position; None if the journal was rotated since."""
+        try:
+            f = open(self.journal_path, "rb")
+        except FileNotFoundError:
+            return []
+
+        with f:
+            inode = os.fstat(f.fileno()).st_ino
+            if self._journal_inode is None:
+                self._journal_inode = inode
+            elif inode != self._journal_inode:
+                return None
+            f.seek(self._journal_pos)
+            data = f.read()
+        # A line still being written is picked up next time
+        end = data.rfind(b"\n") + 1
+        self._journal_pos += end
+        return [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+
+    def _refresh(self):
+        if os.stat(ARTIFACTS_META_PATH).st_mtime_ns != self._meta_mtime:
+            # Compacted (or re-exported) by another process
+            self._load_base()
+            return True
+
+        entries = self._read_journal()
+        if entries is None:
+            # Rotated by a compaction whose metadata this snapshot may predate
+            self._load_base()
+            return True
+        if not entries:
+            return False
+        self.current = apply_changes(self.current, entries, self.stats)
+        self.last_applied_at = datetime.now().isoformat(timespec="seconds")
+        return True
+
+    def refresh(self):
+        """Apply journal entries written since the last refresh, by any process. True if the catalog changed."""
+        with self._apply_lock:
+            return self._refresh()
+
+    # -------- Updates --------
+    @contextlib.contextmanager
+    def _locked_journal(self):
+        """The journal under an exclusive flock; re-opened if a compaction rotated it while we waited."""
+        while True:
+            fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                if os.fstat(fd).st_ino == os.stat(self.journal_path).st_ino:
+                    yield fd
+                    return
+            finally:
+                os.close(fd)
+
+    def submit(self, changes):
+        """
+        Append changes ({"op": "upsert", **track} or {"op": "delete",
+        "track_name", "artist"}) to the journal. They go live at the next
+        refresh: right away without a watcher thread, else within moments.
+        """
+        data = "".join(json.dumps(c, separators=(",", ":")) + "\n" for c in changes).encode()
+        # One O_APPEND write, so lines from concurrent workers never interleave
+        with self._locked_journal() as fd:
+            os.write(fd, data)
+            os.fsync(fd)
+
+        if self._thread is None:
+            self.refresh()
+        else:
+            self._wake.set()
+
+    def watch(self, interval=5.0, compact_every=0, on_compact=None):
+        """
+        Refresh every `interval` seconds (and right after a submit). With
+        `compact_every` > 0, `on_compact()` is called once the catalog has
+        unfolded journal entries and that long has passed since the last
+        compaction.
+        """
+        if self._thread is not None or interval <= 0:
+            return
+
+        def run():
+            compacted = time.monotonic()
+            while True:
+                self._wake.wait(interval)
+                self._wake.clear()
+                try:
+                    self.refresh()
+                    due = compact_every > 0 and time.monotonic() - compacted >= compact_every
+                    if due and on_compact and self.current.version > self.base_version:
+                        compacted = time.monotonic()
+                        on_compact()
+                except Exception as e:
+                    print(f"⚠️ Catalog refresh failed: {e}")
+
+        self._thread = threading.Thread(target=run, name="catalog-refresh", daemon=True)
+        self._thread.start()
+
+    # -------- Compaction --------
+    def compact(self, refit=False, progress=None):
+        """
+        Merge base, delta and tombstones into new base artifacts and swap them in.
+        refit=True re-fits the scaler (and the IVF centroids) on the current
+        tracks instead of keeping the frozen statistics. Updates wait while
+        this runs; requests keep being served from the old snapshot.
+        """
+        progress = progress or (lambda **_: None)
+        start = time.perf_counter()
+
+        with self._apply_lock, exclusive(COMPACT_LOCK_PATH):
+            self._refresh()
+            catalog = self.current
+            live = np.setdiff1d(np.arange(catalog.tracks.num_rows), catalog.dead)
+            tracks = catalog.tracks.take(live).combine_chunks()
+            stats, X = self.stats, catalog.vectors(live)
+
+            if refit:
+                progress(stage="refit")
+                raw = tracks.select(FEATURES).to_pandas()
+                stats = scaler_stats(StandardScaler().fit(raw))
+                X = scale_features(raw, stats)
+
+            # Derived indexes point at old row ids: gone before the new metadata is, so a
+            # worker reloading on it never pairs them with the new rows (both are also keyed
+            # on the feature digest). The neighbour table is rebuilt offline (`recommender.py neighbors`)
+            remove_neighbor_table(NEIGHBORS_PATH)
+            if os.path.exists(IVF_PATH):
+                os.remove(IVF_PATH)
+
+            progress(stage="writing", tracks=tracks.num_rows)
+            meta = {**source_signature(self.csv_path), "scaler": stats, "journal_offset": 0, "version": catalog.version}
+            write_artifacts(tracks, X, meta)
+
+            # Keep the IVF centroids unless re-fitting
+            engine = catalog.base.engine
+            if isinstance(engine, IVFIndex) and not refit:
+                IVFIndex.from_centroids(X, engine.centroids, normalized=True).save(IVF_PATH)
+
+            progress(stage="rotating")
+            pending = self._rotate_journal()
+
+            progress(stage="loading")
+            self._load_base()
+            self.last_compacted_at = datetime.now().isoformat(timespec="seconds")
+
+        return {
+            "tracks": self.current.n_live,
+            "version": self.base_version,
+            "journal_pending": pending,
+            "refit": refit,
+            "seconds": round(time.perf_counter() - start, 3)
+        }
+
+    def _rotate_journal(self):
+        """
+        Replace the journal with the entries past this snapshot (appended by
+        other workers during the compaction). Writers wait on the lock and
+        then append to the new file. Returns how many entries were kept.
+        """
+        if not os.path.exists(self.journal_path):
+            return 0
+
+        with self._locked_journal() as fd:
+            inode = os.fstat(fd).st_ino
+            with open(self.journal_path, "rb") as f:
+                f.seek(self._journal_pos if inode == self._journal_inode else 0)
+                tail = f.read()
+
+            tmp = f"{self.journal_path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(tail)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.journal_path)
+
+        return sum(1 for line in tail.splitlines() if line.strip())
+
+    def status(self):
+        catalog = self.current
+        return {
+            "version": catalog.version,
+            "base_version": self.base_version,
+            "tracks": catalog.n_live,
+            "delta_rows": 0 if catalog.delta is None else catalog.delta.tracks.num_rows,
+            "tombstones": len(catalog.dead),
+            "engine": type(catalog.base.engine).__name__,
+            "neighbor_table": getattr(catalog.base.engine, "neighbors", None) is not None,
+            "last_applied_at": self.last_applied_at,
+            "last_compacted_at": self.last_compacted_at,
+            "load_seconds": round(self.load_seconds, 3)
+        }
@@ -0,0 +1,867 @@
+import bisect
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+import unicodedata
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.datasets import load_dataset
+
+FEATURES = [
+    "danceability",
+    "energy",
+    "valence",
+    "tempo",
+    "duration_ms",
+    "popularity"
+]
+
+BLEND_MODES = ("centroid", "max")
+
+NEIGHBORS_PATH = "spotify_neighbors.npy"
+IVF_PATH = "spotify_ivf.npz"
+
+# Serving artifacts, memory-mapped read-only so uvicorn workers share their pages
+FEATURES_PATH = "spotify_features.npy"      # L2-normalized scaled features (float32)
+TRACKS_PATH = "spotify_tracks.arrow"        # track metadata (Arrow IPC, uncompressed)
+ARTIFACTS_META_PATH = "spotify_artifacts.json"
+
+
+# -------------------------
+# Helpers
+# -------------------------
+def normalize_rows(X):
+    """L2-normalize each row so a dot product is the cosine similarity."""
+    X = np.asarray(X, dtype=np.float32)
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return X / norms
+
+
+def feature_digest(X):
+    """SHA-256 of a normalized feature matrix as the float32 rows served."""
+    return hashlib.sha256(np.ascontiguousarray(X, dtype=np.float32)).hexdigest()
+
+
+def gather_rows(X, ids):
+    """X[ids] via np.take along X's contiguous axis: 2-3x faster than fancy indexing, no copy of X."""
+    X = np.asarray(X)
+    if X.flags.f_contiguous and not X.flags.c_contiguous:
+        # Column-major (as np.save writes the exported features): gather each column
+        return X.T.take(ids, axis=1).T
+    return X.take(ids, axis=0)
+
+
+def top_k(scores, k):
+    """Indices of the k largest scores, best first (O(n) select + O(k log k) sort)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if len(scores) <= 512:
+        # Small candidate sets (filtered partitions): one sort beats select + sort overhead
+        return np.argsort(-scores, kind="stable")[:k]
+
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+def top_k_rows(scores, k):
+    """Row-wise top_k for a 2-D block of scores."""
+    k = min(k, scores.shape[1])
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+def seed_scores(X, seeds, mode="centroid", block_size=256):
+    """
+    Similarity of every row of X to a set of seed vectors (all L2-normalized):
+    "centroid" ranks by mean cosine to the seeds, "max" by cosine to the
+    nearest seed. Never larger than len(X) x block_size.
+    """
+    if mode == "centroid":
+        return X @ (seeds[0] if len(seeds) == 1 else seeds.mean(axis=0))
+
+    best = np.full(len(X), -np.inf, dtype=np.float32)
+    for start in range(0, len(seeds), block_size):
+        np.maximum(best, (X @ seeds[start:start + block_size].T).max(axis=1), out=best)
+    return best
+
+
+def _finite(ids, scores):
+    # Excluded rows score -inf; drop them when fewer than k real candidates exist
+    return ids[np.isfinite(scores[ids])]
+
+
+# -------------------------
+# Top-k engine
+# -------------------------
+class TopKEngine:
+    """
+    Cosine top-k over an L2-normalized feature matrix.
+
+    Only the N x d matrix is kept in memory; a query scores one row
+    against the catalog (O(N * d)) instead of reading a precomputed
+    N x N similarity matrix.
+    """
+
+    def __init__(self, X, neighbors=None, normalized=False):
+        # normalized=True keeps X as given (e.g. a read-only memmap) instead of copying it
+        self.X = X if normalized else normalize_rows(X)
+        self.neighbors = neighbors
+
+    def search(self, q, k, exclude=None):
+        scores = self.X @ q
+        if exclude is not None:
+            scores[exclude] = -np.inf
+        return top_k(scores, k)
+
+    def recommend(self, idx, top_n):
+        if self.neighbors is not None and top_n <= self.neighbors.shape[1]:
+            return self.neighbors[idx, :top_n]
+
+        return self.search(self.X[idx], top_n, exclude=idx)
+
+    def recommend_many(self, ids, top_n):
+        """Per-seed neighbours for a block of seeds: one (len(ids) x N) matrix multiply."""
+        ids = np.asarray(ids)
+        if self.neighbors is not None and top_n <= self.neighbors.shape[1]:
+            return np.asarray(self.neighbors[ids, :top_n])
+
+        scores = self.X[ids] @ self.X.T
+        scores[np.arange(len(ids)), ids] = -np.inf
+        return top_k_rows(scores, min(top_n, self.X.shape[0] - 1))
+
+    def search_seeds(self, seeds, k, exclude=None, mode="centroid"):
+        """Top-k rows for a set of seed vectors (rows of X or not), `exclude` row ids left out."""
+        scores = seed_scores(self.X, seeds, mode)
+        if exclude is not None:
+            scores[exclude] = -np.inf
+        return _finite(top_k(scores, k), scores)
+
+    def recommend_seeds(self, ids, top_n, mode="centroid"):
+        """Blended neighbours of a set of seeds (a playlist), seeds excluded."""
+        ids = np.asarray(ids)
+        return self.search_seeds(self.X[ids], top_n, exclude=ids, mode=mode)
+
+
+# -------------------------
+# Approximate index (IVF)
+# -------------------------
+def spherical_kmeans(X, n_clusters, n_iter=10, seed=42, block_size=65536):
+    """Lloyd iterations on the unit sphere; X must be L2-normalized."""
+    rng = np.random.default_rng(seed)
+    centroids = X[rng.choice(len(X), n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        labels = assign_clusters(X, centroids, block_size)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, X)
+        counts = np.bincount(labels, minlength=n_clusters)
+
+        # Re-seed empty lists from random rows
+        empty = counts == 0
+        sums[empty] = X[rng.choice(len(X), int(empty.sum()), replace=False)]
+        centroids = normalize_rows(sums)
+
+    return centroids
+
+
+def assign_clusters(X, centroids, block_size=65536):
+    labels = np.empty(len(X), dtype=np.int32)
+    for start in range(0, len(X), block_size):
+        stop = min(start + block_size, len(X))
+        labels[start:stop] = np.argmax(X[start:stop] @ centroids.T, axis=1)
+    return labels
+
+
+class IVFIndex:
+    """
+    Inverted-file index: rows are bucketed under their nearest k-means
+    centroid and a query scores only the `nprobe` closest buckets.
+
+    `nprobe` is the recall/latency knob: nprobe == n_lists is exact search,
+    small values touch roughly nprobe / n_lists of the catalog.
+    """
+
+    def __init__(self, X, centroids, order, offsets, nprobe=8, normalized=False):
+        self.X = X if normalized else normalize_rows(X)
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(cls, X, n_lists=None, nprobe=8, n_iter=10, seed=42, normalized=False):
+        Xn = X if normalized else normalize_rows(X)
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(len(Xn))))
+
+        centroids = spherical_kmeans(Xn, n_lists, n_iter=n_iter, seed=seed)
+        return cls.from_centroids(Xn, centroids, nprobe=nprobe, normalized=True)
+
+    @classmethod
+    def from_centroids(cls, X, centroids, nprobe=8, normalized=False):
+        """Bucket X under existing centroids (no k-means), e.g. after rows were added."""
+        Xn = X if normalized else normalize_rows(X)
+        labels = assign_clusters(Xn, centroids)
+
+        n_lists = len(centroids)
+        order = np.argsort(labels, kind="stable").astype(np.int32)
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(labels, minlength=n_lists))
+
+        return cls(Xn, centroids, order, offsets, nprobe=nprobe, normalized=True)
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    def candidates(self, q):
+        probe = top_k(self.centroids @ q, self.nprobe)
+        return np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in probe])
+
+    def search(self, q, k, exclude=None):
+        cand = self.candidates(q)
+        scores = self.X[cand] @ q
+        if exclude is not None:
+            scores[np.isin(cand, exclude)] = -np.inf
+        return cand[top_k(scores, k)]
+
+    def recommend(self, idx, top_n):
+        return self.search(self.X[idx], top_n, exclude=idx)
+
+    def recommend_many(self, ids, top_n):
+        # Each seed probes its own lists, so there is no shared matrix multiply to batch
+        return [self.recommend(int(i), top_n) for i in ids]
+
+    def search_seeds(self, seeds, k, exclude=None, mode="centroid"):
+        if mode == "centroid":
+            cand = self.candidates(normalize_rows(seeds.mean(axis=0, keepdims=True))[0])
+        else:
+            cand = np.unique(np.concatenate([self.candidates(q) for q in seeds]))
+
+        scores = seed_scores(self.X[cand], seeds, mode)
+        if exclude is not None:
+            scores[np.isin(cand, exclude)] = -np.inf
+        return cand[_finite(top_k(scores, k), scores)]
+
+    def recommend_seeds(self, ids, top_n, mode="centroid"):
+        ids = np.asarray(ids)
+        return self.search_seeds(self.X[ids], top_n, exclude=ids, mode=mode)
+
+    def save(self, path):
+        np.savez(
+            path,
+            centroids=self.centroids,
+            order=self.order,
+            offsets=self.offsets,
+            n_rows=len(self.X),
+            digest=feature_digest(self.X)
+        )
+
+    @classmethod
+    def load(cls, path, X, nprobe=8, normalized=False):
+        """
+        Load a saved index for feature matrix X; None if missing or stale
+        (built on other rows, or the same number of rows with other values).
+        """
+        if not os.path.exists(path):
+            return None
+
+        data = np.load(path)
+        Xn = X if normalized else normalize_rows(X)
+        if int(data["n_rows"]) != len(Xn) or "digest" not in data or str(data["digest"]) != feature_digest(Xn):
+            return None
+        return cls(Xn, data["centroids"], data["order"], data["offsets"], nprobe=nprobe, normalized=True)
+
+
+def load_or_build_ivf(path, X, nprobe=8, normalized=False):
+    index = IVFIndex.load(path, X, nprobe=nprobe, normalized=normalized)
+    if index is None:
+        index = IVFIndex.build(X, nprobe=nprobe, normalized=normalized)
+        index.save(path)
+    return index
+
+
+def recall_at_k(exact, ann, k=10, n_queries=500, seed=0):
+    """Mean recall@k of `ann` against `exact` plus mean latency (ms) of each."""
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(len(exact.X), min(n_queries, len(exact.X)), replace=False)
+
+    hits = 0
+    exact_time = ann_time = 0.0
+    for idx in queries:
+        t0 = time.perf_counter()
+        truth = exact.search(exact.X[idx], k, exclude=idx)
+        t1 = time.perf_counter()
+        found = ann.search(ann.X[idx], k, exclude=idx)
+        t2 = time.perf_counter()
+
+        hits += len(np.intersect1d(truth, found))
+        exact_time += t1 - t0
+        ann_time += t2 - t1
+
+    return {
+        "recall": hits / (len(queries) * k),
+        "exact_ms": 1000 * exact_time / len(queries),
+        "ann_ms": 1000 * ann_time / len(queries)
+    }
+
+
+def neighbor_block(X, start, stop, k):
+    """Top-k neighbour ids of rows start:stop of the L2-normalized X (self excluded)."""
+    scores = X[start:stop] @ X.T
+    scores[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+    return top_k_rows(scores, k).astype(np.int32)
+
+
+def build_neighbor_table(X, k, block_size=1024):
+    """Top-k neighbour ids for every row, computed block by block (never N x N)."""
+    Xn = normalize_rows(X)
+    n = Xn.shape[0]
+    k = min(k, n - 1)
+    table = np.empty((n, k), dtype=np.int32)
+
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        table[start:stop] = neighbor_block(Xn, start, stop, k)
+
+    return table
+
+
+# Worker side of the offline job: every process memory-maps the same features file
+_FEATURES = None
+
+
+def _init_neighbor_worker(features_path):
+    global _FEATURES
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+    _FEATURES = np.load(features_path, mmap_mode="r")
+
+
+def _neighbor_block_task(start, stop, k):
+    return neighbor_block(_FEATURES, start, stop, k)
+
+
+# Scores per block of the offline job (block_size x N); peak memory per worker is ~12 bytes each
+NEIGHBOR_BLOCK_SCORES = 1 << 24
+
+
+def iter_neighbor_blocks(features_path=FEATURES_PATH, k=50, block_size=None, workers=1):
+    """
+    Yield (start, ids) for consecutive row blocks of the all-tracks top-k,
+    in order, from the normalized features artifact. With workers > 1 the
+    blocks are spread over spawned processes that share the memory-mapped
+    matrix; at most 2 * workers blocks are in flight. By default a block
+    holds NEIGHBOR_BLOCK_SCORES scores, whatever the catalog size.
+    """
+    X = np.load(features_path, mmap_mode="r")
+    n = X.shape[0]
+    k = min(k, n - 1)
+    block_size = block_size or max(1, NEIGHBOR_BLOCK_SCORES // n)
+    bounds = [(start, min(start + block_size, n)) for start in range(0, n, block_size)]
+
+    if workers <= 1:
+        for start, stop in bounds:
+            yield start, neighbor_block(X, start, stop, k)
+        return
+
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_neighbor_worker, initargs=(features_path,)) as pool:
+        in_flight = deque()
+        for start, stop in bounds:
+            in_flight.append((start, pool.submit(_neighbor_block_task, start, stop, k)))
+            if len(in_flight) >= 2 * workers:
+                start, future = in_flight.popleft()
+                yield start, future.result()
+        while in_flight:
+            start, future = in_flight.popleft()
+            yield start, future.result()
+
+
+def _neighbors_meta_path(path):
+    return path + ".json"
+
+
+def save_neighbor_table(path, table, X):
+    """
+    Write a neighbour table for the normalized features X, keyed on their
+    digest in a sidecar. The sidecar goes last, so a reader that finds it
+    current also finds the table it describes.
+    """
+    tmp = _tmp_path(path)
+    with open(tmp, "wb") as f:
+        np.save(f, table)
+    os.replace(tmp, path)
+
+    meta_path = _neighbors_meta_path(path)
+    tmp = _tmp_path(meta_path)
+    with open(tmp, "w") as f:
+        json.dump({"n_rows": len(X), "digest": feature_digest(X)}, f)
+    os.replace(tmp, meta_path)
+
+
+def remove_neighbor_table(path):
+    for p in (_neighbors_meta_path(path), path):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+def load_neighbor_table(path, X):
+    """
+    Load a persisted neighbour table for the normalized features X; None if
+    missing or stale (built on other rows, or the same number of rows with
+    other values).
+    """
+    # Sidecar first: it is replaced after the table
+    try:
+        with open(_neighbors_meta_path(path)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(path):
+        return None
+
+    table = np.load(path, mmap_mode="r")
+    if table.shape[0] != len(X) or meta.get("n_rows") != len(X) or meta.get("digest") != feature_digest(X):
+        return None
+    return table
+
+
+def make_index(kind, X, neighbors=None, nprobe=8, normalized=False):
+    """Pick the search backend: "exact" (default) or "ivf"."""
+    if kind == "ivf":
+        return load_or_build_ivf(IVF_PATH, X, nprobe=nprobe, normalized=normalized)
+    return TopKEngine(X, neighbors=neighbors, normalized=normalized)
+
+
+# -------------------------
+# Filtered search
+# -------------------------
+PARTITION_COLUMNS = ("genre", "playlist_category")
+RANGE_COLUMNS = ("popularity", "tempo")
+
+# Above this fraction of the catalog, scoring every row and picking the candidates'
+# scores beats gathering their feature rows (random access into X)
+SCAN_FRACTION = 0.1
+
+
+class CatalogFilters:
+    """
+    Genre and playlist-category partitions built at load time, so a filtered
+    query scores only rows it may return instead of filtering a top-n
+    afterwards (which often leaves nothing).
+
+    Every genre, every category and every (genre, category) pair keeps only
+    its row ids; popularity and tempo each keep the row ids sorted by value,
+    so a range is a slice. A query gathers the feature rows of just the
+    partitions (or the narrowest range slice) its filters select, masking
+    any other range with per-row arrays before the top-k; a selection wider
+    than SCAN_FRACTION of the catalog is scored by a full scan instead and
+    its scores picked out of that. X itself is never copied, so a
+    memory-mapped X stays shared between workers. Results are exact within
+    the filtered set, whatever the search backend.
+
+    `filters` is a dict: {"genre": [...], "playlist_category": [...]} (any
+    of the listed values) and {"popularity": (lo, hi), "tempo": (lo, hi)}
+    (inclusive, either bound may be None).
+    """
+
+    def __init__(self, tracks, X):
+        self.X = X
+        self.labels = {}        # column -> labels as they appear in the catalog
+        self.lookup = {}        # column -> {normalized label: code}
+        self.partitions = {}    # (genre code | None, category code | None) -> row ids (ascending)
+
+        codes = {}
+        for column in PARTITION_COLUMNS:
+            labels = tracks[column].to_pylist()
+            keys = [normalize_title(v) for v in labels]
+            lookup = {key: code for code, key in enumerate(sorted(set(keys)))}
+            first = dict(zip(keys, labels))
+            self.labels[column] = [first[key] for key in sorted(lookup)]
+            self.lookup[column] = lookup
+            codes[column] = np.fromiter((lookup[k] for k in keys), dtype=np.int64, count=len(keys))
+
+        genres, categories = (codes[c] for c in PARTITION_COLUMNS)
+        n_genres, n_categories = (len(self.lookup[c]) for c in PARTITION_COLUMNS)
+        self._add_partitions(genres, n_genres, lambda g: (g, None))
+        self._add_partitions(categories, n_categories, lambda c: (None, c))
+        self._add_partitions(genres * n_categories + categories, n_genres * n_categories,
+                             lambda gc: divmod(gc, n_categories))
+
+        self.values = {}
+        self.sorted = {}        # column -> (sorted values, row ids in value order)
+        for column in RANGE_COLUMNS:
+            values = tracks[column].to_numpy()
+            order = np.argsort(values, kind="stable").astype(np.int32)
+            self.values[column] = values
+            self.sorted[column] = (values[order], order)
+
+    def _add_partitions(self, codes, n_codes, key):
+        order = np.argsort(codes, kind="stable").astype(np.int32)
+        offsets = np.zeros(n_codes + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(codes, minlength=n_codes))
+        for code in range(n_codes):
+            self.partitions[key(code)] = order[offsets[code]:offsets[code + 1]]
+
+    def _codes(self, column, values, strict=True):
+        if not values:
+            return [None]
+
+        codes = []
+        for value in values:
+            code = self.lookup[column].get(normalize_title(value))
+            if code is not None:
+                codes.append(code)
+            elif strict:
+                raise ValueError(f"Unknown {column}: {value!r}")
+        return sorted(set(codes))
+
+    def _range_slice(self, column, lo, hi):
+        values = self.sorted[column][0]
+        start = 0 if lo is None else int(values.searchsorted(lo, side="left"))
+        stop = len(values) if hi is None else int(values.searchsorted(hi, side="right"))
+        return slice(start, max(start, stop))
+
+    def candidates(self, filters, strict=True):
+        """
+        (row ids or None for the whole catalog, range mask over them or None).
+        Unknown genres / categories raise ValueError, or with strict=False
+        match nothing.
+        """
+        genres = self._codes("genre", filters.get("genre"), strict)
+        categories = self._codes("playlist_category", filters.get("playlist_category"), strict)
+
+        ranges = {}
+        for column in RANGE_COLUMNS:
+            lo, hi = filters.get(column) or (None, None)
+            if lo is not None or hi is not None:
+                ranges[column] = (lo, hi)
+
+        ids = None
+        if genres != [None] or categories != [None]:
+            parts = [self.partitions[(g, c)] for g in genres for c in categories]
+            ids = parts[0] if len(parts) == 1 else np.concatenate(parts or [np.empty(0, dtype=np.int32)])
+        elif ranges:
+            # No partition selected: slice the narrowest range out of its sorted ids
+            column, narrowest = None, None
+            for name, bounds in ranges.items():
+                rows = self._range_slice(name, *bounds)
+                if narrowest is None or rows.stop - rows.start < narrowest.stop - narrowest.start:
+                    column, narrowest = name, rows
+            ids = self.sorted[column][1][narrowest]
+            del ranges[column]
+
+        mask = None
+        for column, (lo, hi) in ranges.items():
+            values = self.values[column][ids]
+            inside = np.ones(len(values), dtype=bool)
+            if lo is not None:
+                inside &= values >= lo
+            if hi is not None:
+                inside &= values <= hi
+            mask = inside if mask is None else mask & inside
+
+        return ids, mask
+
+    def search(self, seeds, k, filters, exclude=None, mode="centroid", strict=True):
+        """Top-k rows passing `filters` for the seed vectors (one row: a single seed)."""
+        ids, mask = self.candidates(filters, strict)
+        if ids is None:
+            scores = seed_scores(self.X, seeds, mode)
+        elif len(ids) > SCAN_FRACTION * len(self.X):
+            scores = seed_scores(self.X, seeds, mode)
+            if exclude is not None:
+                # By row id while the scores still cover every row
+                scores[exclude] = -np.inf
+                exclude = None
+            scores = scores.take(ids)
+        else:
+            scores = seed_scores(gather_rows(self.X, ids), seeds, mode)
+        if mask is not None:
+            scores[~mask] = -np.inf
+        if exclude is not None:
+            if ids is None:
+                scores[exclude] = -np.inf
+            elif len(exclude) <= 8:
+                for row in exclude:
+                    scores[ids == row] = -np.inf
+            else:
+                scores[np.isin(ids, exclude)] = -np.inf
+
+        best = _finite(top_k(scores, k), scores)
+        return best if ids is None else ids[best]
+
+
+# -------------------------
+# Track lookup
+# -------------------------
+def normalize_title(text):
+    """Case-, width- and whitespace-insensitive key for titles and artists."""
+    if text is None:
+        return ""
+    return " ".join(unicodedata.normalize("NFKC", str(text)).casefold().split())
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrackLookup:
+    """
+    Hash indexes from normalized title (and title + artist) to row ids,
+    built once at load time so resolving a seed track is O(1) instead of a
+    scan of the catalog.
+
+    `search` serves autocomplete: titles starting with the query (binary
+    search over the sorted distinct titles) first, then the closest titles
+    by trigram overlap, which also catches infix matches and typos.
+    """
+
+    def __init__(self, titles, artists):
+        self.titles = titles
+        self.artists = artists
+        self.by_title = {}
+        self.by_title_artist = {}
+        for i, (title, artist) in enumerate(zip(titles, artists)):
+            key = normalize_title(title)
+            self.by_title.setdefault(key, []).append(i)
+            self.by_title_artist.setdefault((key, normalize_title(artist)), []).append(i)
+
+        # Distinct titles, sorted for prefix search and numbered for the trigram postings
+        self.keys = sorted(self.by_title)
+        postings = {}
+        sizes = np.empty(len(self.keys), dtype=np.int32)
+        for k, key in enumerate(self.keys):
+            grams = trigrams(key)
+            sizes[k] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(k)
+        self.postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self.gram_sizes = sizes
+
+    @classmethod
+    def from_table(cls, tracks):
+        return cls(tracks["track_name"].to_pylist(), tracks["artist"].to_pylist())
+
+    def __len__(self):
+        return len(self.titles)
+
+    def artist(self, idx):
+        return self.artists[idx]
+
+    def find(self, title, artist=None):
+        """Row ids of the tracks with this title (by this artist, if given), in catalog order."""
+        key = normalize_title(title)
+        if artist:
+            return self.by_title_artist.get((key, normalize_title(artist)), [])
+        return self.by_title.get(key, [])
+
+    def _prefix_keys(self, query, limit):
+        keys = []
+        i = bisect.bisect_left(self.keys, query)
+        while i < len(self.keys) and len(keys) < limit and self.keys[i].startswith(query):
+            keys.append(i)
+            i += 1
+        return keys
+
+    def _similar_keys(self, query, limit, exclude=(), min_similarity=0.2):
+        grams = [self.postings[g] for g in trigrams(query) if g in self.postings]
+        if not grams:
+            return []
+
+        shared = np.bincount(np.concatenate(grams), minlength=len(self.keys))
+        # Jaccard similarity of the trigram sets
+        similarity = shared / (len(trigrams(query)) + self.gram_sizes - shared)
+        similarity[list(exclude)] = 0.0
+        best = top_k(similarity, limit)
+        return [int(k) for k in best if similarity[k] >= min_similarity]
+
+    def search(self, query, limit=10):
+        """Row ids of up to `limit` tracks matching `query`: prefix matches, then fuzzy ones."""
+        query = normalize_title(query)
+        if not query or limit <= 0:
+            return []
+
+        keys = self._prefix_keys(query, limit)
+        if len(keys) < limit:
+            keys += self._similar_keys(query, limit - len(keys), exclude=keys)
+
+        # One track per title first, then other artists' tracks under the same titles
+        groups = [self.by_title[self.keys[k]] for k in keys]
+        rows = []
+        depth = 0
+        while len(rows) < limit and any(depth < len(g) for g in groups):
+            rows.extend(g[depth] for g in groups if depth < len(g))
+            depth += 1
+        return rows[:limit]
+
+
+# -------------------------
+# Shared serving artifacts
+# -------------------------
+def source_signature(path):
+    st = os.stat(path)
+    return {"source": os.path.basename(path), "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def _tmp_path(path):
+    # Unique per process: workers starting together may export at the same time
+    return f"{path}.{os.getpid()}.tmp"
+
+
+def scaler_stats(scaler):
+    """JSON-ready mean / scale of a fitted StandardScaler, frozen with the artifacts."""
+    return {"mean": scaler.mean_.tolist(), "scale": scaler.scale_.tolist()}
+
+
+def scale_features(frame, stats):
+    """Rows of `frame` scaled with frozen scaler stats and L2-normalized, as served."""
+    raw = np.asarray(frame[FEATURES], dtype=np.float64)
+    return normalize_rows((raw - np.asarray(stats["mean"])) / np.asarray(stats["scale"]))
+
+
+def write_artifacts(table, X, meta, features_path=FEATURES_PATH, tracks_path=TRACKS_PATH, meta_path=ARTIFACTS_META_PATH):
+    """
+    Write the normalized feature matrix (.npy), the track table (Arrow IPC)
+    and their metadata. Each file is os.replace()d into place and the
+    metadata file is written last, so a reader never pairs stale files.
+    """
+    import pyarrow as pa
+
+    tmp = _tmp_path(features_path)
+    with open(tmp, "wb") as f:
+        np.save(f, np.asarray(X, dtype=np.float32))
+    os.replace(tmp, features_path)
+
+    tmp = _tmp_path(tracks_path)
+    with pa.ipc.new_file(tmp, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, tracks_path)
+
+    tmp = _tmp_path(meta_path)
+    with open(tmp, "w") as f:
+        json.dump({**meta, "n_rows": table.num_rows}, f)
+    os.replace(tmp, meta_path)
+
+
+def export_artifacts(csv_path, features_path=FEATURES_PATH, tracks_path=TRACKS_PATH, meta_path=ARTIFACTS_META_PATH):
+    """Serving artifacts derived from `csv_path`, with the scaler statistics frozen in the metadata."""
+    import pyarrow as pa
+
+    df = load_dataset(csv_path)
+    scaler = StandardScaler().fit(df[FEATURES])
+    X = normalize_rows(scaler.transform(df[FEATURES]))
+
+    meta = {**source_signature(csv_path), "scaler": scaler_stats(scaler), "journal_offset": 0}
+    write_artifacts(pa.Table.from_pandas(df, preserve_index=False), X, meta, features_path, tracks_path, meta_path)
+    return len(df)
+
+
+def load_meta(meta_path=ARTIFACTS_META_PATH):
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def artifacts_fresh(csv_path, features_path=FEATURES_PATH, tracks_path=TRACKS_PATH, meta_path=ARTIFACTS_META_PATH):
+    if not all(os.path.exists(p) for p in (features_path, tracks_path, meta_path)):
+        return False
+
+    meta = load_meta(meta_path)
+    # Exports from before the scaler was frozen in the metadata are redone
+    return "scaler" in meta and all(meta.get(k) == v for k, v in source_signature(csv_path).items())
+
+
+def load_artifacts(csv_path, features_path=FEATURES_PATH, tracks_path=TRACKS_PATH, meta_path=ARTIFACTS_META_PATH):
+    """
+    (tracks, X): the track metadata as a pyarrow Table and the normalized
+    feature matrix, both memory-mapped read-only. Re-exported first if the
+    CSV changed since the last export.
+    """
+    import pyarrow as pa
+
+    if not artifacts_fresh(csv_path, features_path, tracks_path, meta_path):
+        export_artifacts(csv_path, features_path, tracks_path, meta_path)
+
+    X = np.load(features_path, mmap_mode="r")
+    tracks = pa.ipc.open_file(pa.memory_map(tracks_path)).read_all()
+    return tracks, X
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build and evaluate recommender indexes")
+    parser.add_argument("command", choices=["neighbors", "ivf", "recall", "artifacts"])
+    parser.add_argument("--data", default="spotify.csv")
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--n-lists", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--workers", type=int, default=1, help="processes for the all-tracks top-k (neighbors)")
+    parser.add_argument("--block-size", type=int, default=None, help="rows scored per matrix multiply (neighbors; default sized to the catalog)")
+    parser.add_argument("--jsonl", default=None, help="also stream every track's top-k as JSON lines (neighbors)")
+    args = parser.parse_args()
+
+    if args.command == "artifacts":
+        n_rows = export_artifacts(args.data)
+        print(f"✅ Saved: {FEATURES_PATH}, {TRACKS_PATH} ({n_rows} tracks)")
+        sys.exit()
+
+    if args.command == "neighbors":
+        # Blocks of rows against the memory-mapped features artifact, never N x N
+        tracks, X = load_artifacts(args.data)
+        out = args.out or NEIGHBORS_PATH
+        table = np.empty((X.shape[0], min(args.k, X.shape[0] - 1)), dtype=np.int32)
+        names = tracks.select(["track_name", "artist"])
+        start_time = time.perf_counter()
+
+        jsonl = open(args.jsonl, "w") if args.jsonl else None
+        try:
+            for start, ids in iter_neighbor_blocks(FEATURES_PATH, args.k, args.block_size, args.workers):
+                table[start:start + len(ids)] = ids
+                if jsonl is not None:
+                    seeds = names.slice(start, len(ids)).to_pylist()
+                    recs = names.take(ids.ravel()).to_pylist()
+                    for i, seed in enumerate(seeds):
+                        seed["recommendations"] = recs[i * ids.shape[1]:(i + 1) * ids.shape[1]]
+                        jsonl.write(json.dumps(seed) + "\n")
+        finally:
+            if jsonl is not None:
+                jsonl.close()
+
+        save_neighbor_table(out, table, X)
+        print(f"✅ Saved: {out} {table.shape} in {time.perf_counter() - start_time:.1f}s ({args.workers} workers)")
+        sys.exit()
+
+    df = load_dataset(args.data, columns=FEATURES)
+    X_scaled = StandardScaler().fit_transform(df[FEATURES])
+
+    if args.command == "ivf":
+        out = args.out or IVF_PATH
+        index = IVFIndex.build(X_scaled, n_lists=args.n_lists)
+        index.save(out)
+        print(f"✅ Saved: {out} ({index.n_lists} lists)")
+
+    else:
+        exact = TopKEngine(X_scaled)
+        index = IVFIndex.build(X_scaled, n_lists=args.n_lists)
+
+        print(f"recall@{args.k} vs exact search ({index.n_lists} lists, {len(df)} tracks)")
+        print(f"{'nprobe':>6} {'recall':>8} {'exact ms':>9} {'ivf ms':>8}")
+        for nprobe in args.nprobe:
+            index.nprobe = nprobe
+            r = recall_at_k(exact, index, k=args.k)
+            print(f"{nprobe:>6} {r['recall']:>8.3f} {r['exact_ms']:>9.3f} {r['ann_ms']:>8.3f}")
@@ -0,0 +1,55 @@
+"""
+Diff two benchmark result files (micro or load) from different commits.
+
+    python -m benchmarks.compare bench-micro-1a2b3c4d.json bench-micro-5e6f7a8b.json
+    python -m benchmarks.compare old.json new.json --metric p99_us --threshold 10
+
+Benchmarks present in both files are compared on one latency metric
+(p50_us by default). A change beyond --threshold percent is flagged, and the
+exit code is 1 if any benchmark regressed, so it can gate a CI step.
+"""
+
+import argparse
+import json
+import sys
+
+
+def compare(old, new, metric="p50_us", threshold=5.0):
+    """[(name, old value, new value, % change, flag)] for benchmarks in both result sets."""
+    rows = []
+    for name in sorted(set(old) & set(new)):
+        a, b = old[name].get(metric), new[name].get(metric)
+        if a is None or b is None:
+            continue
+        change = 100.0 * (b - a) / a if a else 0.0
+        flag = "regressed" if change > threshold else "improved" if change < -threshold else ""
+        rows.append((name, a, b, change, flag))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--metric", default="p50_us", help="p50_us, p95_us, p99_us or mean_us")
+    parser.add_argument("--threshold", type=float, default=5.0, help="percent change that counts")
+    args = parser.parse_args()
+
+    with open(args.old) as f_old, open(args.new) as f_new:
+        old, new = json.load(f_old), json.load(f_new)
+
+    print(f"{old['commit'][:12]} -> {new['commit'][:12]} ({args.metric}, ±{args.threshold:g}%)")
+    rows = compare(old["results"], new["results"], args.metric, args.threshold)
+    print(f"{'benchmark':<52} {'old':>11} {'new':>11} {'change':>9}")
+    for name, a, b, change, flag in rows:
+        print(f"{name:<52} {a:>11.1f} {b:>11.1f} {change:>8.1f}% {flag}")
+
+    only = sorted(set(old["results"]) ^ set(new["results"]))
+    if only:
+        print(f"\nIn one file only: {', '.join(only)}")
+
+    sys.exit(1 if any(flag == "regressed" for *_, flag in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
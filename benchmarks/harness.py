@@ -0,0 +1,227 @@
+"""
+Shared pieces of the benchmark suite: timing, payloads, service sandboxes
+and the JSON result files.
+
+Every service is benchmarked from a throwaway copy of its directory
+(`sandbox`), so SQLite logs, registries and exported artifacts written
+while benchmarking never touch the working tree. `common/` is symlinked in,
+so the copy runs the code of the current checkout.
+"""
+
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Fewer moving parts while measuring: no result cache, no manifest watcher threads
+BENCH_ENV = {
+    "PREDICTION_CACHE_SIZE": "0",
+    "MODEL_WATCH_INTERVAL": "0",
+    "CATALOG_REFRESH_INTERVAL": "0"
+}
+
+
+# -------------------------
+# Timing
+# -------------------------
+def summarize(samples_s, rows_per_call=1):
+    """Latency percentiles (µs) and throughput for per-call durations in seconds."""
+    us = np.asarray(samples_s, dtype=float) * 1e6
+    mean = float(us.mean())
+    return {
+        "calls": int(len(us)),
+        "rows_per_call": rows_per_call,
+        "mean_us": round(mean, 3),
+        "p50_us": round(float(np.percentile(us, 50)), 3),
+        "p95_us": round(float(np.percentile(us, 95)), 3),
+        "p99_us": round(float(np.percentile(us, 99)), 3),
+        "rows_per_s": round(rows_per_call * 1e6 / mean, 1) if mean else 0.0
+    }
+
+
+def time_calls(fn, n=1000, warmup=50, rows_per_call=1, max_seconds=10.0):
+    """Call fn() `n` times (stopping early after `max_seconds`) and summarize."""
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    deadline = time.perf_counter() + max_seconds
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        end = time.perf_counter()
+        samples.append(end - start)
+        if end > deadline:
+            break
+    return summarize(samples, rows_per_call)
+
+
+# -------------------------
+# Services and payloads
+# -------------------------
+def valid_payloads(model, df, n=2000):
+    """Up to `n` rows of `df` that pass the request `model`, as JSON-ready dicts."""
+    fields = model.model_fields
+    payloads = []
+    for record in df.to_dict(orient="records"):
+        row = {}
+        for name, field in fields.items():
+            value = record.get(name)
+            if field.annotation is str and value is not None and not pd.isna(value):
+                value = str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+            row[name] = value
+        try:
+            payloads.append(model(**row).dict())
+        except Exception:
+            continue
+        if len(payloads) >= n:
+            break
+    return payloads
+
+
+class Service(NamedTuple):
+    directory: str              # service directory under the repo root
+    module: str                 # module holding `app`
+    path: str                   # endpoint the load generator hits
+    payloads: Callable          # payloads(app_module) -> list of request bodies
+    ready_path: str = "/openapi.json"
+
+
+def _house_payloads(api):
+    return valid_payloads(api.HouseBase, pd.read_csv("house_sales.csv"))
+
+
+def _loan_payloads(api):
+    return valid_payloads(api.LoanApplication, pd.read_csv("loan_data.csv"))
+
+
+def _segment_payloads(api):
+    return valid_payloads(api.CustomerFeatures, pd.read_csv("Customer_Offers_Existing_Customers.csv"))
+
+
+def _recommend_payloads(api):
+    names = api.CATALOG.current.tracks["track_name"].to_pylist()
+    rng = np.random.default_rng(0)
+    return [{"track_name": names[i], "top_n": 10} for i in rng.integers(0, len(names), 2000)]
+
+
+SERVICES = {
+    "house": Service("HousePrice", "api", "/predict/price", _house_payloads),
+    "loan": Service("Regression", "loan_api", "/predict", _loan_payloads),
+    "segments": Service("Test", "customer_clustering_api", "/predict", _segment_payloads),
+    "recommend": Service("UnsupervisedML", "api", "/recommend", _recommend_payloads)
+}
+
+
+def _ignore(directory, names):
+    # Runtime state of the checkout is left behind; the sandbox starts clean
+    return [n for n in names if n.endswith((".db", ".db-wal", ".db-shm", ".tmp")) or n in (
+        "__pycache__", "model_registry", "registry", "checkpoints", ".dataset_cache"
+    )]
+
+
+@contextlib.contextmanager
+def sandbox(directory, env=None):
+    """
+    Work from a temp copy of a service directory: chdir into it, put it on
+    sys.path and apply `env` (BENCH_ENV by default). Modules imported from
+    the copy are dropped from sys.modules afterwards.
+    """
+    root = tempfile.mkdtemp(prefix="bench-")
+    service_dir = os.path.join(root, directory)
+    shutil.copytree(os.path.join(REPO_ROOT, directory), service_dir, ignore=_ignore)
+    os.symlink(os.path.join(REPO_ROOT, "common"), os.path.join(root, "common"))
+
+    env = BENCH_ENV if env is None else env
+    saved_env = {k: os.environ.get(k) for k in env}
+    saved_cwd, saved_path = os.getcwd(), list(sys.path)
+    os.environ.update(env)
+    os.chdir(service_dir)
+    sys.path.insert(0, service_dir)
+    try:
+        yield service_dir
+    finally:
+        os.chdir(saved_cwd)
+        sys.path[:] = saved_path
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        for name, module in list(sys.modules.items()):
+            if (getattr(module, "__file__", None) or "").startswith(root):
+                del sys.modules[name]
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def import_app(module):
+    """Import the service module from the current sandbox."""
+    import importlib
+    return importlib.import_module(module)
+
+
+# -------------------------
+# Result files
+# -------------------------
+def git_commit():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + ("-dirty" if dirty else "")
+
+
+def environment():
+    import sklearn
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def write_results(suite, results, out=None, params=None):
+    """Write {suite, commit, environment, params, results} as JSON; returns the path."""
+    commit = git_commit()
+    out = out or f"bench-{suite}-{commit[:8]}.json"
+    doc = {
+        "suite": suite,
+        "commit": commit,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "params": params or {},
+        "results": results
+    }
+    with open(out, "w") as f:
+        json.dump(doc, f, indent=2)
+    return os.path.abspath(out)
+
+
+def print_table(results, title):
+    print(f"\n=== {title} ===")
+    print(f"{'benchmark':<52} {'p50 µs':>10} {'p95 µs':>10} {'p99 µs':>10} {'rows/s':>12}")
+    for name, r in results.items():
+        if "p50_us" in r:
+            print(f"{name:<52} {r['p50_us']:>10.1f} {r['p95_us']:>10.1f} {r['p99_us']:>10.1f} {r['rows_per_s']:>12.0f}")
+        else:
+            print(f"{name:<52} {'':>32} {r['rows_per_s']:>12.0f}")
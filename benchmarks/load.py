@@ -0,0 +1,169 @@
+"""
+Async load generator for the prediction services.
+
+    python -m benchmarks.load house                          # in-process (ASGI), concurrency 1 16 64
+    python -m benchmarks.load loan --concurrency 32 --duration 20
+    python -m benchmarks.load segments --serve --workers 2   # local uvicorn on a free port
+    python -m benchmarks.load recommend --url http://127.0.0.1:8000
+
+Each of `concurrency` clients posts real request bodies (rows of the
+service's own dataset) back to back for `duration` seconds after a warm-up.
+Reported per concurrency level: throughput, p50/p95/p99 latency and status
+counts. The result cache and manifest watchers are off (see BENCH_ENV), so
+every request runs the model.
+
+In-process runs exercise the full app (validation, middleware, batching,
+logging) without sockets; --serve measures the same app behind uvicorn.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+import warnings
+from collections import Counter
+
+import httpx
+
+from benchmarks.harness import BENCH_ENV, SERVICES, import_app, sandbox, summarize, write_results
+
+
+async def run_load(client, path, payloads, concurrency, duration, warmup=2.0):
+    """Closed-loop load: `concurrency` workers, each waiting for its response before the next request."""
+    samples = []
+    statuses = Counter()
+    errors = Counter()
+    counter = iter(range(10 ** 12))
+    # Time-based, not a timer task: in-process async handlers may never yield to one
+    record_from = time.perf_counter() + warmup
+    deadline = record_from + duration
+
+    async def worker():
+        while True:
+            start = time.perf_counter()
+            if start >= deadline:
+                return
+            body = payloads[next(counter) % len(payloads)]
+            try:
+                response = await client.post(path, json=body)
+            except httpx.HTTPError as e:
+                if start >= record_from:
+                    errors[type(e).__name__] += 1
+                continue
+            if start >= record_from:
+                samples.append(time.perf_counter() - start)
+                statuses[str(response.status_code)] += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - record_from
+
+    result = summarize(samples) if samples else {"calls": 0}
+    result.update({
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "statuses": dict(statuses),
+        "errors": dict(errors)
+    })
+    return result
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_uvicorn(service, service_dir, workers=1):
+    """uvicorn serving the sandboxed service; returns (process, base_url) once it answers."""
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{service.module}:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=service_dir,
+        env={**os.environ, **BENCH_ENV, "PYTHONWARNINGS": "ignore"}
+    )
+    url = f"http://127.0.0.1:{port}"
+
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+        try:
+            if httpx.get(url + service.ready_path, timeout=1.0).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+
+    process.terminate()
+    raise RuntimeError("uvicorn did not become ready in 120s")
+
+
+async def _sweep(client, service, payloads, levels, duration, warmup):
+    results = {}
+    for concurrency in levels:
+        r = await run_load(client, service.path, payloads, concurrency, duration, warmup)
+        results[f"c{concurrency}"] = r
+        print(
+            f"c={concurrency:<4} {r['throughput_rps']:>9.1f} req/s  "
+            f"p50 {r.get('p50_us', 0) / 1000:>7.2f} ms  p95 {r.get('p95_us', 0) / 1000:>7.2f} ms  "
+            f"p99 {r.get('p99_us', 0) / 1000:>7.2f} ms  {r['statuses']} {r['errors'] or ''}"
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test a prediction service")
+    parser.add_argument("service", choices=sorted(SERVICES))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--serve", action="store_true", help="start a local uvicorn on the sandboxed service")
+    mode.add_argument("--url", default=None, help="an already running service (payloads still come from the sandbox)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --serve")
+    parser.add_argument("--out", default=None, help="JSON results path (default: bench-load-<commit>.json)")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    service = SERVICES[args.service]
+    target = "url" if args.url else "uvicorn" if args.serve else "asgi"
+
+    with sandbox(service.directory) as service_dir:
+        app_module = import_app(service.module)
+        payloads = service.payloads(app_module)
+        print(f"{args.service}: POST {service.path} ({target}), {len(payloads)} distinct payloads")
+
+        process = None
+        if args.serve:
+            process, url = start_uvicorn(service, service_dir, args.workers)
+        try:
+            if target == "asgi":
+                transport = httpx.ASGITransport(app=app_module.app)
+                client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30.0)
+            else:
+                limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+                client = httpx.AsyncClient(base_url=args.url or url, timeout=30.0, limits=limits)
+
+            async def run():
+                async with client:
+                    return await _sweep(client, service, payloads, args.concurrency, args.duration, args.warmup)
+
+            levels = asyncio.run(run())
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+
+    results = {f"load/{args.service}/{target}/{level}": r for level, r in levels.items()}
+    params = {k: v for k, v in vars(args).items() if k != "out"}
+    path = write_results(f"load-{args.service}", results, args.out, params=params)
+    print(f"✅ Saved: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""
+Micro-benchmarks for the prediction hot paths, run offline.
+
+    python -m benchmarks.micro                      # everything, JSON to bench-micro-<commit>.json
+    python -m benchmarks.micro --only pipelines sqlite
+    python -m benchmarks.micro --only recommend --catalog-sizes 10000 100000 1000000
+
+Groups:
+    pipelines   single-row vs batch predict for the HousePrice price / quick-sale
+                pipelines, the loan pipeline and the customer K-means bundle:
+                sklearn on a DataFrame vs the compiled kernels the APIs use
+    sqlite      cost of logging one prediction: connect + insert + commit per
+                row vs PredictionLogger.log (enqueue) and its sustained write rate
+    recommend   POST /recommend through the real app (in-process ASGI client)
+                against synthetic spotify-like catalogs of increasing size,
+                unfiltered and with genre / category / popularity / tempo
+                filters (which should be faster, not slower)
+    datasets    loading a spotify-like CSV of increasing size: pd.read_csv vs
+                common.datasets (cold cache build, warm load, feature columns
+                only, memory-mapped)
+
+Compare two result files with `python -m benchmarks.compare old.json new.json`.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from benchmarks.harness import REPO_ROOT, print_table, sandbox, summarize, time_calls, write_results
+
+sys.path.append(REPO_ROOT)
+from common.datasets import ensure_cache, load_dataset
+from common.fastpath import compile_checked
+from common.prediction_log import PredictionLogger
+
+BATCH_SIZES = (1, 64, 1024)
+
+
+# -------------------------
+# Pipelines
+# -------------------------
+def _pipeline_cases():
+    house = pd.read_csv(os.path.join(REPO_ROOT, "HousePrice", "house_sales.csv"))
+    loan = pd.read_csv(os.path.join(REPO_ROOT, "Regression", "loan_data.csv")).dropna(subset=["Loan_Status"])
+    loan = loan.drop(columns=["Loan_Status", "Loan_ID", "Gender", "Dependents"])
+
+    price = joblib.load(os.path.join(REPO_ROOT, "HousePrice", "models", "price_model.pkl"))
+    quicksale = joblib.load(os.path.join(REPO_ROOT, "HousePrice", "models", "quicksale_model.pkl"))
+    loan_model = joblib.load(os.path.join(REPO_ROOT, "Regression", "loan_model.pkl"))
+
+    return [
+        ("price", price, house[list(price.feature_names_in_)]),
+        ("quicksale", quicksale, house[list(quicksale.feature_names_in_)]),
+        ("loan", loan_model, loan[list(loan_model.feature_names_in_)])
+    ]
+
+
+def _batch(df, size, seed=0):
+    idx = np.random.default_rng(seed).integers(0, len(df), size)
+    return df.iloc[idx].reset_index(drop=True)
+
+
+def bench_pipelines(n):
+    results = {}
+
+    for name, pipeline, df in _pipeline_cases():
+        reference = pipeline.predict_proba if hasattr(pipeline, "predict_proba") else pipeline.predict
+        kernel = compile_checked(pipeline)
+        rows = df.to_dict(orient="records")
+
+        row_iter = iter(range(10 ** 9))
+        results[f"pipelines/{name}/sklearn_single"] = time_calls(
+            lambda: reference(pd.DataFrame([rows[next(row_iter) % len(rows)]])), n=n // 4
+        )
+        if kernel is not None:
+            results[f"pipelines/{name}/kernel_single"] = time_calls(
+                lambda: kernel.predict_one(rows[next(row_iter) % len(rows)]), n=n
+            )
+
+        for size in BATCH_SIZES[1:]:
+            batch = _batch(df, size)
+            batch_rows = batch.to_dict(orient="records")
+            results[f"pipelines/{name}/sklearn_batch_{size}"] = time_calls(
+                lambda: reference(batch), n=max(n // 20, 20), rows_per_call=size
+            )
+            # The API's batched path: list of dicts -> DataFrame -> predict
+            results[f"pipelines/{name}/sklearn_batch_{size}_from_dicts"] = time_calls(
+                lambda: reference(pd.DataFrame(batch_rows)), n=max(n // 20, 20), rows_per_call=size
+            )
+            if kernel is not None:
+                results[f"pipelines/{name}/kernel_batch_{size}"] = time_calls(
+                    lambda: kernel.predict_many(batch_rows), n=max(n // 10, 20), rows_per_call=size
+                )
+
+    results.update(_bench_segments(n))
+    return results
+
+
+def _bench_segments(n):
+    sys.path.insert(0, os.path.join(REPO_ROOT, "Test"))
+    try:
+        from segmentation import FEATURES, SegmentClassifier
+    finally:
+        sys.path.pop(0)
+
+    test_dir = os.path.join(REPO_ROOT, "Test")
+    scaler = joblib.load(os.path.join(test_dir, "scaler.pkl"))
+    kmeans = joblib.load(os.path.join(test_dir, "kmeans_model.pkl"))
+    classifier = SegmentClassifier.from_bundle({"scaler": scaler, "kmeans": kmeans})
+    df = pd.read_csv(os.path.join(test_dir, "Customer_Offers_Existing_Customers.csv"))[FEATURES]
+    rows = df.to_dict(orient="records")
+
+    results = {}
+    row_iter = iter(range(10 ** 9))
+    results["pipelines/segments/sklearn_single"] = time_calls(
+        lambda: kmeans.predict(scaler.transform(pd.DataFrame([rows[next(row_iter) % len(rows)]]))), n=n // 4
+    )
+    results["pipelines/segments/kernel_single"] = time_calls(
+        lambda: classifier.predict_one(rows[next(row_iter) % len(rows)]), n=n
+    )
+    for size in BATCH_SIZES[1:]:
+        batch = _batch(df, size)
+        batch_rows = batch.to_dict(orient="records")
+        results[f"pipelines/segments/sklearn_batch_{size}"] = time_calls(
+            lambda: kmeans.predict(scaler.transform(batch)), n=max(n // 20, 20), rows_per_call=size
+        )
+        results[f"pipelines/segments/kernel_batch_{size}"] = time_calls(
+            lambda: classifier.predict(batch_rows), n=max(n // 10, 20), rows_per_call=size
+        )
+    return results
+
+
+# -------------------------
+# SQLite logging
+# -------------------------
+SQLITE_TABLE = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload_a REAL, payload_b REAL, payload_c TEXT,
+    prediction REAL, created_at TEXT, model_version TEXT
+)
+"""
+SQLITE_INSERT = (
+    "INSERT INTO predictions (payload_a, payload_b, payload_c, prediction, created_at, model_version) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+
+def _row(i):
+    return (float(i), i * 0.5, "Urban", i * 1.5, "2026-01-01T00:00:00", "v1")
+
+
+def bench_sqlite(n):
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench-sqlite-") as tmp:
+        # The original per-request pattern: connect, insert, commit, close
+        db = os.path.join(tmp, "per_request.db")
+        with sqlite3.connect(db) as conn:
+            conn.execute(SQLITE_TABLE)
+        counter = iter(range(10 ** 9))
+
+        def per_request():
+            conn = sqlite3.connect(db)
+            conn.execute(SQLITE_INSERT, _row(next(counter)))
+            conn.commit()
+            conn.close()
+
+        results["sqlite/connect_insert_commit"] = time_calls(per_request, n=max(n // 4, 50), warmup=5)
+
+        # What a request pays with the batched logger: one enqueue
+        db = os.path.join(tmp, "batched.db")
+        with sqlite3.connect(db) as conn:
+            conn.execute(SQLITE_TABLE)
+        logger = PredictionLogger(db, max_queue=10 ** 6)
+        results["sqlite/logger_enqueue"] = time_calls(
+            lambda: logger.log(SQLITE_INSERT, _row(next(counter))), n=n * 10, warmup=10
+        )
+
+        # Sustained rate: enqueue N rows and wait for them to be committed
+        total = n * 20
+        start = time.perf_counter()
+        for i in range(total):
+            logger.log(SQLITE_INSERT, _row(i))
+        logger.flush()
+        seconds = time.perf_counter() - start
+        stats = logger.stats()
+        logger.close()
+
+        results["sqlite/logger_sustained"] = {
+            "rows": total,
+            "seconds": round(seconds, 4),
+            "rows_per_s": round(total / seconds, 1),
+            "batches": stats["batches"],
+            "write_seconds": stats["write_seconds"],
+            "dropped": stats["dropped"]
+        }
+    return results
+
+
+# -------------------------
+# /recommend vs catalog size
+# -------------------------
+GENRES = ["Pop", "Rock", "Hip-Hop", "Classical", "Jazz", "Bollywood", "EDM", "Indie"]
+CATEGORIES = ["Chill", "Workout", "Party", "Romantic", "Focus", "Sad"]
+WORDS = ["Love", "Sky", "Fire", "Dream", "Night", "Heart", "Rain", "Light", "Dance", "Road", "Moon", "Gold"]
+
+# /recommend filters, timed against the unfiltered engine on the same catalog
+FILTER_CASES = {
+    "genre": {"genre": ["Pop"]},
+    "genre_category": {"genre": ["Pop"], "playlist_category": ["Chill"]},
+    "popularity": {"min_popularity": 80},
+    "tempo_band": {"min_tempo": 110, "max_tempo": 130}
+}
+
+
+def synthetic_catalog(n_rows, seed=0):
+    """spotify.csv-shaped catalog with the same columns and value ranges."""
+    rng = np.random.default_rng(seed)
+    words = np.array(WORDS)
+    names = pd.Series(words[rng.integers(0, len(WORDS), n_rows)]) + " " + pd.Series(words[rng.integers(0, len(WORDS), n_rows)])
+    return pd.DataFrame({
+        # Unique names so every lookup resolves to one track
+        "track_name": names + " " + pd.Series(np.arange(n_rows)).astype(str),
+        "artist": "Artist_" + pd.Series(rng.integers(0, max(n_rows // 20, 1), n_rows)).astype(str),
+        "genre": np.array(GENRES)[rng.integers(0, len(GENRES), n_rows)],
+        "playlist_category": np.array(CATEGORIES)[rng.integers(0, len(CATEGORIES), n_rows)],
+        "danceability": rng.uniform(0.2, 1.0, n_rows).round(3),
+        "energy": rng.uniform(0.1, 1.0, n_rows).round(3),
+        "valence": rng.uniform(0.0, 1.0, n_rows).round(3),
+        "tempo": rng.uniform(60, 200, n_rows).round(2),
+        "duration_ms": rng.integers(120000, 360000, n_rows),
+        "popularity": rng.integers(0, 100, n_rows)
+    })
+
+
+def bench_recommend(n, catalog_sizes, index="exact"):
+    import asyncio
+    import httpx
+
+    results = {}
+    for size in catalog_sizes:
+        env = {"RECOMMENDER_INDEX": index, "MODEL_WATCH_INTERVAL": "0", "CATALOG_REFRESH_INTERVAL": "0"}
+        with sandbox("UnsupervisedML", env=env):
+            for stale in ("spotify_features.npy", "spotify_tracks.arrow", "spotify_artifacts.json",
+                          "spotify_neighbors.npy", "spotify_neighbors.npy.json", "spotify_ivf.npz",
+                          "spotify_updates.jsonl"):
+                if os.path.exists(stale):
+                    os.remove(stale)
+            synthetic_catalog(size).to_csv("spotify.csv", index=False)
+
+            start = time.perf_counter()
+            import api
+            load_seconds = time.perf_counter() - start
+
+            catalog = api.CATALOG.current
+            names = catalog.tracks["track_name"].to_pylist()
+            rng = np.random.default_rng(1)
+            queries = [names[i] for i in rng.integers(0, len(names), n)]
+
+            async def run():
+                transport = httpx.ASGITransport(app=api.app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                    for q in queries[:20]:
+                        await client.post("/recommend", json={"track_name": q, "top_n": 10})
+                    # Interleaved, so drift during the run hits both variants alike
+                    samples = {"http": [], "http_genre": []}
+                    for q in queries:
+                        for label, filters in (("http", None), ("http_genre", FILTER_CASES["genre"])):
+                            t0 = time.perf_counter()
+                            r = await client.post("/recommend", json={"track_name": q, "top_n": 10, "filters": filters})
+                            samples[label].append(time.perf_counter() - t0)
+                            r.raise_for_status()
+                    return samples
+
+            http = asyncio.run(run())
+            seeds = rng.integers(0, len(names), n)
+            engine_samples = []
+            for q in seeds:
+                t0 = time.perf_counter()
+                catalog.engine.recommend(int(q), 10)
+                engine_samples.append(time.perf_counter() - t0)
+
+            prefix = f"recommend/{index}/{size}"
+            results[f"{prefix}/http"] = {**summarize(http["http"]), "load_seconds": round(load_seconds, 3)}
+            results[f"{prefix}/http_genre"] = summarize(http["http_genre"])
+            results[f"{prefix}/engine"] = summarize(engine_samples)
+
+            # Same seeds through the filter partitions
+            for label, filters in FILTER_CASES.items():
+                spec = api.RecommendFilters(**filters).spec()
+                filtered_samples = []
+                for q in seeds:
+                    t0 = time.perf_counter()
+                    catalog.filters.search(catalog.vectors([q]), 10, spec, exclude=[q])
+                    filtered_samples.append(time.perf_counter() - t0)
+                results[f"{prefix}/engine_{label}"] = summarize(filtered_samples)
+    return results
+
+
+# -------------------------
+# CSV vs columnar cache
+# -------------------------
+# What the recommender reads of its catalog
+FEATURE_COLUMNS = ["danceability", "energy", "valence", "tempo", "duration_ms", "popularity"]
+
+
+def bench_datasets(catalog_sizes, repeats=5):
+    results = {}
+    for size in catalog_sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, "spotify.csv")
+            synthetic_catalog(size).to_csv(csv_path, index=False)
+            prefix = f"datasets/{size}"
+
+            start = time.perf_counter()
+            ensure_cache(csv_path)
+            cold = time.perf_counter() - start
+            results[f"{prefix}/cache_build"] = summarize([cold], size)
+
+            cases = {
+                "read_csv": lambda: pd.read_csv(csv_path),
+                "read_csv_features": lambda: pd.read_csv(csv_path, usecols=FEATURE_COLUMNS),
+                "cached": lambda: load_dataset(csv_path),
+                "cached_features": lambda: load_dataset(csv_path, columns=FEATURE_COLUMNS),
+                "cached_features_mmap": lambda: load_dataset(csv_path, columns=FEATURE_COLUMNS, memory_map=True)
+            }
+            for label, fn in cases.items():
+                results[f"{prefix}/{label}"] = time_calls(fn, n=repeats, warmup=1, rows_per_call=size)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the prediction hot paths")
+    parser.add_argument("--only", nargs="+", choices=["pipelines", "sqlite", "recommend", "datasets"], default=None)
+    parser.add_argument("-n", type=int, default=2000, help="calls per benchmark (scaled down for slow ones)")
+    parser.add_argument("--catalog-sizes", type=int, nargs="+", default=[10000, 100000, 500000])
+    parser.add_argument("--index", choices=["exact", "ivf"], default="exact", help="RECOMMENDER_INDEX for /recommend")
+    parser.add_argument("--out", default=None, help="JSON results path (default: bench-micro-<commit>.json)")
+    args = parser.parse_args()
+
+    # Pickles from older sklearn versions warn on every load
+    warnings.filterwarnings("ignore")
+    groups = args.only or ["pipelines", "sqlite", "recommend", "datasets"]
+
+    results = {}
+    if "pipelines" in groups:
+        results.update(bench_pipelines(args.n))
+    if "sqlite" in groups:
+        results.update(bench_sqlite(args.n))
+    if "recommend" in groups:
+        results.update(bench_recommend(max(args.n // 4, 50), args.catalog_sizes, args.index))
+    if "datasets" in groups:
+        results.update(bench_datasets(args.catalog_sizes))
+
+    print_table(results, "micro-benchmarks")
+    path = write_results("micro", results, args.out, params=vars(args))
+    print(f"✅ Saved: {path}")
+
+
+if __name__ == "__main__":
+    main()
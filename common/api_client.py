@@ -0,0 +1,92 @@
+"""
+Pooled HTTP client for the Streamlit frontends.
+
+Streamlit re-runs the whole script on every interaction, so a module-level
+`requests.post` opens a new connection each time. An ApiClient holds one
+keep-alive session per API and is meant to be kept across reruns with
+`st.cache_resource`. GETs are retried with backoff and cached for a few
+seconds; `get_many` fetches independent endpoints concurrently instead of
+one round trip after another.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class ApiClient:
+    def __init__(self, base_url, timeout=10.0, pool_size=8, retries=3, backoff=0.2, cache_ttl=5.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+
+        # Refused connections are retried for every method (nothing was sent);
+        # read errors and 502/503/504 only for GET, so a prediction is never logged twice
+        retry = Retry(
+            total=retries, connect=retries, read=retries, status=retries,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="api-client")
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def url(self, path):
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def post(self, path, json=None, timeout=None):
+        """POST to the API. Clears cached GETs, since a write can change what they return."""
+        response = self.session.post(self.url(path), json=json, timeout=timeout or self.timeout)
+        self.invalidate()
+        return response
+
+    def get(self, path, params=None, ttl=None, timeout=None):
+        """GET, served from the cache for `ttl` seconds (default cache_ttl; 0 bypasses it)."""
+        ttl = self.cache_ttl if ttl is None else ttl
+        key = (path, tuple(sorted((params or {}).items())))
+
+        if ttl > 0:
+            with self._lock:
+                entry = self._cache.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                return entry[0]
+
+        response = self.session.get(self.url(path), params=params, timeout=timeout or self.timeout)
+        if ttl > 0 and response.status_code == 200:
+            with self._lock:
+                self._cache[key] = (response, time.monotonic() + ttl)
+        return response
+
+    def get_many(self, requests_, ttl=None):
+        """
+        Concurrent GETs. `requests_` holds paths or (path, params) pairs;
+        returns a list in the same order with a Response or the exception
+        that request raised.
+        """
+        def fetch(item):
+            path, params = (item, None) if isinstance(item, str) else item
+            try:
+                return self.get(path, params=params, ttl=ttl)
+            except requests.RequestException as e:
+                return e
+
+        return list(self._executor.map(fetch, requests_))
+
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
@@ -0,0 +1,103 @@
+"""
+Bounded LRU + TTL cache for prediction results.
+
+Keys are a SHA-256 of the canonical JSON of the validated payload plus the
+model version, so a reloaded model never serves stale results; binding a
+new version also clears the old entries.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def file_version(*paths):
+    """Short content hash of one or more model files."""
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:12]
+
+
+class PredictionCache:
+    def __init__(self, maxsize=10000, ttl=300.0, version=""):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = version
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def key(self, payload, version=None):
+        """
+        Cache key of `payload` for a model version. Pass the version of the
+        model the request uses: the bound one may already belong to a newer model.
+        """
+        version = self.version if version is None else version
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(f"{version}|{canonical}".encode()).hexdigest()
+
+    def get(self, key):
+        """Cached value, or None on a miss."""
+        if self.maxsize <= 0:
+            return None
+
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def bind_version(self, version):
+        """Call whenever the model is (re)loaded; drops entries from older versions."""
+        if version != self.version:
+            self.version = version
+            self.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "version": self.version,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
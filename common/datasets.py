@@ -0,0 +1,140 @@
+"""
+Columnar cache for the CSV datasets.
+
+Parsing CSV text is most of the cold-start cost of a script or Streamlit
+rerun that reads a large dataset. `load_dataset` parses a CSV once, stores
+the typed result as an uncompressed Arrow IPC (Feather v2) file in a
+.dataset_cache/ directory next to it, and after that reads only the
+requested columns from the cache, memory-mapped if asked.
+
+The cache is keyed on the CSV itself: a sidecar JSON records its size,
+mtime and SHA-256. A matching size + mtime is trusted without reading the
+CSV; otherwise the content hash decides, so a touched but unchanged file
+(git checkout, copy) is not re-parsed. Cache files are named by hash and
+written to a temp path first, so concurrent processes never see a partial
+one.
+
+    python -m common.datasets UnsupervisedML/spotify.csv HousePrice/house_sales.csv
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+CACHE_DIR = ".dataset_cache"
+
+
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _sidecar_path(csv_path):
+    directory, name = os.path.split(os.path.abspath(csv_path))
+    return os.path.join(directory, CACHE_DIR, name + ".json")
+
+
+def _write_json(path, doc):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(doc, f)
+    os.replace(tmp, path)
+
+
+def _read_sidecar(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def ensure_cache(csv_path):
+    """
+    Path of the up-to-date columnar cache of `csv_path`, built first if the
+    CSV is new or changed. None if the cache directory is not writable.
+    """
+    st = os.stat(csv_path)
+    signature = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    sidecar = _sidecar_path(csv_path)
+    directory = os.path.dirname(sidecar)
+
+    meta = _read_sidecar(sidecar)
+    cached = meta and os.path.join(directory, meta["cache"])
+    if cached and os.path.exists(cached) and all(meta.get(k) == v for k, v in signature.items()):
+        return cached
+
+    digest = file_digest(csv_path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        if cached and os.path.exists(cached) and meta.get("sha256") == digest:
+            # Same bytes, new mtime: only the signature is stale
+            _write_json(sidecar, {**meta, **signature})
+            return cached
+
+        name = f"{os.path.basename(csv_path)}.{digest[:16]}.arrow"
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            table = pa.Table.from_pandas(pd.read_csv(csv_path), preserve_index=False)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            # Uncompressed, so a memory-mapped read is zero-copy
+            feather.write_feather(table, tmp, compression="uncompressed")
+            os.replace(tmp, path)
+
+        _write_json(sidecar, {**signature, "sha256": digest, "cache": name})
+    except OSError as e:
+        print(f"⚠️ Dataset cache disabled for {csv_path}: {e}")
+        return None
+
+    if cached and cached != path and os.path.exists(cached):
+        os.remove(cached)
+    return path
+
+
+def load_table(csv_path, columns=None, memory_map=False):
+    """`csv_path` as a pyarrow Table (only `columns`, if given) from its columnar cache."""
+    path = ensure_cache(csv_path)
+    if path is None:
+        return pa.Table.from_pandas(pd.read_csv(csv_path, usecols=columns), preserve_index=False)
+
+    if columns is not None:
+        names = pa.ipc.open_file(pa.memory_map(path)).schema.names
+        missing = [c for c in columns if c not in names]
+        if missing:
+            raise ValueError(f"{csv_path} has no column(s) {missing}")
+    return feather.read_table(path, columns=columns, memory_map=memory_map)
+
+
+def load_dataset(csv_path, columns=None, memory_map=False):
+    """Drop-in for `pd.read_csv(csv_path, usecols=columns)`, served from the columnar cache."""
+    return load_table(csv_path, columns, memory_map).to_pandas()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build (or refresh) the columnar cache of CSV datasets")
+    parser.add_argument("csv", nargs="+")
+    args = parser.parse_args()
+
+    for csv_path in args.csv:
+        start = time.perf_counter()
+        path = ensure_cache(csv_path)
+        if path is None:
+            continue
+        built = time.perf_counter() - start
+
+        start = time.perf_counter()
+        table = load_table(csv_path, memory_map=True)
+        print(
+            f"✅ Saved: {path} ({table.num_rows} rows x {table.num_columns} columns, "
+            f"{built:.2f}s to check/build, {1000 * (time.perf_counter() - start):.1f} ms to load)"
+        )
@@ -0,0 +1,271 @@
+"""
+Compile fitted preprocessing + linear-model pipelines into a flat kernel.
+
+Supports the pipelines built by HousePrice/train_models.py and the loan
+notebook:
+
+    Pipeline([
+        ("preprocess", ColumnTransformer([
+            ("num", Pipeline([SimpleImputer(median), StandardScaler()]), numeric_cols),
+            ("cat", Pipeline([SimpleImputer(most_frequent), OneHotEncoder(handle_unknown="ignore")]), categorical_cols)
+        ])),
+        ("model", LinearRegression() | Ridge() | Lasso() | ElasticNet()
+                  | LogisticRegression() | SGDClassifier(loss="log_loss"))
+    ])
+
+Scaling is folded into the coefficients (w / scale, b - sum(w * mean / scale))
+and every one-hot block becomes a {category: weight} lookup, so a row costs one
+dot product plus a dict lookup per categorical column - no DataFrame, no
+ColumnTransformer dispatch.
+"""
+
+import math
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import ElasticNet, Lasso, LinearRegression, LogisticRegression, Ridge, SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+
+def _is_missing(v):
+    return v is None or (isinstance(v, float) and math.isnan(v))
+
+
+class CompiledLinearPipeline:
+    """
+    predict_one(row) / predict_many(rows) return the regression value, or
+    for classifiers the probability of `classes_[1]` (predict_proba[:, 1]).
+
+    Rows may be dicts keyed by column name, sequences ordered like
+    `feature_names`, or (predict_many only) a DataFrame.
+    """
+
+    def __init__(self, numeric_cols, num_fill, num_weights, categorical_cols, cat_fill, cat_lookup,
+                 intercept, is_classifier):
+        self.numeric_cols = list(numeric_cols)
+        self.categorical_cols = list(categorical_cols)
+        self.feature_names = self.numeric_cols + self.categorical_cols
+
+        self.num_fill = np.asarray(num_fill, dtype=float)
+        self.num_weights = np.asarray(num_weights, dtype=float)
+        self.cat_fill = list(cat_fill)
+        self.cat_lookup = cat_lookup
+        self.intercept = float(intercept)
+        self.is_classifier = is_classifier
+
+        # Plain-Python copies for the single-row path (faster than numpy at ~15 features)
+        self._num = list(zip(self.numeric_cols, self.num_fill.tolist(), self.num_weights.tolist()))
+        self._cat = list(zip(self.categorical_cols, self.cat_fill, self.cat_lookup))
+        self._n_num = len(self.numeric_cols)
+
+    # -------- Single row --------
+    def predict_one(self, row):
+        if not isinstance(row, dict):
+            row = dict(zip(self.feature_names, row))
+
+        z = self.intercept
+        for col, fill, w in self._num:
+            v = row.get(col)
+            z += (fill if _is_missing(v) else v) * w
+        for col, fill, lookup in self._cat:
+            v = row.get(col)
+            z += lookup.get(fill if _is_missing(v) else v, 0.0)
+
+        if self.is_classifier:
+            return 1.0 / (1.0 + math.exp(-z)) if z >= 0 else math.exp(z) / (1.0 + math.exp(z))
+        return z
+
+    # -------- Many rows --------
+    def predict_many(self, rows):
+        if isinstance(rows, pd.DataFrame):
+            X_num = rows[self.numeric_cols].to_numpy(dtype=float)
+            cat_values = [rows[c].tolist() for c in self.categorical_cols]
+        else:
+            rows = [r if isinstance(r, dict) else dict(zip(self.feature_names, r)) for r in rows]
+            X_num = np.array([[r.get(c) for c in self.numeric_cols] for r in rows], dtype=float)
+            cat_values = [[r.get(c) for r in rows] for c in self.categorical_cols]
+
+        X_num = np.where(np.isnan(X_num), self.num_fill, X_num)
+        z = X_num @ self.num_weights + self.intercept
+
+        for values, fill, lookup in zip(cat_values, self.cat_fill, self.cat_lookup):
+            z += np.fromiter(
+                (lookup.get(fill if _is_missing(v) else v, 0.0) for v in values),
+                dtype=float,
+                count=len(values)
+            )
+
+        if self.is_classifier:
+            return 1.0 / (1.0 + np.exp(-z))
+        return z
+
+
+# -------------------------
+# Compiler
+# -------------------------
+def _unwrap(pipe, expected):
+    steps = [step for _, step in pipe.steps] if isinstance(pipe, Pipeline) else [pipe]
+    if len(steps) != len(expected) or not all(isinstance(s, t) for s, t in zip(steps, expected)):
+        raise ValueError(f"Unsupported transformer: {pipe}")
+    return steps
+
+
+def _scalar(v):
+    return v.item() if isinstance(v, np.generic) else v
+
+
+# Regressors (ones the sweep can pick) and binary classifiers with coef_ / intercept_
+LINEAR_MODELS = (LinearRegression, Ridge, Lasso, ElasticNet, LogisticRegression, SGDClassifier)
+
+
+def compile_pipeline(pipeline):
+    """Build a CompiledLinearPipeline from a fitted sklearn Pipeline (ValueError if unsupported)."""
+    if not isinstance(pipeline, Pipeline) or len(pipeline.steps) != 2:
+        raise ValueError("Expected Pipeline([preprocess, model])")
+
+    pre, model = pipeline.steps[0][1], pipeline.steps[1][1]
+    if not isinstance(pre, ColumnTransformer) or not isinstance(model, LINEAR_MODELS):
+        raise ValueError(f"Expected ColumnTransformer + one of {[m.__name__ for m in LINEAR_MODELS]}")
+
+    # SGDClassifier(loss="log_loss") is a logistic model trained out of core (streaming training)
+    is_classifier = isinstance(model, (LogisticRegression, SGDClassifier))
+    if isinstance(model, SGDClassifier) and model.loss != "log_loss":
+        raise ValueError(f"Unsupported SGDClassifier loss: {model.loss}")
+
+    coef = np.ravel(model.coef_).astype(float)
+    intercept = float(np.ravel(model.intercept_)[0])
+    if is_classifier and len(model.classes_) != 2:
+        raise ValueError("Only binary classifiers are supported")
+
+    numeric_cols, num_fill, num_weights = [], [], []
+    categorical_cols, cat_fill, cat_lookup = [], [], []
+    offset = 0
+
+    for name, trans, cols in pre.transformers_:
+        if trans == "drop" or name == "remainder":
+            if trans != "drop" and len(cols):
+                raise ValueError("ColumnTransformer remainder must be dropped")
+            continue
+
+        final = trans.steps[-1][1] if isinstance(trans, Pipeline) else trans
+        if isinstance(final, StandardScaler):
+            imputer, scaler = _unwrap(trans, [SimpleImputer, StandardScaler])
+            if imputer.strategy not in ("median", "mean", "constant"):
+                raise ValueError(f"Unsupported numeric imputer: {imputer.strategy}")
+
+            mean = scaler.mean_ if scaler.with_mean else np.zeros(len(cols))
+            scale = scaler.scale_ if scaler.with_std else np.ones(len(cols))
+            w = coef[offset:offset + len(cols)] / scale
+
+            numeric_cols += list(cols)
+            num_fill += list(imputer.statistics_.astype(float))
+            num_weights += list(w)
+            intercept -= float(np.dot(w, mean))
+            offset += len(cols)
+
+        elif isinstance(final, OneHotEncoder):
+            imputer, encoder = _unwrap(trans, [SimpleImputer, OneHotEncoder])
+            if encoder.handle_unknown != "ignore" or encoder.drop_idx_ is not None:
+                raise ValueError("OneHotEncoder must use handle_unknown='ignore' and no drop")
+
+            for col, fill, cats in zip(cols, imputer.statistics_, encoder.categories_):
+                weights = coef[offset:offset + len(cats)]
+                categorical_cols.append(col)
+                cat_fill.append(_scalar(fill))
+                cat_lookup.append({_scalar(c): float(w) for c, w in zip(cats, weights)})
+                offset += len(cats)
+
+        else:
+            raise ValueError(f"Unsupported transformer: {trans}")
+
+    if offset != len(coef):
+        raise ValueError("Feature count mismatch between preprocessor and model")
+
+    return CompiledLinearPipeline(
+        numeric_cols, num_fill, num_weights,
+        categorical_cols, cat_fill, cat_lookup,
+        intercept, is_classifier
+    )
+
+
+# -------------------------
+# Equivalence check
+# -------------------------
+def reference_predict(pipeline, df):
+    if hasattr(pipeline, "predict_proba"):
+        return pipeline.predict_proba(df)[:, 1]
+    return pipeline.predict(df)
+
+
+def synthetic_rows(kernel, n=200, seed=0):
+    """Random rows around the fitted statistics, including missing and unseen values."""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for col, fill in zip(kernel.numeric_cols, kernel.num_fill):
+        values = rng.normal(fill, abs(fill) + 1.0, n)
+        values[rng.random(n) < 0.05] = np.nan
+        data[col] = values
+
+    for col, lookup in zip(kernel.categorical_cols, kernel.cat_lookup):
+        cats = list(lookup)
+        unseen = "__unseen__" if isinstance(cats[0], str) else max(cats) + 1
+        data[col] = [cats[i] if i < len(cats) else unseen for i in rng.integers(0, len(cats) + 1, n)]
+
+    return pd.DataFrame(data)
+
+
+def check_equivalence(pipeline, kernel, df=None, rtol=1e-6, atol=1e-6):
+    """Max abs difference between sklearn and the kernel (batch and single-row); raises if off."""
+    if df is None:
+        df = synthetic_rows(kernel)
+    df = df[kernel.feature_names]
+
+    expected = reference_predict(pipeline, df)
+    batch = kernel.predict_many(df)
+    single = np.array([kernel.predict_one(r) for r in df.to_dict(orient="records")])
+
+    for got in (batch, single):
+        if not np.allclose(got, expected, rtol=rtol, atol=atol):
+            raise AssertionError(f"Compiled pipeline diverges: max diff {np.max(np.abs(got - expected))}")
+    return float(max(np.max(np.abs(batch - expected)), np.max(np.abs(single - expected))))
+
+
+def compile_checked(pipeline):
+    """Compile and verify on synthetic rows; None if unsupported or not equivalent."""
+    try:
+        kernel = compile_pipeline(pipeline)
+        check_equivalence(pipeline, kernel)
+    except (ValueError, AssertionError) as e:
+        print(f"⚠️ Fast path disabled: {e}")
+        return None
+    return kernel
+
+
+if __name__ == "__main__":
+    import argparse
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Compile a pipeline and compare it against sklearn")
+    parser.add_argument("model")
+    parser.add_argument("--data", default=None, help="CSV of real rows to compare on")
+    args = parser.parse_args()
+
+    pipeline = joblib.load(args.model)
+    kernel = compile_pipeline(pipeline)
+    df = pd.read_csv(args.data) if args.data else synthetic_rows(kernel)
+
+    print("max abs diff:", check_equivalence(pipeline, kernel, df))
+
+    rows = df[kernel.feature_names].to_dict(orient="records")[:200]
+    t0 = time.perf_counter()
+    for r in rows:
+        reference_predict(pipeline, pd.DataFrame([r]))
+    t1 = time.perf_counter()
+    for r in rows:
+        kernel.predict_one(r)
+    t2 = time.perf_counter()
+    print(f"sklearn: {1e6 * (t1 - t0) / len(rows):.1f} µs/row, compiled: {1e6 * (t2 - t1) / len(rows):.2f} µs/row")
@@ -0,0 +1,133 @@
+"""
+Schema migrations and keyset-paginated history queries over the prediction
+SQLite databases.
+"""
+
+import json
+import sqlite3
+from datetime import timedelta
+
+
+# -------- Migrations --------
+def _statements(script):
+    """Split an SQL script into single statements."""
+    statements, current = [], ""
+    for piece in script.split(";"):
+        current += piece + ";"
+        if sqlite3.complete_statement(current):
+            statements.append(current.strip())
+            current = ""
+    return [s for s in statements if s != ";"]    # the empty tail after the last ";"
+
+
+def apply_migrations(db_path, migrations, timeout=30.0):
+    """
+    Run the migrations not yet applied to `db_path`, in order.
+
+    `migrations` is a list of SQL scripts; the number already applied is
+    tracked in PRAGMA user_version, so each script runs exactly once, even
+    when several workers start against the same database: the version is
+    read again under the write lock (BEGIN IMMEDIATE) and the scripts and
+    version bump commit together.
+    """
+    conn = sqlite3.connect(db_path, timeout=timeout, isolation_level=None)
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= len(migrations):
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            # Statement by statement: executescript would commit the transaction first
+            for i, script in enumerate(migrations[version:], start=version + 1):
+                for statement in _statements(script):
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {i}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+
+# -------- Filters --------
+def where_clause(conditions):
+    """
+    Build a WHERE clause from (sql_fragment, value) pairs, skipping pairs whose
+    value is None. Returns (sql, params).
+    """
+    parts, params = [], []
+    for fragment, value in conditions:
+        if value is not None:
+            parts.append(fragment)
+            params.append(value)
+
+    if not parts:
+        return "", []
+    return "WHERE " + " AND ".join(parts), params
+
+
+def date_conditions(since=None, until=None):
+    """Inclusive date range; created_at is ISO-8601 text, so it compares lexically (and uses the index)."""
+    return [
+        ("created_at >= ?", since.isoformat() if since else None),
+        ("created_at < ?", (until + timedelta(days=1)).isoformat() if until else None)
+    ]
+
+
+# -------- Queries --------
+def fetch_page(db_path, table, columns, conditions, before_id=None, limit=20):
+    """
+    Newest-first page of rows. Pass the returned `next_before_id` back as
+    `before_id` to get the following page (keyset pagination, no OFFSET scan).
+    """
+    where, params = where_clause(conditions + [("id < ?", before_id)])
+    sql = f"SELECT {', '.join(columns)} FROM {table} {where} ORDER BY id DESC LIMIT ?"
+
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(sql, params + [limit]).fetchall()
+    conn.close()
+
+    next_before_id = rows[-1][columns.index("id")] if len(rows) == limit else None
+    return {"columns": columns, "rows": rows, "next_before_id": next_before_id}
+
+
+def stream_jsonl(db_path, table, columns, conditions, chunk_size=1000):
+    """Yield every matching row (oldest first) as one JSON object per line."""
+    where, params = where_clause(conditions)
+    sql = f"SELECT {', '.join(columns)} FROM {table} {where} ORDER BY id"
+
+    # Starlette may resume the generator on different threadpool threads
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    try:
+        cur = conn.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield "".join(json.dumps(dict(zip(columns, row))) + "\n" for row in rows)
+    finally:
+        conn.close()
+
+
+def daily_aggregates(db_path, table, aggregates, conditions):
+    """
+    Per-day aggregates computed in SQLite, e.g.
+    aggregates = {"count": "COUNT(*)", "mean_price": "AVG(predicted_price)"}.
+    """
+    where, params = where_clause(conditions)
+    select = ", ".join(f"{expr} AS {name}" for name, expr in aggregates.items())
+    sql = f"""
+        SELECT substr(created_at, 1, 10) AS day, {select}
+        FROM {table} {where}
+        GROUP BY day
+        ORDER BY day
+    """
+
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+
+    names = ["day"] + list(aggregates)
+    return [dict(zip(names, row)) for row in rows]
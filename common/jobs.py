@@ -0,0 +1,48 @@
+"""
+Long-running admin tasks (refits, bulk scoring) run off the request path.
+
+A BackgroundJob runs `task(progress=..., **params)` in a daemon thread, one
+run at a time, and keeps a status dict for a polling endpoint. `progress`
+takes keyword fields that are merged into the status while the task runs;
+the dict the task returns is merged in when it finishes.
+"""
+
+import threading
+from datetime import datetime
+
+
+class BackgroundJob:
+    def __init__(self, task, name):
+        self.task = task
+        self.name = name
+        self._lock = threading.Lock()
+        self._thread = None
+        self._status = {"state": "idle"}
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, **params):
+        """False if the previous run is still going."""
+        with self._lock:
+            if self.running():
+                return False
+
+            self._status = {"state": "running", **params, "started_at": datetime.now().isoformat()}
+            self._thread = threading.Thread(target=self._run, kwargs=params, name=self.name, daemon=True)
+            self._thread.start()
+            return True
+
+    def _progress(self, **fields):
+        self._status.update(fields)
+
+    def _run(self, **params):
+        try:
+            result = self.task(progress=self._progress, **params)
+            self._status.update(state="done", **(result or {}))
+        except Exception as e:
+            self._status.update(state="failed", error=f"{type(e).__name__}: {e}")
+        self._status["finished_at"] = datetime.now().isoformat()
+
+    def status(self):
+        return dict(self._status)
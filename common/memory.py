@@ -0,0 +1,63 @@
+"""
+Per-process memory usage, used for the startup report each uvicorn worker
+prints, for /stats/memory and for the peak memory of training runs.
+
+Pages of memory-mapped artifacts (.npy, joblib mmap_mode, Arrow files) are
+counted in every worker's RSS but only once in the machine total, so the
+report also shows PSS (RSS with shared pages split between the processes
+mapping them) and the shared / private split from /proc/self/smaps_rollup.
+"""
+
+import os
+import resource
+import sys
+
+MB = 1024 * 1024
+
+
+def _smaps_rollup():
+    """Field -> bytes from /proc/self/smaps_rollup, or {} where unavailable (non-Linux)."""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        return {}
+
+    fields = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) == 3 and parts[2] == "kB":
+            fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return fields
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (ru_maxrss: kB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round((peak if sys.platform == "darwin" else peak * 1024) / MB, 1)
+
+
+def memory_usage():
+    """RSS / PSS / shared / private of this process in MB."""
+    fields = _smaps_rollup()
+    if not fields:
+        # No smaps (non-Linux): peak RSS only
+        return {"pid": os.getpid(), "rss_mb": peak_rss_mb()}
+
+    shared = fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)
+    private = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return {
+        "pid": os.getpid(),
+        "rss_mb": round(fields.get("Rss", 0) / MB, 1),
+        "pss_mb": round(fields.get("Pss", 0) / MB, 1),
+        "shared_mb": round(shared / MB, 1),
+        "private_mb": round(private / MB, 1)
+    }
+
+
+def report_memory(service):
+    """Print one line per worker at startup, e.g. after `uvicorn api:app --workers 16`."""
+    usage = memory_usage()
+    details = ", ".join(f"{k[:-3]} {v} MB" for k, v in usage.items() if k != "pid")
+    print(f"🧠 {service} worker {usage['pid']}: {details}")
+    return usage
@@ -0,0 +1,254 @@
+"""
+Prometheus metrics for the FastAPI services, in the text exposition format
+(no client library needed).
+
+    METRICS = ServiceMetrics().install(app)        # right after FastAPI(), before the routes
+    ...
+    with METRICS.stage("predict"):
+        pred = model.predict(df)
+
+`install` adds a pure ASGI middleware and the GET /metrics endpoint. Every
+request is counted and timed per route template (not per raw path), and the
+time spent in each named stage is recorded against the same route:
+
+    http_requests_total{method, route, status}
+    http_request_duration_seconds{method, route}        histogram
+    http_request_stage_seconds{route, stage}            histogram
+
+Stage "validation" is recorded automatically: the time from the request
+arriving until the handler starts (body parsing + schema validation). The
+services use "dataframe", "predict" and "db_write" for the rest.
+
+Scrape-time gauges are registered with `gauge(name, fn)` (logging queue
+depth, cache size, ...); process RSS and the load time of each ModelHandle
+(`track_model`) are built in. Recording an observation is a perf_counter
+pair, a bisect and a locked increment, so it stays on in production.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from common.memory import memory_usage
+
+# Seconds; dense below 50 ms where the model and SQLite stages live
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# (start, {stage: seconds}) of the request being handled in this context
+_REQUEST = ContextVar("metrics_request", default=None)
+
+
+class Histogram:
+    def __init__(self, name, help, labels, buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}   # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, values, seconds):
+        i = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(values)
+            if series is None:
+                series = self._series[values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(values, list(series)) for values, series in self._series.items()]
+
+        for values, series in items:
+            labels = _labels(self.labels, values)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, values, amount=1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        lines += [f"{self.name}{{{_labels(self.labels, values)}}} {value}" for values, value in items]
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    return ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+
+
+def _handler_started():
+    current = _REQUEST.get()
+    if current is not None:
+        current[1]["validation"] = time.perf_counter() - current[0]
+
+
+def _timed(endpoint):
+    """`endpoint` that records the "validation" stage when it is entered."""
+    if iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            _handler_started()
+            return await endpoint(*args, **kwargs)
+    else:
+        @wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            _handler_started()
+            return endpoint(*args, **kwargs)
+    return wrapper
+
+
+class _MetricsMiddleware:
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        stages = {}
+        token = _REQUEST.set((start, stages))
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _REQUEST.reset(token)
+            # Route template ("/history/{id}"), so raw paths can't blow up the label set
+            route = scope.get("route")
+            self.metrics.observe_request(
+                scope["method"], route.path if route is not None else "unmatched",
+                status, time.perf_counter() - start, stages
+            )
+
+
+class ServiceMetrics:
+    def __init__(self):
+        self.requests = Counter("http_requests_total", "Requests handled", ("method", "route", "status"))
+        self.latency = Histogram("http_request_duration_seconds", "Request latency", ("method", "route"))
+        self.stages = Histogram("http_request_stage_seconds", "Time per request stage", ("route", "stage"))
+        self._gauges = []
+        self._models = []
+
+    # -------- Recording --------
+    def observe_request(self, method, route, status, seconds, stages):
+        self.requests.inc((method, route, str(status)))
+        self.latency.observe((method, route), seconds)
+        for stage, stage_seconds in stages.items():
+            self.stages.observe((route, stage), stage_seconds)
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block as `name` within the current request (no-op outside one)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            current = _REQUEST.get()
+            if current is not None:
+                current[1][name] = current[1].get(name, 0.0) + time.perf_counter() - start
+
+    def gauge(self, name, fn, help="", label=None):
+        """Gauge read at scrape time; fn() returns a number, or {label value: number} with `label`."""
+        self._gauges.append((name, help, fn, label))
+
+    def track_logger(self, logger, prefix="prediction_log"):
+        """Queue depth and write totals of a PredictionLogger."""
+        for key, help in (
+            ("queue_depth", "Rows waiting to be written"),
+            ("written", "Rows written"),
+            ("dropped", "Rows dropped on a full queue"),
+            ("write_seconds", "Time spent in executemany + commit")
+        ):
+            self.gauge(f"{prefix}_{key}", lambda key=key: logger.stats()[key], help)
+
+    def track_model(self, handle):
+        """Export the load time (registry load + prepare) of handle's active version."""
+        self._models.append(handle)
+
+    # -------- Exposition --------
+    def render(self):
+        lines = self.requests.render() + self.latency.render() + self.stages.render()
+
+        if self._models:
+            lines += [
+                "# HELP model_load_seconds Load time of the active model version",
+                "# TYPE model_load_seconds gauge"
+            ]
+            for handle in self._models:
+                loaded = handle.current
+                labels = _labels(("model", "version"), (handle.name, loaded.version))
+                lines.append(f"model_load_seconds{{{labels}}} {loaded.load_seconds}")
+
+        usage = memory_usage()
+        lines += [
+            "# HELP process_resident_memory_bytes Resident set size",
+            "# TYPE process_resident_memory_bytes gauge",
+            f"process_resident_memory_bytes {int(usage['rss_mb'] * 1024 * 1024)}"
+        ]
+
+        for name, help, fn, label in self._gauges:
+            try:
+                value = fn()
+            except Exception:
+                continue
+            lines += [f"# HELP {name} {help or name}", f"# TYPE {name} gauge"]
+            if label is not None:
+                lines += [f"{name}{{{_labels((label,), (key,))}}} {v}" for key, v in value.items()]
+            else:
+                lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def install(self, app):
+        """Middleware + GET /metrics; handlers declared afterwards get the validation stage."""
+        from fastapi.responses import PlainTextResponse
+        from fastapi.routing import APIRoute
+
+        class TimedRoute(APIRoute):
+            def __init__(self, path, endpoint, **kwargs):
+                super().__init__(path, _timed(endpoint), **kwargs)
+
+        app.router.route_class = TimedRoute
+        app.add_middleware(_MetricsMiddleware, metrics=self)
+
+        @app.get("/metrics", include_in_schema=False)
+        def metrics():
+            return PlainTextResponse(self.render(), media_type="text/plain; version=0.0.4")
+
+        return self
@@ -0,0 +1,93 @@
+"""
+Async micro-batching for model inference.
+
+Concurrent requests call `await batcher.submit(row)`. The first row of a
+batch waits at most `max_latency_ms` for others to arrive (or until
+`max_batch_size` rows are collected); the batch then goes through
+`predict_fn` once, in a worker thread, and every caller gets its own row's
+result back.
+
+A caller that holds a model snapshot passes it along (`submit(row, model)`)
+so its row is predicted by that model, not whichever one is current when
+the batch runs: rows are grouped per model and each group goes through
+`predict_fn(rows, model)`.
+"""
+
+import asyncio
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn, max_batch_size=64, max_latency_ms=2.0):
+        """predict_fn(list_of_rows[, model]) -> sequence of results, one per row."""
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000.0
+
+        self.batches = 0
+        self.rows = 0
+
+        self._loop = None
+        self._queue = None
+        self._worker = None
+
+    def _ensure_worker(self):
+        # One worker per event loop; restarted if the loop changes (tests, reloads)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, row, model=None):
+        self._ensure_worker()
+        fut = self._loop.create_future()
+        self._queue.put_nowait((row, model, fut))
+        return await fut
+
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.max_latency
+
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Usually one group; several only while a model swap is in flight
+            groups = {}
+            for item in batch:
+                groups.setdefault(id(item[1]), []).append(item)
+            for group in groups.values():
+                await self._run_batch(group)
+
+    async def _run_batch(self, batch):
+        rows = [row for row, _, _ in batch]
+        model = batch[0][1]
+        args = (rows,) if model is None else (rows, model)
+        try:
+            results = await self._loop.run_in_executor(None, self.predict_fn, *args)
+        except Exception as e:
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        self.batches += 1
+        self.rows += len(rows)
+        for (_, _, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
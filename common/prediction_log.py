@@ -0,0 +1,149 @@
+"""
+Batched, asynchronous SQLite logging shared by the prediction APIs.
+
+Request handlers only enqueue rows; one background thread per process owns
+a long-lived WAL-mode connection and writes queued rows with executemany,
+committing when a batch is full or `flush_interval` seconds have passed.
+"""
+
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class PredictionLogger:
+    def __init__(self, db_path, max_queue=10000, batch_size=500, flush_interval=0.5, block_timeout=0.0):
+        """
+        max_queue      - queued inserts before backpressure kicks in
+        batch_size     - rows per executemany/commit
+        flush_interval - max seconds a row waits before being committed
+        block_timeout  - seconds log() may wait on a full queue before dropping
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+        self.write_seconds = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="prediction-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # -------- Producer side --------
+    def log(self, sql, row):
+        """Queue one row for `sql`; returns False if it was dropped."""
+        return self.log_many(sql, [row])
+
+    def log_many(self, sql, rows):
+        """Queue many rows for `sql` as a single item; returns False if dropped."""
+        try:
+            if self.block_timeout > 0:
+                self._queue.put((sql, rows), timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait((sql, rows))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += len(rows)
+            return False
+
+    def flush(self):
+        """Block until everything queued so far is committed."""
+        if self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """Flush remaining rows and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped,
+                "batches": self.batches,
+                "errors": self.errors,
+                "write_seconds": round(self.write_seconds, 6)
+            }
+
+    # -------- Writer thread --------
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _run(self):
+        conn = self._connect()
+        stop = False
+
+        while not stop:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            # Collect until the batch is full, the interval expires or we are told to stop
+            batch = []
+            n_rows = 0
+            deadline = time.monotonic() + self.flush_interval
+            while item is not _STOP:
+                batch.append(item)
+                n_rows += len(item[1])
+                remaining = deadline - time.monotonic()
+                if n_rows >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            else:
+                stop = True
+
+            self._write(conn, batch, n_rows)
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+
+        conn.close()
+
+    def _write(self, conn, batch, n_rows):
+        if not batch:
+            return
+
+        grouped = {}
+        for sql, rows in batch:
+            grouped.setdefault(sql, []).extend(rows)
+
+        start = time.perf_counter()
+        try:
+            for sql, rows in grouped.items():
+                conn.executemany(sql, rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            log.exception("Failed to write %d prediction rows", n_rows)
+            with self._lock:
+                self.errors += 1
+            return
+
+        with self._lock:
+            self.written += n_rows
+            self.batches += 1
+            self.write_seconds += time.perf_counter() - start
@@ -0,0 +1,261 @@
+"""
+Versioned model registry with atomic in-process hot reload.
+
+Layout (one directory per model name):
+
+    <root>/<name>/manifest.json     {"active": "v2", "versions": [{...}, ...]}
+    <root>/<name>/v1/model.pkl
+    <root>/<name>/v2/model.pkl
+
+Every version records its sha256, metrics and creation time. Artifacts and
+the manifest are written to a temp file and os.replace()d, so readers never
+see a half-written file. Writers hold <root>/<name>/.lock (flock), so workers
+registering at the same time get distinct versions.
+
+A ModelHandle keeps the active model in memory as one immutable LoadedModel.
+reload() builds the new one off to the side and swaps the reference: requests
+already holding the old LoadedModel finish with it, new requests see the new
+one.
+
+CLI:
+    python -m common.registry list --root model_registry --name loan
+    python -m common.registry register --root model_registry --name loan loan_model.pkl --metrics '{"auc": 0.81}'
+    python -m common.registry register --root model_registry --name loan loan_model.pkl --if-empty
+    python -m common.registry activate --root model_registry --name loan v1
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, NamedTuple
+
+import joblib
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _atomic_write_json(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+class ModelRegistry:
+    def __init__(self, root):
+        self.root = root
+
+    def _dir(self, name):
+        return os.path.join(self.root, name)
+
+    def manifest_path(self, name):
+        return os.path.join(self._dir(name), "manifest.json")
+
+    def manifest(self, name):
+        path = self.manifest_path(name)
+        if not os.path.exists(path):
+            return {"active": None, "versions": []}
+        with open(path) as f:
+            return json.load(f)
+
+    def active_version(self, name):
+        return self.manifest(name)["active"]
+
+    def entry(self, name, version):
+        for entry in self.manifest(name)["versions"]:
+            if entry["version"] == version:
+                return entry
+        raise KeyError(f"{name}: unknown version {version}")
+
+    @contextlib.contextmanager
+    def _locked(self, name):
+        """Exclusive across processes for one model's manifest; released if the holder dies."""
+        os.makedirs(self._dir(name), exist_ok=True)
+        with open(os.path.join(self._dir(name), ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def register(self, name, model=None, path=None, metrics=None, activate=True, note=None, if_empty=False):
+        """
+        Store a fitted object (joblib) or an existing artifact file as the next
+        version. if_empty=True only registers into an empty registry (bootstrap
+        from pre-registry files, once across workers) and returns None otherwise.
+        """
+        if (model is None) == (path is None):
+            raise ValueError("Pass exactly one of model or path")
+
+        with self._locked(name):
+            manifest = self.manifest(name)
+            if if_empty and manifest["versions"]:
+                return None
+
+            version = f"v{len(manifest['versions']) + 1}"
+            version_dir = os.path.join(self._dir(name), version)
+            os.makedirs(version_dir, exist_ok=True)
+
+            target = os.path.join(version_dir, "model.pkl")
+            fd, tmp = tempfile.mkstemp(dir=version_dir, suffix=".tmp")
+            os.close(fd)
+            if model is not None:
+                joblib.dump(model, tmp)
+            else:
+                shutil.copyfile(path, tmp)
+            os.replace(tmp, target)
+
+            manifest["versions"].append({
+                "version": version,
+                "file": os.path.join(version, "model.pkl"),
+                "sha256": sha256_file(target),
+                "metrics": metrics or {},
+                "created_at": datetime.now().isoformat(),
+                "note": note
+            })
+            if activate or manifest["active"] is None:
+                manifest["active"] = version
+            _atomic_write_json(self.manifest_path(name), manifest)
+        return version
+
+    def activate(self, name, version):
+        """Point `active` at an existing version (also used for rollbacks)."""
+        with self._locked(name):
+            self.entry(name, version)
+            manifest = self.manifest(name)
+            manifest["active"] = version
+            _atomic_write_json(self.manifest_path(name), manifest)
+
+    def artifact_path(self, name, version=None):
+        version = version or self.active_version(name)
+        if version is None:
+            raise KeyError(f"{name}: no registered versions")
+        return os.path.join(self._dir(name), self.entry(name, version)["file"])
+
+    def load(self, name, version=None, mmap_mode=None):
+        """
+        Load a version (default: active), verifying its checksum. Returns (model, entry).
+
+        mmap_mode only applies to artifacts written by joblib.dump without
+        compression (what register() writes); plain pickles load normally.
+        """
+        version = version or self.active_version(name)
+        if version is None:
+            raise KeyError(f"{name}: no registered versions")
+
+        entry = self.entry(name, version)
+        path = os.path.join(self._dir(name), entry["file"])
+        if sha256_file(path) != entry["sha256"]:
+            raise ValueError(f"{name} {version}: checksum mismatch for {path}")
+        return joblib.load(path, mmap_mode=mmap_mode), entry
+
+
+class LoadedModel(NamedTuple):
+    model: Any
+    version: str
+    extra: Any = None
+    load_seconds: float = 0.0     # registry load + prepare
+
+
+class ModelHandle:
+    """
+    The in-memory active version of one registered model.
+
+    prepare(model) -> extra   derived objects built before the swap (e.g. a compiled kernel)
+    on_swap(loaded)           called after a new version goes live (e.g. cache.bind_version)
+    legacy_path               pre-registry artifact registered as v1 if the registry is empty
+    mmap_mode                 e.g. "r": NumPy arrays inside the artifact are memory-mapped
+                              read-only, so uvicorn workers share their pages
+    """
+
+    def __init__(self, registry, name, legacy_path=None, prepare=None, on_swap=None, mmap_mode=None):
+        self.registry = registry
+        self.name = name
+        self.prepare = prepare
+        self.on_swap = on_swap
+        self.mmap_mode = mmap_mode
+        self._lock = threading.Lock()
+        self._watcher = None
+
+        if registry.active_version(name) is None and legacy_path and os.path.exists(legacy_path):
+            registry.register(name, path=legacy_path, note=f"bootstrapped from {legacy_path}", if_empty=True)
+
+        self.current = self._load(registry.active_version(name))
+
+    def _load(self, version):
+        start = time.perf_counter()
+        model, entry = self.registry.load(self.name, version, mmap_mode=self.mmap_mode)
+        extra = self.prepare(model) if self.prepare else None
+        return LoadedModel(model, entry["version"], extra, time.perf_counter() - start)
+
+    def reload(self, version=None):
+        """Swap in `version` (default: the manifest's active one). Returns True if it changed."""
+        with self._lock:
+            version = version or self.registry.active_version(self.name)
+            if version == self.current.version:
+                return False
+
+            loaded = self._load(version)
+            self.current = loaded
+
+        if self.on_swap:
+            self.on_swap(loaded)
+        return True
+
+    def watch(self, interval=10.0):
+        """Poll the manifest every `interval` seconds and reload when it changes."""
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def run():
+            path = self.registry.manifest_path(self.name)
+            last = None
+            while True:
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                    if mtime != last:
+                        last = mtime
+                        self.reload()
+                except Exception as e:
+                    print(f"⚠️ Reload of {self.name} failed: {e}")
+                stop.wait(interval)
+
+        stop = threading.Event()
+        self._watcher = threading.Thread(target=run, name=f"watch-{self.name}", daemon=True)
+        self._watcher.start()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the model registry")
+    parser.add_argument("command", choices=["list", "register", "activate"])
+    parser.add_argument("target", nargs="?", help="artifact path (register) or version (activate)")
+    parser.add_argument("--root", default="model_registry")
+    parser.add_argument("--name", required=True)
+    parser.add_argument("--metrics", default="{}", help="JSON metrics for register")
+    parser.add_argument("--if-empty", action="store_true", help="register only if the model has no versions yet")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == "register":
+        version = registry.register(args.name, path=args.target, metrics=json.loads(args.metrics), if_empty=args.if_empty)
+        if version is None:
+            print(f"{args.name} already has versions; nothing registered")
+        else:
+            print(f"✅ Registered {args.name} {version}")
+    elif args.command == "activate":
+        registry.activate(args.name, args.target)
+        print(f"✅ {args.name} active version: {args.target}")
+    else:
+        print(json.dumps(registry.manifest(args.name), indent=2))
@@ -0,0 +1,136 @@
+"""
+Feature schemas shared by the APIs, the Streamlit forms and training scripts.
+
+A schema is a list of Feature specs. The same list gives:
+
+    request_model("LoanApplication", LOAN_FEATURES)   pydantic model for the API
+    form_inputs(st, LOAN_FEATURES)                    Streamlit widgets -> payload
+    names(LOAN_FEATURES), names(..., dtype=str)       training column lists
+
+Request models reject missing, unknown, out-of-range and non-finite fields
+(422) before the handler runs, so bad payloads never reach pandas / sklearn.
+RejectionCounter counts those 422s per path and per field.
+"""
+
+import threading
+from collections import Counter
+from typing import Any, Literal, NamedTuple, Optional
+
+from pydantic import ConfigDict, Field, create_model
+
+
+class Feature(NamedTuple):
+    name: str
+    dtype: type                        # float, int or str
+    label: str                         # form label
+    ge: Optional[float] = None
+    le: Optional[float] = None
+    gt: Optional[float] = None
+    choices: Optional[dict] = None     # allowed values -> form labels (categoricals)
+    default: Any = None                # form default
+    step: Any = None                   # form step
+    options: Optional[tuple] = None    # form dropdown only; the API takes any valid value
+
+
+def names(features, dtype=None):
+    """Column names, optionally only those of one dtype (e.g. str for the one-hot columns)."""
+    return [f.name for f in features if dtype is None or f.dtype is dtype]
+
+
+# -------------------------
+# API validation
+# -------------------------
+def _field(feature):
+    if feature.choices is not None:
+        return Literal[tuple(feature.choices)], Field(...)
+
+    bounds = {k: v for k, v in (("ge", feature.ge), ("le", feature.le), ("gt", feature.gt)) if v is not None}
+    if feature.dtype is float:
+        bounds["allow_inf_nan"] = False
+    if feature.dtype is str:
+        bounds["min_length"] = 1
+    return feature.dtype, Field(..., **bounds)
+
+
+def request_model(name, features):
+    """Pydantic model with one required field per feature; unknown fields are rejected."""
+    return create_model(
+        name,
+        __config__=ConfigDict(extra="forbid"),
+        **{f.name: _field(f) for f in features}
+    )
+
+
+class RejectionCounter:
+    """Counts requests rejected by validation (422), per path and per offending field."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = 0
+        self.by_path = Counter()
+        self.by_field = Counter()
+
+    def install(self, app):
+        from fastapi.exception_handlers import request_validation_exception_handler
+        from fastapi.exceptions import RequestValidationError
+
+        @app.exception_handler(RequestValidationError)
+        async def rejected(request, exc):
+            self.record(request.url.path, exc.errors())
+            return await request_validation_exception_handler(request, exc)
+
+        return self
+
+    def record(self, path, errors):
+        # loc is ("body", field, ...); unparseable JSON is counted as "body"
+        fields = {
+            str(e["loc"][1]) if len(e.get("loc", ())) > 1 and e.get("type") != "json_invalid" else "body"
+            for e in errors
+        }
+        with self._lock:
+            self.total += 1
+            self.by_path[path] += 1
+            self.by_field.update(fields)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rejected": self.total,
+                "by_path": dict(self.by_path),
+                "by_field": dict(self.by_field.most_common())
+            }
+
+
+# -------------------------
+# Streamlit forms
+# -------------------------
+def form_input(st, feature):
+    """One widget for `feature`; returns the value to send to the API."""
+    if feature.choices is not None:
+        values = list(feature.choices)
+        index = values.index(feature.default) if feature.default in values else 0
+        return st.selectbox(feature.label, values, index=index, format_func=feature.choices.get)
+
+    if feature.options is not None:
+        index = feature.options.index(feature.default) if feature.default in feature.options else 0
+        return st.selectbox(feature.label, feature.options, index=index)
+
+    cast = feature.dtype
+    lower = feature.ge if feature.ge is not None else feature.gt
+    return st.number_input(
+        feature.label,
+        min_value=None if lower is None else cast(lower),
+        max_value=None if feature.le is None else cast(feature.le),
+        value=cast(feature.default if feature.default is not None else (lower or 0)),
+        step=cast(feature.step or 1)
+    )
+
+
+def form_inputs(st, features, columns=2):
+    """Widgets for every feature, laid out over `columns` columns; returns the payload dict."""
+    cols = st.columns(columns)
+    payload = {}
+    for i, feature in enumerate(features):
+        with cols[i % columns]:
+            payload[feature.name] = form_input(st, feature)
+    return payload
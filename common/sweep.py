@@ -0,0 +1,209 @@
+"""
+Parallel model sweep: k-fold CV of a grid of (preprocessor, estimator)
+candidates across a process pool, with successive halving.
+
+    preprocessors = {"median": build_preprocessor(...), ...}   # unfitted
+    candidates = grid("ridge", Ridge(), {"alpha": [0.1, 1, 10]}, ["median"])
+    board, best = run_sweep(X, y, preprocessors, candidates, "neg_mean_absolute_error")
+
+Each preprocessor is fitted once per fold and its transformed fold matrices
+are dumped (uncompressed joblib) to a cache directory; every candidate task
+memory-maps them instead of refitting the preprocessing.
+
+Successive halving uses folds as the budget: round 0 scores every candidate
+on `min_folds` folds, only the best 1 / eta go on to eta times as many folds,
+and so on until the survivors have been scored on all folds. eta=1 (or
+halving=False) scores everything on every fold.
+"""
+
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, NamedTuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import KFold, ParameterGrid, StratifiedKFold
+from sklearn.pipeline import Pipeline
+
+
+class Candidate(NamedTuple):
+    name: str
+    preprocessor: str
+    estimator: Any
+
+
+def grid(name, estimator, param_grid, preprocessors):
+    """One Candidate per (preprocessor key, parameter combination)."""
+    candidates = []
+    for pre in preprocessors:
+        for params in ParameterGrid(param_grid):
+            label = ",".join(f"{k}={v}" for k, v in sorted(params.items()))
+            candidates.append(Candidate(
+                f"{name}({label})" if label else name,
+                pre,
+                clone(estimator).set_params(**params)
+            ))
+    return candidates
+
+
+# -------- Pool tasks --------
+def _init_worker():
+    # One BLAS / OpenMP thread per process: the pool already uses every core
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+
+
+def _to_dense(X):
+    return X.toarray() if sparse.issparse(X) else np.asarray(X)
+
+
+def _prepare_fold(preprocessor, X, y, train_idx, val_idx, path):
+    start = time.perf_counter()
+    pre = clone(preprocessor).fit(X.iloc[train_idx], y.iloc[train_idx])
+    joblib.dump({
+        "X_train": _to_dense(pre.transform(X.iloc[train_idx])),
+        "y_train": y.iloc[train_idx].to_numpy(),
+        "X_val": _to_dense(pre.transform(X.iloc[val_idx])),
+        "y_val": y.iloc[val_idx].to_numpy()
+    }, path)
+    return time.perf_counter() - start
+
+
+def _evaluate(estimator, path, scoring):
+    data = joblib.load(path, mmap_mode="r")
+    try:
+        start = time.perf_counter()
+        model = clone(estimator).fit(data["X_train"], data["y_train"])
+        fit_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        score = get_scorer(scoring)(model, data["X_val"], data["y_val"])
+        return float(score), fit_time, time.perf_counter() - start, None
+    except Exception as e:
+        return float("nan"), 0.0, 0.0, f"{type(e).__name__}: {e}"
+
+
+# -------- Sweep --------
+def _schedule(n_folds, halving, eta, min_folds):
+    """Cumulative fold budget per round, e.g. 5 folds, eta=3, min_folds=1 -> [1, 3, 5]."""
+    if not halving or eta <= 1:
+        return [n_folds]
+
+    budgets, b = [], max(1, min_folds)
+    while b < n_folds:
+        budgets.append(b)
+        b *= eta
+    return budgets + [n_folds]
+
+
+def run_sweep(X, y, preprocessors, candidates, scoring, cv=5, stratify=False, halving=True,
+              eta=3, min_folds=1, n_jobs=None, cache_dir=None, seed=42, verbose=True):
+    """
+    Cross-validate `candidates` and return (leaderboard rows, best unfitted Pipeline).
+
+    Scores follow sklearn's "greater is better" convention (e.g. neg_mean_absolute_error).
+    """
+    splitter = (StratifiedKFold if stratify else KFold)(n_splits=cv, shuffle=True, random_state=seed)
+    folds = list(splitter.split(X, y))
+    budgets = _schedule(cv, halving, eta, min_folds)
+
+    results = {c.name: {"scores": [], "fit_time": 0.0, "score_time": 0.0, "error": None} for c in candidates}
+    by_name = {c.name: c for c in candidates}
+    eliminated = {}
+    prep_time = 0.0
+
+    workdir = tempfile.mkdtemp(prefix="sweep_", dir=cache_dir)
+    prepared = set()
+    try:
+        with ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count(), initializer=_init_worker) as pool:
+            alive, done = list(candidates), 0
+            for rnd, budget in enumerate(budgets):
+                fold_ids = range(done, budget)
+
+                # Fold preprocessing needed by this round, fitted once per (preprocessor, fold)
+                needed = sorted({(c.preprocessor, k) for c in alive for k in fold_ids} - prepared)
+                jobs = [
+                    pool.submit(_prepare_fold, preprocessors[pre], X, y, *folds[k], os.path.join(workdir, f"{pre}_{k}.pkl"))
+                    for pre, k in needed
+                ]
+                prep_time += sum(job.result() for job in jobs)
+                prepared.update(needed)
+
+                jobs = {
+                    (c.name, k): pool.submit(_evaluate, c.estimator, os.path.join(workdir, f"{c.preprocessor}_{k}.pkl"), scoring)
+                    for c in alive for k in fold_ids
+                }
+                for (name, _), job in jobs.items():
+                    score, fit_time, score_time, error = job.result()
+                    r = results[name]
+                    r["scores"].append(score)
+                    r["fit_time"] += fit_time
+                    r["score_time"] += score_time
+                    r["error"] = r["error"] or error
+                done = budget
+
+                if budget == cv:
+                    break
+
+                # Keep the best 1 / eta (failed candidates always drop out)
+                ranked = sorted(alive, key=lambda c: -_mean(results[c.name]["scores"]))
+                keep = max(1, math.ceil(len(alive) / eta))
+                for c in ranked[keep:]:
+                    eliminated[c.name] = rnd
+                alive = ranked[:keep]
+
+                if verbose:
+                    print(f"Round {rnd}: {len(ranked)} candidates x {budget} folds -> {keep} kept")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    rows = []
+    for name, r in results.items():
+        c = by_name[name]
+        scores = np.array(r["scores"])
+        rows.append({
+            "candidate": name,
+            "preprocessor": c.preprocessor,
+            "mean_score": _mean(scores),
+            "std_score": float(np.nanstd(scores)) if len(scores) else float("nan"),
+            "folds": len(scores),
+            "fit_time": round(r["fit_time"], 4),
+            "score_time": round(r["score_time"], 4),
+            "status": r["error"] or (f"eliminated round {eliminated[name]}" if name in eliminated else "finalist")
+        })
+
+    # Candidates that survived longer rank first, then by score
+    rows.sort(key=lambda row: (-row["folds"], -row["mean_score"]))
+    for rank, row in enumerate(rows, start=1):
+        row["rank"] = rank
+
+    if verbose:
+        print(f"Fold preprocessing: {len(prepared)} fits, {prep_time:.2f}s")
+
+    best = by_name[rows[0]["candidate"]]
+    return rows, Pipeline([("preprocess", clone(preprocessors[best.preprocessor])), ("model", clone(best.estimator))])
+
+
+def _mean(scores):
+    scores = np.asarray(scores, dtype=float)
+    if not len(scores) or np.isnan(scores).any():
+        return float("-inf")
+    return float(scores.mean())
+
+
+def leaderboard_frame(rows):
+    columns = ["rank", "candidate", "preprocessor", "mean_score", "std_score", "folds", "fit_time", "score_time", "status"]
+    return pd.DataFrame(rows, columns=columns)
+
+
+def print_leaderboard(rows, title, top=10):
+    print(f"\n=== Leaderboard: {title} ===")
+    print(leaderboard_frame(rows).head(top).to_string(index=False))
@@ -0,0 +1,43 @@
+import os
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from common.fastpath import compile_pipeline, reference_predict, synthetic_rows
+
+# Shipped pipelines and the data they were trained on
+PIPELINES = [
+    ("HousePrice/models/price_model.pkl", "HousePrice/house_sales.csv"),
+    ("HousePrice/models/quicksale_model.pkl", "HousePrice/house_sales.csv"),
+    ("Regression/loan_model.pkl", "Regression/loan_data.csv")
+]
+
+
+def assert_equivalent(pipeline, kernel, df):
+    df = df[kernel.feature_names]
+    expected = reference_predict(pipeline, df)
+
+    np.testing.assert_allclose(kernel.predict_many(df), expected, rtol=1e-6, atol=1e-6)
+    single = [kernel.predict_one(row) for row in df.head(500).to_dict(orient="records")]
+    np.testing.assert_allclose(single, expected[:500], rtol=1e-6, atol=1e-6)
+
+
+@pytest.mark.parametrize("model_path, data_path", PIPELINES)
+def test_compiled_pipeline_matches_sklearn(model_path, data_path):
+    pipeline = joblib.load(os.path.join(ROOT, model_path))
+    kernel = compile_pipeline(pipeline)
+
+    # Real rows (with their missing values), then rows with unseen categories
+    assert_equivalent(pipeline, kernel, pd.read_csv(os.path.join(ROOT, data_path)))
+    assert_equivalent(pipeline, kernel, synthetic_rows(kernel, n=500))
+
+
+def test_unsupported_pipeline_is_rejected():
+    pipeline = joblib.load(os.path.join(ROOT, PIPELINES[0][0]))
+    with pytest.raises(ValueError):
+        compile_pipeline(pipeline.steps[-1][1])
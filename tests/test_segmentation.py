@@ -0,0 +1,58 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "Test"))
+from segmentation import FEATURES, OFFER_NAMES, SEGMENT_NAMES, SegmentClassifier, reference_predict, synthetic_customers
+
+
+@pytest.fixture(scope="module")
+def bundle():
+    import pickle
+    with open(os.path.join(ROOT, "Test/scaler.pkl"), "rb") as f_scaler, \
+            open(os.path.join(ROOT, "Test/kmeans_model.pkl"), "rb") as f_kmeans:
+        return {"scaler": pickle.load(f_scaler), "kmeans": pickle.load(f_kmeans)}
+
+
+def assert_equivalent(bundle, classifier, df):
+    df = df[FEATURES]
+    expected = reference_predict(bundle, df)
+
+    np.testing.assert_array_equal(classifier.predict(df), expected)
+    np.testing.assert_array_equal(classifier.predict(df.to_numpy()), expected)
+    single = [classifier.predict_one(row) for row in df.to_dict(orient="records")]
+    np.testing.assert_array_equal(single, expected)
+
+
+def test_folded_classifier_matches_sklearn(bundle):
+    classifier = SegmentClassifier.from_bundle(bundle)
+
+    # Shipped (encoded) customers, then random ones with missing values
+    customers = pd.read_csv(os.path.join(ROOT, "Test/Customer_Offers_Existing_Customers.csv"))
+    assert_equivalent(bundle, classifier, customers)
+    assert_equivalent(bundle, classifier, synthetic_customers(bundle, n=2000))
+
+
+def test_assign_labels_clusters(bundle):
+    classifier = SegmentClassifier.from_bundle(bundle)
+    df = synthetic_customers(bundle, n=50)
+
+    expected = reference_predict(bundle, df)
+    clusters, segments, offers = classifier.assign(df)
+    np.testing.assert_array_equal(clusters, expected)
+    assert list(segments) == list(SEGMENT_NAMES[expected])
+    assert list(offers) == list(OFFER_NAMES[expected])
+
+
+def test_missing_feature_is_rejected(bundle):
+    classifier = SegmentClassifier.from_bundle(bundle)
+    row = dict.fromkeys(FEATURES[1:], 0.0)
+    with pytest.raises(ValueError):
+        classifier.predict([row])
+    with pytest.raises(ValueError):
+        classifier.predict_one(row)